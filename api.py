@@ -0,0 +1,298 @@
+import argparse
+import json
+import zlib
+from datetime import date
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from busqueda import buscar_comentarios
+from datos import (
+    CLIENTES_CSV,
+    PROYECTOS_CSV,
+    PROYECTOS_ARCHIVO_CSV,
+    buscar,
+    cargar_clientes,
+    cargar_proyectos,
+    con_cliente_id,
+    filas_con_clave,
+    firma_tabla,
+    listar_clientes,
+    listar_proyectos,
+    modo_solo_lectura,
+    proyectos_de_cliente,
+    registros,
+)
+
+
+# ------------------ API JSON DE SOLO LECTURA ------------------
+# Servidor HTTP opcional para otras herramientas internas (etiquetas, sincronización con el ERP).
+# Usa los mismos cargadores con caché e índices que la aplicación de Streamlit, así que no lee
+# los CSV a medio escribir y no vuelve a parsearlos mientras no cambien. Corre en modo de solo
+# lectura: cargar una tabla nunca migra ids, rota la bitácora ni escribe archivos; eso queda
+# para la aplicación o la CLI.
+#
+#   python api.py --puerto 8502
+#
+#   GET /clientes                      Todos los clientes (o una página con ?pagina=&tamano=&filtro=)
+#   GET /clientes/<cliente_id>         Un cliente
+#   GET /clientes/<cliente_id>/proyectos
+#   GET /proyectos                     Todos los proyectos (o una página con ?pagina=&tamano=&filtro=&estado=)
+#                                      Rangos de fechas: ?inicio_desde=&inicio_hasta=&fin_desde=&fin_hasta= (AAAA-MM-DD)
+#   GET /proyectos/<codigo_orden>      Un proyecto
+#   GET /buscar?q=<texto>              Misma búsqueda que la página de inicio
+#   GET /comentarios?q=<texto>         Proyectos por palabras del comentario, ordenados por relevancia
+#
+# /proyectos, /clientes/<cliente_id>/proyectos, /buscar y /comentarios leen solo los proyectos
+# activos; con ?archivo=1 incluyen los archivados. /proyectos/<codigo_orden> los encuentra siempre.
+# Los proyectos traen el id interno de su cliente ("cliente") y su Cédula/NIT ("cliente_id").
+#
+# Cada respuesta lleva ETag y Last-Modified según la versión de las tablas que usa (CSV + bitácora);
+# si el cliente manda If-None-Match o If-Modified-Since y nada cambió, recibe 304 sin cuerpo.
+
+
+class ErrorApi(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def _parametro(consulta, nombre, defecto=None):
+    return consulta.get(nombre, [defecto])[0]
+
+
+def _entero(consulta, nombre, defecto):
+    valor = _parametro(consulta, nombre)
+    if valor is None:
+        return defecto
+    try:
+        return max(1, int(valor))
+    except ValueError:
+        raise ErrorApi(400, f"'{nombre}' debe ser un número entero")
+
+
+def _incluir_archivo(consulta):
+    return _parametro(consulta, "archivo", "0").lower() in ("1", "si", "true")
+
+
+def _proyectos_csv(consulta):
+    # CSV de proyectos de los que depende la respuesta
+    return [PROYECTOS_CSV, PROYECTOS_ARCHIVO_CSV] if _incluir_archivo(consulta) else [PROYECTOS_CSV]
+
+
+PARAMETROS_FECHAS = ("inicio_desde", "inicio_hasta", "fin_desde", "fin_hasta")
+
+
+def _fecha(consulta, nombre):
+    valor = _parametro(consulta, nombre)
+    if valor is None:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErrorApi(400, f"'{nombre}' debe ser una fecha AAAA-MM-DD")
+
+
+def _pagina(consulta, listar, archivo, columnas_orden, orden_defecto, **extra):
+    orden = _parametro(consulta, "orden", orden_defecto)
+    if orden not in columnas_orden:
+        raise ErrorApi(400, f"'orden' debe ser una de: {', '.join(columnas_orden)}")
+
+    resultado, total = listar(
+        _parametro(consulta, "filtro", ""),
+        orden,
+        _parametro(consulta, "ascendente", "1") != "0",
+        _entero(consulta, "pagina", 1),
+        _entero(consulta, "tamano", 100),
+        **extra
+    )
+    return {"total": total, "registros": registros(resultado, archivo)}
+
+
+# Cada ruta devuelve los CSV de los que depende su respuesta y una función que arma el cuerpo.
+# Así el 304 se decide con las firmas de los archivos, sin serializar nada.
+def ruta_clientes(partes, consulta):
+    def generar():
+        clientes = cargar_clientes()
+        if not partes:
+            if "pagina" in consulta or "tamano" in consulta or "filtro" in consulta:
+                columnas_orden = list(clientes.columns) + ["n_proyectos", "n_en_proceso"]
+                return _pagina(consulta, listar_clientes, CLIENTES_CSV, columnas_orden, "nombre")
+            return registros(clientes, CLIENTES_CSV)
+
+        cliente = filas_con_clave(CLIENTES_CSV, partes[0])
+        if cliente.empty:
+            raise ErrorApi(404, f"No existe el cliente {partes[0]}")
+        if len(partes) == 1:
+            return registros(cliente, CLIENTES_CSV)[0]
+        if partes[1:] == ["proyectos"]:
+            proyectos = proyectos_de_cliente(cliente["id"].iloc[0], incluir_archivo=_incluir_archivo(consulta))
+            return registros(con_cliente_id(proyectos), PROYECTOS_CSV)
+        raise ErrorApi(404, "Ruta no encontrada")
+
+    if len(partes) == 1 or (not partes and not consulta):
+        return [CLIENTES_CSV], generar
+    return [CLIENTES_CSV] + _proyectos_csv(consulta), generar
+
+
+def ruta_proyectos(partes, consulta):
+    def generar():
+        incluir_archivo = _incluir_archivo(consulta)
+        proyectos = cargar_proyectos(incluir_archivo=incluir_archivo)
+        if not partes:
+            if any(nombre in consulta for nombre in ("pagina", "tamano", "filtro", "estado") + PARAMETROS_FECHAS):
+                estado = _parametro(consulta, "estado", "todos")
+                if estado not in ("todos", "en_proceso", "terminados"):
+                    raise ErrorApi(400, "'estado' debe ser todos, en_proceso o terminados")
+                fechas = {nombre: _fecha(consulta, nombre) for nombre in PARAMETROS_FECHAS}
+                return _pagina(
+                    consulta, listar_proyectos, PROYECTOS_CSV, list(proyectos.columns) + ["cliente_id"], "fecha_inicio",
+                    estado=estado, incluir_archivo=incluir_archivo, **fechas
+                )
+            return registros(con_cliente_id(proyectos), PROYECTOS_CSV)
+
+        if len(partes) == 1:
+            proyecto = filas_con_clave(PROYECTOS_CSV, partes[0])
+            if proyecto.empty:
+                raise ErrorApi(404, f"No existe el proyecto {partes[0]}")
+            return registros(con_cliente_id(proyecto), PROYECTOS_CSV)[0]
+        raise ErrorApi(404, "Ruta no encontrada")
+
+    # La Cédula/NIT del cliente de cada proyecto sale de la tabla de clientes
+    if len(partes) == 1:
+        return [PROYECTOS_CSV, PROYECTOS_ARCHIVO_CSV, CLIENTES_CSV], generar
+    return _proyectos_csv(consulta) + [CLIENTES_CSV], generar
+
+
+def ruta_buscar(partes, consulta):
+    def generar():
+        texto = _parametro(consulta, "q", "")
+        if not texto:
+            raise ErrorApi(400, "Falta el parámetro q")
+        resultados, total = buscar(texto, limite=_entero(consulta, "limite", 200), incluir_archivo=_incluir_archivo(consulta))
+        return {"total": total, "resultados": resultados}
+
+    return [CLIENTES_CSV] + _proyectos_csv(consulta), generar
+
+
+def ruta_comentarios(partes, consulta):
+    def generar():
+        texto = _parametro(consulta, "q", "")
+        if not texto:
+            raise ErrorApi(400, "Falta el parámetro q")
+        resultados, total = buscar_comentarios(
+            texto, limite=_entero(consulta, "limite", 50), incluir_archivo=_incluir_archivo(consulta)
+        )
+        return {"total": total, "resultados": resultados}
+
+    return _proyectos_csv(consulta), generar
+
+
+RUTAS = {
+    "clientes": ruta_clientes,
+    "proyectos": ruta_proyectos,
+    "buscar": ruta_buscar,
+    "comentarios": ruta_comentarios,
+}
+
+
+def etag(firmas, url):
+    # La misma URL sobre los mismos archivos produce siempre la misma respuesta
+    version = "-".join(f"{firma[0]:x}.{firma[1]:x}" if firma else "0" for firma in firmas)
+    return f'W/"{version}-{zlib.crc32(url.encode()):x}"'
+
+
+class ManejadorApi(BaseHTTPRequestHandler):
+    server_version = "DCC-API/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        consulta = parse_qs(url.query)
+
+        ruta = RUTAS.get(partes[0]) if partes else None
+        if ruta is None:
+            return self._json(404, {"error": "Ruta no encontrada", "rutas": sorted(RUTAS)})
+
+        archivos, generar = ruta(partes[1:], consulta)
+        firmas = [firma_tabla(archivo) for archivo in archivos]
+
+        etiqueta = etag(firmas, self.path)
+        mtimes = [firma[0] for firma in firmas if firma]
+        modificado = max(mtimes) // 1_000_000_000 if mtimes else 0
+        cabeceras = {
+            "ETag": etiqueta,
+            "Last-Modified": formatdate(modificado, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+        if self._sin_cambios(etiqueta, modificado):
+            return self._responder(304, b"", cabeceras)
+
+        try:
+            cuerpo = generar()
+        except ErrorApi as e:
+            return self._json(e.estado, {"error": str(e)})
+        except Exception as e:
+            self.log_error("Error atendiendo %s: %r", self.path, e)
+            return self._json(500, {"error": "Error interno"})
+
+        # Si un archivo cambió mientras se armaba la respuesta, se omite la etiqueta para no
+        # asociar datos nuevos a una versión vieja
+        if [firma_tabla(archivo) for archivo in archivos] != firmas:
+            cabeceras.pop("ETag")
+        self._json(200, cuerpo, cabeceras)
+
+    def _sin_cambios(self, etiqueta, modificado):
+        si_no_coincide = self.headers.get("If-None-Match")
+        if si_no_coincide is not None:
+            return etiqueta in [e.strip() for e in si_no_coincide.split(",")] or si_no_coincide.strip() == "*"
+
+        si_modificado = self.headers.get("If-Modified-Since")
+        if si_modificado:
+            try:
+                return modificado <= parsedate_to_datetime(si_modificado).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _json(self, estado, cuerpo, cabeceras=None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        cabeceras = dict(cabeceras or {}, **{"Content-Type": "application/json; charset=utf-8"})
+        self._responder(estado, datos, cabeceras)
+
+    def _responder(self, estado, datos, cabeceras):
+        self.send_response(estado)
+        for nombre, valor in cabeceras.items():
+            self.send_header(nombre, valor)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(datos)
+
+    do_HEAD = do_GET
+
+    def _solo_lectura(self):
+        self._json(405, {"error": "La API es de solo lectura"}, {"Allow": "GET, HEAD"})
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = _solo_lectura
+
+
+def servir(host="127.0.0.1", puerto=8502):
+    modo_solo_lectura()
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorApi)
+    print(f"API de solo lectura en http://{host}:{puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API JSON de solo lectura sobre los datos de la aplicación")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8502)
+    args = parser.parse_args()
+    servir(args.host, args.puerto)
@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+
+# ------------------ CONFIG ------------------
+# Eventos que se acumulan en la bitácora de una tabla antes de compactarla en un CSV nuevo
+# (variable de entorno DCC_COMPACTAR_CADA)
+COMPACTAR_CADA = int(os.environ.get("DCC_COMPACTAR_CADA", "500"))
+
+# Segmentos (snapshot + eventos) que se conservan en el historial para recuperar versiones
+CONSERVAR_SEGMENTOS = int(os.environ.get("DCC_CONSERVAR_SEGMENTOS", "20"))
+
+
+# ------------------ BITÁCORA DE CAMBIOS ------------------
+# Cada tabla tiene un archivo JSONL de solo agregado (data/bitacora/<tabla>.jsonl). La primera
+# línea es la cabecera del segmento: la versión del CSV sobre el que se aplican los eventos
+# ("base"), el número del primer evento ("desde") y cuándo se abrió ("creado"). Cada línea
+# siguiente es un evento con su número ("n"), su momento ("t") y la operación.
+#
+# Al compactar, el CSV se reescribe con el estado actual y el segmento pasa al historial
+# (data/bitacora/historial/<tabla>-<desde>.jsonl) junto con una copia del CSV sobre el que se
+# aplicaba (<tabla>-<desde>.csv). Con eso se puede reconstruir la tabla en cualquier momento
+# que cubra el historial: se parte del snapshot y se reproducen los eventos.
+#
+# Este módulo solo lee y escribe archivos; cómo se aplica un evento a la tabla está en datos.py.
+class Bitacora:
+    def __init__(self, archivo_csv, carpeta):
+        self.csv = archivo_csv
+        self.nombre = os.path.splitext(os.path.basename(archivo_csv))[0]
+        self.ruta = os.path.join(carpeta, f"{self.nombre}.jsonl")
+        self.historial = os.path.join(carpeta, "historial")
+        self._conteo = None       # (tamaño del archivo, cabecera, eventos) de la última lectura
+
+    # -------- LECTURA --------
+    @staticmethod
+    def _leer_segmento(ruta):
+        # Devuelve (cabecera, eventos). Una última línea cortada (corte de luz a mitad de una
+        # escritura) se ignora
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                lineas = f.read().splitlines()
+        except FileNotFoundError:
+            return None, []
+
+        registros = []
+        for i, linea in enumerate(lineas):
+            try:
+                registros.append(json.loads(linea))
+            except ValueError:
+                if i == len(lineas) - 1:
+                    break
+                raise
+        if not registros:
+            return None, []
+        return registros[0], registros[1:]
+
+    def leer(self):
+        cabecera, eventos = self._leer_segmento(self.ruta)
+        try:
+            self._conteo = (os.path.getsize(self.ruta), cabecera, len(eventos))
+        except FileNotFoundError:
+            self._conteo = None
+        return cabecera, eventos
+
+    def _estado(self):
+        # Cabecera y cantidad de eventos del segmento activo, sin releerlo si no cambió de tamaño
+        try:
+            tamano = os.path.getsize(self.ruta)
+        except FileNotFoundError:
+            return None, 0
+        if self._conteo is None or self._conteo[0] != tamano:
+            self.leer()
+        return self._conteo[1], self._conteo[2]
+
+    def pendientes(self):
+        return self._estado()[1]
+
+    # -------- ESCRITURA --------
+    def agregar(self, evento, base):
+        # Agrega un evento al segmento activo; si no hay segmento, se abre uno sobre el CSV
+        # actual (base es su versión). Devuelve el evento con su número y momento
+        cabecera, cantidad = self._estado()
+        if cabecera is None:
+            cabecera = self._abrir_segmento(self.siguiente(), base)
+            cantidad = 0
+
+        evento = dict(evento, n=cabecera["desde"] + cantidad, t=datetime.now().isoformat(timespec="seconds"))
+        linea = json.dumps(evento, ensure_ascii=False) + "\n"
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(linea)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._conteo = (os.path.getsize(self.ruta), cabecera, cantidad + 1)
+        return evento
+
+    def _abrir_segmento(self, desde, base):
+        # Guarda en el historial el CSV sobre el que se aplicarán los eventos y escribe la cabecera.
+        # El CSV nunca se modifica en sitio (se reemplaza entero), así que alcanza con un enlace
+        os.makedirs(self.historial, exist_ok=True)
+        self._conteo = None
+        if os.path.exists(self.csv):
+            snapshot = os.path.join(self.historial, f"{self.nombre}-{desde}.csv")
+            if os.path.exists(snapshot):
+                os.remove(snapshot)
+            try:
+                os.link(self.csv, snapshot)
+            except OSError:
+                shutil.copy2(self.csv, snapshot)
+
+        cabecera = {
+            "base": list(base) if base else None,
+            "desde": desde,
+            "creado": datetime.now().isoformat(timespec="seconds"),
+        }
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(json.dumps(cabecera) + "\n")
+        os.replace(temporal, self.ruta)
+        return cabecera
+
+    def siguiente(self):
+        # Número del próximo evento, siguiendo la numeración del segmento activo o del último
+        # del historial
+        cabecera, cantidad = self._estado()
+        if cabecera is not None:
+            return cabecera["desde"] + cantidad
+        segmentos = self.segmentos()
+        if not segmentos:
+            return 0
+        _, eventos = self._leer_segmento(os.path.join(self.historial, f"{self.nombre}-{segmentos[-1]}.jsonl"))
+        return segmentos[-1] + len(eventos)
+
+    def rotar(self, base):
+        # El segmento activo pasa al historial y se abre uno nuevo sobre el CSV actual. Se llama
+        # después de reescribir el CSV con todos los eventos aplicados (compactación) o cuando
+        # el CSV se reemplazó por otro (restauración, edición a mano)
+        desde = self.siguiente()
+        cabecera, _ = self._estado()
+        if cabecera is not None:
+            os.makedirs(self.historial, exist_ok=True)
+            os.replace(self.ruta, os.path.join(self.historial, f"{self.nombre}-{cabecera['desde']}.jsonl"))
+        self._conteo = None
+        self._abrir_segmento(desde, base)
+        self._podar()
+
+    def _podar(self):
+        for desde in self.segmentos()[:-CONSERVAR_SEGMENTOS]:
+            for extension in ("csv", "jsonl"):
+                ruta = os.path.join(self.historial, f"{self.nombre}-{desde}.{extension}")
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+
+    # -------- HISTORIAL --------
+    def segmentos(self):
+        # Números "desde" de los segmentos del historial y del activo, del más viejo al más
+        # nuevo. El activo se agrega por su cabecera: si la tabla no existía cuando se abrió, no
+        # tiene snapshot en el historial
+        cabecera, _ = self._estado()
+        numeros = {cabecera["desde"]} if cabecera is not None else set()
+        if not os.path.isdir(self.historial):
+            return sorted(numeros)
+        prefijo = f"{self.nombre}-"
+        for archivo in os.listdir(self.historial):
+            base, _ = os.path.splitext(archivo)
+            if base.startswith(prefijo) and base[len(prefijo):].isdigit():
+                numeros.add(int(base[len(prefijo):]))
+        return sorted(numeros)
+
+    def segmento(self, desde):
+        # (ruta del snapshot o None, cabecera, eventos) de un segmento; el activo se busca por
+        # su cabecera porque todavía no está en el historial
+        snapshot = os.path.join(self.historial, f"{self.nombre}-{desde}.csv")
+        cabecera, eventos = self.leer()
+        if cabecera is None or cabecera["desde"] != desde:
+            cabecera, eventos = self._leer_segmento(os.path.join(self.historial, f"{self.nombre}-{desde}.jsonl"))
+        return (snapshot if os.path.exists(snapshot) else None), cabecera, eventos
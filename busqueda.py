@@ -0,0 +1,326 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from datos import (
+    BITACORAS,
+    PROYECTOS_ARCHIVO_CSV,
+    PROYECTOS_CSV,
+    REPOSITORIO,
+    cargar_con_firma,
+    obtener_registro,
+    firma_archivo,
+    firma_tabla,
+    hay_archivo,
+    ruta_recurso,
+    suscribir,
+)
+
+
+# ------------------ CONFIG ------------------
+# Índices de comentarios guardados en disco (tabla activa y archivo), para no volver a
+# tokenizarlos al arrancar
+INDICE_COMENTARIOS_PATH = ruta_recurso("data/indice_comentarios.pkl")
+INDICE_COMENTARIOS_ARCHIVO_PATH = ruta_recurso("data/indice_comentarios_archivo.pkl")
+VERSION_INDICE = 2      # 2: postings por id del proyecto (antes por código de orden)
+
+# Parámetros de BM25: saturación de la frecuencia del término y peso del largo del comentario
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Caracteres de contexto que se muestran alrededor de la coincidencia
+LARGO_FRAGMENTO = 120
+
+# Columnas que se leen de cada proyecto encontrado para mostrarlo
+COLUMNAS_RESULTADO = ["codigo_orden", "nombre_proyecto", "comentarios"]
+
+
+# ------------------ TEXTO ------------------
+_PALABRA = re.compile(r"\w+")
+_ACENTOS = re.compile(r"[\u0300-\u036f]")
+
+
+def normalizar_texto(texto):
+    # Minúsculas y sin acentos: "Cocina Integral de ROBLE" y "cocina íntegral de roble" dan
+    # los mismos términos
+    return _ACENTOS.sub("", unicodedata.normalize("NFKD", str(texto).lower()))
+
+
+def tokenizar(texto):
+    return _PALABRA.findall(normalizar_texto(texto))
+
+
+def fragmento(texto, terminos, largo=LARGO_FRAGMENTO):
+    # Trozo del comentario alrededor de la primera coincidencia. Devuelve (fragmento, inicio,
+    # fin), con inicio y fin de la palabra encontrada dentro del fragmento (o None)
+    texto = str(texto)
+    normal, origen = [], []
+    for i, caracter in enumerate(texto):      # Posición en el texto original de cada carácter normalizado
+        for n in normalizar_texto(caracter):
+            normal.append(n)
+            origen.append(i)
+
+    patron = r"\b(" + "|".join(re.escape(t) for t in sorted(terminos, key=len, reverse=True)) + r")\b"
+    encontrado = re.search(patron, "".join(normal))
+    if encontrado is None:
+        return texto[:largo] + ("…" if len(texto) > largo else ""), None, None
+
+    ini, fin = origen[encontrado.start()], origen[encontrado.end() - 1] + 1
+    desde = max(0, ini - (largo - (fin - ini)) // 2)
+    hasta = min(len(texto), desde + largo)
+    desde = max(0, hasta - largo)
+
+    prefijo = "…" if desde > 0 else ""
+    sufijo = "…" if hasta < len(texto) else ""
+    return prefijo + texto[desde:hasta] + sufijo, len(prefijo) + ini - desde, len(prefijo) + fin - desde
+
+
+# ------------------ ÍNDICE INVERTIDO DE COMENTARIOS ------------------
+# Términos de los comentarios de proyectos -> {id: apariciones}, para buscar con ranking BM25
+# sin recorrer los textos. Se indexa por el id interno, que no cambia: editar el código de orden
+# no toca el índice y dos proyectos con el mismo código (un CSV viejo) no se pisan. Como las estadísticas, se arma una vez y después se
+# corrige con cada alta, edición o baja (los proyectos en la papelera no se indexan).
+#
+# Cada partición de proyectos tiene su índice: el de la tabla activa se arma al arrancar y el del
+# archivo recién la primera vez que se buscan comentarios incluyendo los archivados.
+#
+# Se guarda en disco al armarlo y cada vez que se compacta la bitácora de su partición, junto
+# con la versión del CSV y el número de evento que incluye. Al arrancar, si el CSV es el mismo, se
+# carga el guardado y solo se reindexan los proyectos que tocaron los eventos posteriores.
+class IndiceComentarios:
+    def __init__(self, ruta, archivo):
+        self.ruta = ruta
+        self.archivo = archivo
+        self._lock = threading.Lock()
+        self._firma = None
+        self._vigente = False
+        self._postings = {}     # termino -> {id: apariciones}
+        self._terminos = {}     # id -> términos del comentario (para quitarlo sin re-tokenizar)
+        self._largos = {}       # id -> cantidad de palabras
+        self._total = 0         # Suma de largos
+
+    # -------- MANTENIMIENTO --------
+    def _quitar(self, ids):
+        for id_proyecto in ids:
+            terminos = self._terminos.pop(id_proyecto, None)
+            if terminos is None:
+                continue
+            for termino in terminos:
+                postings = self._postings[termino]
+                del postings[id_proyecto]
+                if not postings:
+                    del self._postings[termino]
+            self._total -= self._largos.pop(id_proyecto)
+
+    def _agregar(self, filas):
+        if filas is None:
+            return
+        filas = filas[filas["eliminado_en"].isna() & (filas["comentarios"] != "")]
+        for id_proyecto, comentario in zip(filas["id"].astype(str), filas["comentarios"]):
+            self._quitar([id_proyecto])
+            apariciones = Counter(tokenizar(comentario))
+            if not apariciones:
+                continue
+            for termino, cantidad in apariciones.items():
+                self._postings.setdefault(termino, {})[id_proyecto] = cantidad
+            self._terminos[id_proyecto] = tuple(apariciones)
+            largo = sum(apariciones.values())
+            self._largos[id_proyecto] = largo
+            self._total += largo
+
+    def _instalar(self, otro, firma):
+        self._postings, self._terminos = otro._postings, otro._terminos
+        self._largos, self._total = otro._largos, otro._total
+        self._firma = firma
+        self._vigente = True
+
+    def _estado_actual(self):
+        # Tabla, versión y punto de la bitácora leídos juntos, sin que se cuele un cambio
+        with REPOSITORIO.lock:
+            df, firma = cargar_con_firma(self.archivo)
+            bitacora = BITACORAS[self.archivo]
+            _, eventos = bitacora.leer()
+            return df, firma, firma_archivo(self.archivo), bitacora.siguiente(), eventos
+
+    def reconstruir(self):
+        # La tokenización se hace fuera de los locks; los cambios que lleguen mientras tanto
+        # dejan el índice marcado para rehacer, igual que en las estadísticas
+        df, firma, base, siguiente, _ = self._estado_actual()
+        nuevo = IndiceComentarios(self.ruta, self.archivo)
+        nuevo._agregar(df)
+        with self._lock:
+            self._instalar(nuevo, firma)
+            self._guardar(base, siguiente)
+
+    def cargar(self):
+        # Usa el índice guardado si corresponde al CSV actual. Devuelve True si lo pudo usar
+        try:
+            with open(self.ruta, "rb") as f:
+                guardado = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return False
+
+        df, firma, base, _, eventos = self._estado_actual()
+        if guardado.get("version") != VERSION_INDICE or guardado["base"] != base:
+            return False
+
+        nuevo = IndiceComentarios(self.ruta, self.archivo)
+        nuevo._postings, nuevo._terminos = guardado["postings"], guardado["terminos"]
+        nuevo._largos, nuevo._total = guardado["largos"], guardado["total"]
+
+        # Proyectos tocados por los eventos que el índice guardado no incluye: las filas nuevas
+        # o las de antes del cambio, que llevan su id (y el id no cambia)
+        tocados = set()
+        for evento in eventos:
+            if evento["n"] < guardado["n"]:
+                continue
+            filas = evento["filas"] if evento["op"] == "insertar" else evento["antes"]
+            tocados.update(str(fila["id"]) for fila in filas if fila.get("id"))
+        if tocados:
+            nuevo._quitar(tocados)
+            nuevo._agregar(df[df["id"].astype(str).isin(tocados)])
+
+        with self._lock:
+            self._instalar(nuevo, firma)
+        return True
+
+    def _guardar(self, base, n):
+        # Se llama con self._lock tomado. Un proceso de solo lectura (la API) no escribe nada
+        if REPOSITORIO.solo_lectura:
+            return
+        datos = {
+            "version": VERSION_INDICE,
+            "base": base,
+            "n": n,
+            "postings": self._postings,
+            "terminos": self._terminos,
+            "largos": self._largos,
+            "total": self._total,
+        }
+        temporal = f"{self.ruta}.tmp"
+        try:
+            with open(temporal, "wb") as f:
+                pickle.dump(datos, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, self.ruta)
+        except OSError:
+            pass      # Sin el archivo solo se pierde el arranque rápido
+
+    def aplicar(self, cambio):
+        # Suscriptor de datos.py. Un cambio sin filas es una compactación: el CSV ya tiene todo
+        # lo indexado, así que es el momento de guardar el índice
+        if cambio.archivo != self.archivo:
+            return
+
+        with self._lock:
+            if not self._vigente or self._firma != cambio.firma_previa:
+                self._vigente = False
+                return
+            if cambio.antes is None and cambio.despues is None:
+                self._guardar(firma_archivo(self.archivo), BITACORAS[self.archivo].siguiente())
+            if cambio.antes is not None:
+                self._quitar(cambio.antes["id"].astype(str))
+            self._agregar(cambio.despues)
+            self._firma = cambio.firma_nueva
+
+    def _asegurar(self):
+        if self._vigente and self._firma == firma_tabla(self.archivo):
+            return
+        if self._firma is not None or not self.cargar():      # El guardado solo sirve al arrancar
+            self.reconstruir()
+
+    def preparar(self):
+        # Deja el índice listo antes de la primera búsqueda (precarga del arranque)
+        self._asegurar()
+
+    # -------- CONSULTA --------
+    def estadisticas(self, terminos):
+        # (documentos, palabras, {termino: documentos que lo contienen}) para armar el BM25 de
+        # una búsqueda que junta varios índices
+        self._asegurar()
+        with self._lock:
+            return len(self._largos), self._total, {t: len(self._postings.get(t, ())) for t in terminos}
+
+    def puntuar(self, terminos, documentos, promedio, frecuencias, puntajes):
+        # Suma en puntajes {id: puntaje} el BM25 de los proyectos de este índice, con las
+        # estadísticas de todos los índices consultados
+        with self._lock:
+            for termino in terminos:
+                postings = self._postings.get(termino)
+                if not postings:
+                    continue
+                con_termino = max(frecuencias.get(termino, 0), len(postings))
+                idf = math.log(1 + (documentos - con_termino + 0.5) / (con_termino + 0.5))
+                for id_proyecto, frecuencia in postings.items():
+                    norma = BM25_K1 * (1 - BM25_B + BM25_B * self._largos[id_proyecto] / promedio)
+                    puntajes[id_proyecto] += idf * frecuencia * (BM25_K1 + 1) / (frecuencia + norma)
+
+
+# Instancias únicas del proceso, compartidas por todas las sesiones
+INDICE_COMENTARIOS = IndiceComentarios(INDICE_COMENTARIOS_PATH, PROYECTOS_CSV)
+INDICE_COMENTARIOS_ARCHIVO = IndiceComentarios(INDICE_COMENTARIOS_ARCHIVO_PATH, PROYECTOS_ARCHIVO_CSV)
+suscribir(INDICE_COMENTARIOS.aplicar)
+suscribir(INDICE_COMENTARIOS_ARCHIVO.aplicar)
+
+
+def indices_comentarios(incluir_archivo=False):
+    # Sin CSV de archivo no hay nada archivado y su índice no se arma
+    if incluir_archivo and hay_archivo(PROYECTOS_CSV):
+        return [INDICE_COMENTARIOS, INDICE_COMENTARIOS_ARCHIVO]
+    return [INDICE_COMENTARIOS]
+
+
+def rankear(texto, limite=20, incluir_archivo=False):
+    # [(id, puntaje)] de mayor a menor y la cantidad de proyectos que coinciden. Con el archivo
+    # las estadísticas (documentos, largo promedio, frecuencia de cada término) son las de las
+    # dos particiones juntas, así un proyecto puntúa igual que si estuvieran en una sola tabla
+    terminos = list(dict.fromkeys(tokenizar(texto)))
+    if not terminos:
+        return [], 0
+
+    indices = indices_comentarios(incluir_archivo)
+    documentos, palabras, frecuencias = 0, 0, Counter()
+    for indice in indices:
+        n, total, por_termino = indice.estadisticas(terminos)
+        documentos += n
+        palabras += total
+        frecuencias.update(por_termino)
+    if not documentos:
+        return [], 0
+
+    puntajes = defaultdict(float)
+    for indice in indices:
+        indice.puntuar(terminos, documentos, palabras / documentos, frecuencias, puntajes)
+    mejores = heapq.nlargest(limite, puntajes.items(), key=lambda p: p[1])
+    return mejores, len(puntajes)
+
+
+def buscar_comentarios(texto, limite=20, incluir_archivo=False):
+    # Proyectos cuyo comentario coincide con texto, ordenados por relevancia, con el fragmento
+    # donde aparece. Devuelve los resultados (hasta limite) y el total de coincidencias
+    mejores, total = rankear(texto, limite, incluir_archivo)
+    if not mejores:
+        return [], total
+
+    terminos = set(tokenizar(texto))
+    resultados = []
+    for id_proyecto, puntaje in mejores:
+        # Solo los proyectos mostrados leen su comentario completo, buscándolos por id; el
+        # código y el nombre se leen ahí, así muestran el valor vigente
+        proyecto = obtener_registro(PROYECTOS_CSV, id_proyecto, COLUMNAS_RESULTADO, "id")
+        if proyecto is None:
+            continue
+        texto_fragmento, inicio, fin = fragmento(proyecto["comentarios"], terminos)
+        resultados.append({
+            "tipo": "Proyecto",
+            "nombre": proyecto["nombre_proyecto"],
+            "codigo": str(proyecto["codigo_orden"]),
+            "fragmento": texto_fragmento,
+            "resaltado": [inicio, fin] if inicio is not None else None,
+            "puntaje": round(puntaje, 4),
+        })
+    return resultados, total
@@ -0,0 +1,405 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------ PRUEBA DE CARGA ------------------
+# Simula varias sesiones de la aplicación a la vez sobre un conjunto de datos sintético y mide
+# cuánto tarda cada rerun de Streamlit, para saber cuántos usuarios aguanta un servidor y
+# detectar cambios que lo vuelvan más lento. Cada sesión es un AppTest (streamlit.testing) que
+# corre main.py en su propio proceso: AppTest guarda su runtime en una variable global, así que
+# dentro de un mismo proceso dos reruns no pueden correr a la vez. Las sesiones comparten los
+# CSV y las imágenes de la carpeta de prueba, como varios procesos del servidor, y las
+# escrituras se ordenan con el bloqueo entre procesos del repositorio.
+#
+#   python carga.py --sesiones 8 --iteraciones 25
+#   python carga.py --sesiones 8 --guardar-base carga_base.json
+#   python carga.py --sesiones 8 --base carga_base.json
+#
+# Los datos se generan en una carpeta temporal (o en --carpeta, que se puede reutilizar con
+# --reutilizar); nunca se tocan los de la aplicación. Con --base termina con código 1 si algún
+# flujo empeoró respecto de la línea base.
+#
+# Flujos: buscar en la página de inicio, abrir el perfil de un cliente, abrir el perfil de un
+# proyecto, abrir un proyecto con imágenes (la galería se arma en ese rerun; pasar de imagen
+# ocurre en el navegador y no genera reruns) y guardar la edición de un proyecto.
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+RAIZ = os.path.dirname(APP)
+
+
+# ------------------ CONFIG ------------------
+# Peso de cada flujo en la mezcla de cada sesión
+PESOS_FLUJOS = {
+    "buscar": 4,
+    "perfil_cliente": 3,
+    "perfil_proyecto": 3,
+    "galeria": 2,
+    "editar": 1,
+}
+
+PERCENTILES = (50, 95, 99)
+
+# Un percentil cuenta como regresión si supera la línea base en esta proporción y además en
+# estos milisegundos (así el ruido de los flujos de pocos milisegundos no se marca)
+TOLERANCIA_REGRESION = 0.20
+MINIMO_REGRESION_MS = 5.0
+
+# Imágenes por proyecto con imágenes y su tamaño en píxeles
+IMAGENES_POR_PROYECTO = 4
+TAMANO_IMAGEN = (1600, 1200)
+
+NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Pedro", "Sofía", "Diego", "Elena", "Andrés"]
+APELLIDOS = ["Pérez", "Gómez", "Rodríguez", "Fernández", "López", "Díaz", "Martínez", "Sánchez", "Romero", "Vargas"]
+TIPOS_PROYECTO = ["Cocina", "Closet", "Baño", "Mueble TV", "Escritorio", "Biblioteca", "Puerta", "Vestier"]
+PALABRAS = [
+    "roble", "melamina", "cedro", "pino", "laca", "blanco", "negro", "vidrio", "herrajes", "bisagras",
+    "cajones", "manijas", "mesón", "granito", "cuarzo", "entrega", "instalación", "medidas", "ajuste",
+    "pintura", "barniz", "espejo", "iluminación", "led", "rústico", "moderno", "esquinero", "repisa",
+]
+
+# Los procesos de las sesiones arrancan de cero (spawn): no heredan los módulos de la
+# aplicación que el proceso principal ya importó contra la carpeta de prueba
+CONTEXTO_PROCESOS = multiprocessing.get_context("spawn")
+
+
+# ------------------ DATOS SINTÉTICOS ------------------
+def generar_datos(clientes, proyectos, con_imagenes, semilla):
+    # Escribe los CSV y las imágenes en la carpeta actual, con la misma estructura que la
+    # aplicación
+    from datos import (
+        CLIENTES_CSV,
+        ESQUEMAS,
+        IMG_PROYECTOS_DIR,
+        PROYECTOS_CSV,
+        aplicar_esquema,
+        escribir_tabla,
+    )
+    from PIL import Image
+
+    rng = np.random.default_rng(semilla)
+    ids = np.array([f"{i:016x}" for i in range(clientes)])       # ids internos
+    nacimiento = pd.Timestamp("1950-01-01") + pd.to_timedelta(rng.integers(0, 20000, clientes), unit="D")
+    df_clientes = pd.DataFrame({
+        "id": ids,
+        "cliente_id": [f"C{i:06d}" for i in range(clientes)],
+        "nombre": rng.choice(NOMBRES, clientes),
+        "apellido": rng.choice(APELLIDOS, clientes),
+        "direccion": [f"Calle {n} # {m}" for n, m in zip(rng.integers(1, 200, clientes), rng.integers(1, 99, clientes))],
+        "imagen_path": "",
+        "fecha_nacimiento": nacimiento,
+    })
+
+    codigos = np.array([f"OC-{i:07d}" for i in range(proyectos)])
+    inicio = pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(0, 3 * 365, proyectos), unit="D")
+    fin = pd.Series(inicio + pd.to_timedelta(rng.integers(5, 120, proyectos), unit="D"))
+    fin[rng.random(proyectos) < 0.2] = pd.NaT       # Uno de cada cinco sigue en proceso
+    df_proyectos = pd.DataFrame({
+        "id": [f"{i + clientes:016x}" for i in range(proyectos)],
+        "codigo_orden": codigos,
+        "nombre_proyecto": [f"{t} {n}" for t, n in zip(rng.choice(TIPOS_PROYECTO, proyectos), rng.integers(1, 500, proyectos))],
+        "cliente": rng.choice(ids, proyectos),
+        "fecha_inicio": inicio,
+        "fecha_fin": fin,
+        "imagenes_paths": "",
+        "comentarios": [" ".join(rng.choice(PALABRAS, n)) for n in rng.integers(3, 25, proyectos)],
+    })
+
+    # Imágenes de los primeros proyectos, con ruido para que pesen como fotos reales
+    con_imagenes = min(con_imagenes, proyectos)
+    for i, codigo in enumerate(codigos[:con_imagenes]):
+        rutas = []
+        for n in range(IMAGENES_POR_PROYECTO):
+            ruta = os.path.join(IMG_PROYECTOS_DIR, f"{codigo}_{n}.jpg")
+            pixeles = rng.integers(0, 256, (TAMANO_IMAGEN[1] // 8, TAMANO_IMAGEN[0] // 8, 3), dtype=np.uint8)
+            Image.fromarray(pixeles).resize(TAMANO_IMAGEN).save(ruta, quality=85)
+            rutas.append(ruta)
+        df_proyectos.at[i, "imagenes_paths"] = ",".join(rutas)
+
+    escribir_tabla(aplicar_esquema(df_clientes.astype(str), ESQUEMAS[CLIENTES_CSV]), CLIENTES_CSV)
+    escribir_tabla(aplicar_esquema(df_proyectos.astype(str), ESQUEMAS[PROYECTOS_CSV]), PROYECTOS_CSV)
+
+
+def claves_de_prueba():
+    # Claves que eligen los flujos al azar: clientes, proyectos sin y con imágenes y palabras
+    from datos import cargar_clientes, cargar_proyectos
+
+    clientes = cargar_clientes(["cliente_id"])
+    proyectos = cargar_proyectos(["codigo_orden", "imagenes_paths"])
+    con_imagenes = proyectos["imagenes_paths"] != ""
+    return {
+        "clientes": clientes["cliente_id"].tolist(),
+        "proyectos": proyectos.loc[~con_imagenes, "codigo_orden"].tolist(),
+        "con_imagenes": proyectos.loc[con_imagenes, "codigo_orden"].tolist(),
+        "busquedas": NOMBRES + APELLIDOS + TIPOS_PROYECTO + ["OC-00", "C0001"],
+    }
+
+
+def preparar_carpeta(carpeta):
+    # Lo que main.py necesita además de los datos: carpeta data, logo, imagen por defecto y componentes
+    os.makedirs(os.path.join(carpeta, "data"), exist_ok=True)
+    for relativa in ("assets/LOGO_DCC.png", "assets/sin_imagen.png"):
+        destino = os.path.join(carpeta, relativa)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if os.path.exists(os.path.join(RAIZ, relativa)) and not os.path.exists(destino):
+            shutil.copy2(os.path.join(RAIZ, relativa), destino)
+    if not os.path.exists(os.path.join(carpeta, "componentes")):
+        shutil.copytree(os.path.join(RAIZ, "componentes"), os.path.join(carpeta, "componentes"))
+
+
+# ------------------ SESIONES ------------------
+class Sesion:
+    def __init__(self, claves, semilla):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP, default_timeout=300)
+        self.claves = claves
+        self.azar = random.Random(semilla)
+
+    def correr(self):
+        # Un rerun; devuelve lo que tardó en segundos
+        inicio = time.perf_counter()
+        self.at.run()
+        fin = time.perf_counter()
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+        return fin - inicio
+
+    def ir(self, pagina, **estado):
+        self.at.session_state["pagina"] = pagina
+        for clave, valor in estado.items():
+            self.at.session_state[clave] = valor
+        return self.correr()
+
+    # -------- FLUJOS --------
+    # Cada flujo devuelve la duración de cada rerun que hizo
+    def buscar(self):
+        tiempos = [self.ir("inicio")]
+        self.at.text_input[0].input(self.azar.choice(self.claves["busquedas"]))
+        tiempos.append(self.correr())
+        return tiempos
+
+    def perfil_cliente(self):
+        codigo = self.azar.choice(self.claves["clientes"])
+        return [self.ir("perfil", seleccion={"tipo": "Cliente", "codigo": codigo})]
+
+    def perfil_proyecto(self):
+        codigo = self.azar.choice(self.claves["proyectos"] or self.claves["con_imagenes"])
+        return [self.ir("perfil", seleccion={"tipo": "Proyecto", "codigo": codigo})]
+
+    def galeria(self):
+        codigo = self.azar.choice(self.claves["con_imagenes"] or self.claves["proyectos"])
+        return [self.ir("perfil", seleccion={"tipo": "Proyecto", "codigo": codigo})]
+
+    def editar(self):
+        from datos import obtener_proyecto
+
+        codigo = self.azar.choice(self.claves["proyectos"] or self.claves["con_imagenes"])
+        id_proyecto = obtener_proyecto(codigo, ["id"])["id"]      # La página de edición recibe el id
+        tiempos = [self.ir("editar_proyecto", editar_id_proyecto=id_proyecto)]
+        self.at.text_area[0].input(" ".join(self.azar.sample(PALABRAS, 6)))
+        tiempos.append(self.correr())
+        next(b for b in self.at.button if b.label == "Guardar cambios").click()
+        tiempos.append(self.correr())
+        return tiempos
+
+
+def simular_sesion(carpeta, numero, claves, iteraciones, semilla):
+    # Una sesión, en su propio proceso: primero pasa una vez por cada flujo sin medir (carga de
+    # tablas e índices) y después elige flujos al azar según su peso. Devuelve (mediciones,
+    # errores, inicio, fin), con inicio y fin de la parte medida en segundos de reloj
+    os.chdir(carpeta)
+    sys.path.insert(0, RAIZ)
+    from streamlit import config, logger
+    config.set_option("logger.level", "error")      # Sin avisos de Streamlit en el reporte
+    logger.set_log_level("error")
+
+    mediciones, errores = [], []
+    sesion = Sesion(claves, semilla + numero)
+    for flujo in PESOS_FLUJOS:
+        try:
+            getattr(sesion, flujo)()
+        except Exception as e:
+            errores.append((flujo, str(e)))
+
+    flujos, pesos = list(PESOS_FLUJOS), list(PESOS_FLUJOS.values())
+    comienzo = time.time()
+    for _ in range(iteraciones):
+        flujo = sesion.azar.choices(flujos, pesos)[0]
+        inicio = time.perf_counter()
+        try:
+            reruns = getattr(sesion, flujo)()
+        except Exception as e:
+            errores.append((flujo, str(e)))
+            continue
+        mediciones.append((flujo, reruns, time.perf_counter() - inicio))
+    final = time.time()
+
+    esperar_guardados()      # La cola de trabajos es de este proceso y muere con él
+    return mediciones, errores, comienzo, final
+
+
+def ejecutar(carpeta, sesiones, iteraciones, claves, semilla):
+    # Corre las sesiones en paralelo, un proceso por sesión. Devuelve (mediciones, errores,
+    # segundos de la corrida); los segundos van desde que la primera sesión empezó a medir hasta
+    # que terminó la última, sin contar el arranque de los procesos
+    mediciones, errores, comienzos, finales = [], [], [], []
+    with ProcessPoolExecutor(max_workers=sesiones, mp_context=CONTEXTO_PROCESOS) as ejecutor:
+        futuros = [
+            ejecutor.submit(simular_sesion, carpeta, n, claves, iteraciones, semilla)
+            for n in range(sesiones)
+        ]
+        for futuro in futuros:
+            medidas, fallas, comienzo, final = futuro.result()
+            mediciones += medidas
+            errores += fallas
+            comienzos.append(comienzo)
+            finales.append(final)
+    return mediciones, errores, max(finales) - min(comienzos)
+
+
+def esperar_guardados(limite=60):
+    # Los guardados siguen en la cola de trabajos después del último rerun; se esperan antes
+    # de que termine el proceso de la sesión
+    from trabajos import COLA_TRABAJOS
+
+    fin = time.monotonic() + limite
+    while COLA_TRABAJOS.pendientes() and time.monotonic() < fin:
+        time.sleep(0.1)
+
+
+# ------------------ REPORTE ------------------
+def resumir(mediciones, segundos):
+    # {flujo: {"flujos", "reruns", "p50", "p95", "p99" (ms por rerun), "por_segundo" (flujos)}}
+    resumen = {}
+    for flujo in PESOS_FLUJOS:
+        reruns = np.array([r for f, tiempos, _ in mediciones if f == flujo for r in tiempos]) * 1000
+        if not len(reruns):
+            continue
+        flujos = sum(f == flujo for f, _, _ in mediciones)
+        percentiles = np.percentile(reruns, PERCENTILES)
+        resumen[flujo] = {
+            "flujos": flujos,
+            "reruns": len(reruns),
+            **{f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, percentiles)},
+            "por_segundo": round(flujos / segundos, 2),
+        }
+    return resumen
+
+
+def imprimir(resumen, segundos, errores):
+    columnas = "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+    print(f"{'flujo':<16}{'flujos':>8}{'reruns':>8}{columnas}{'flujos/s':>10}")
+    for flujo, datos in resumen.items():
+        valores = "".join(f"{datos[f'p{p}']:>10.1f}" for p in PERCENTILES)
+        print(f"{flujo:<16}{datos['flujos']:>8}{datos['reruns']:>8}{valores}{datos['por_segundo']:>10.2f}")
+    total = sum(d["flujos"] for d in resumen.values())
+    print(f"{total} flujos en {segundos:.1f} s ({total / segundos:.2f} flujos/s)")
+
+    if errores:
+        print(f"{len(errores)} flujos con error:")
+        for flujo, error in errores[:10]:
+            print(f"  {flujo}: {error}")
+
+
+def comparar(resumen, base):
+    # Percentiles que empeoraron respecto de la línea base: [(flujo, percentil, base, actual)]
+    regresiones = []
+    for flujo, datos in resumen.items():
+        anterior = base.get("flujos", {}).get(flujo)
+        if anterior is None:
+            continue
+        for clave in [f"p{p}" for p in PERCENTILES]:
+            if clave in anterior and datos[clave] > anterior[clave] * (1 + TOLERANCIA_REGRESION) \
+                    and datos[clave] - anterior[clave] > MINIMO_REGRESION_MS:
+                regresiones.append((flujo, clave, anterior[clave], datos[clave]))
+    return regresiones
+
+
+# ------------------ LÍNEA DE COMANDOS ------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga con varias sesiones simuladas")
+    parser.add_argument("--sesiones", type=int, default=4, help="Sesiones simultáneas")
+    parser.add_argument("--iteraciones", type=int, default=20, help="Flujos medidos por sesión")
+    parser.add_argument("--clientes", type=int, default=5000)
+    parser.add_argument("--proyectos", type=int, default=25000)
+    parser.add_argument("--con-imagenes", type=int, default=50, help="Proyectos con imágenes")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--carpeta", help="Carpeta para los datos sintéticos (por defecto, una temporal)")
+    parser.add_argument("--reutilizar", action="store_true", help="Usa los datos que ya estén en --carpeta")
+    parser.add_argument("--base", help="JSON con la línea base contra la que se compara")
+    parser.add_argument("--guardar-base", help="Guarda el resultado como línea base en este JSON")
+    args = parser.parse_args(argv)
+
+    # Las rutas de los JSON se resuelven antes de cambiar de carpeta: son relativas a donde se
+    # llamó el comando
+    ruta_base = os.path.abspath(args.base) if args.base else None
+    ruta_guardar = os.path.abspath(args.guardar_base) if args.guardar_base else None
+    original = os.getcwd()
+
+    carpeta = os.path.abspath(args.carpeta or tempfile.mkdtemp(prefix="dcc-carga-"))
+    temporal = args.carpeta is None
+    os.makedirs(carpeta, exist_ok=True)
+    preparar_carpeta(carpeta)
+
+    # Las rutas de datos.py se resuelven contra la carpeta actual al importarlo, así que la
+    # aplicación se importa recién después de pararse en la carpeta de prueba (lo mismo hace
+    # cada sesión en su proceso)
+    os.chdir(carpeta)
+    sys.path.insert(0, RAIZ)
+
+    parametros = {
+        "sesiones": args.sesiones,
+        "iteraciones": args.iteraciones,
+        "clientes": args.clientes,
+        "proyectos": args.proyectos,
+        "con_imagenes": args.con_imagenes,
+    }
+    try:
+        if not (args.reutilizar and os.path.exists(os.path.join(carpeta, "data", "proyectos.csv"))):
+            inicio = time.perf_counter()
+            generar_datos(args.clientes, args.proyectos, args.con_imagenes, args.semilla)
+            print(f"Datos sintéticos en {carpeta}: {time.perf_counter() - inicio:.1f} s")
+
+        claves = claves_de_prueba()
+        print(f"{args.sesiones} sesiones x {args.iteraciones} flujos sobre {len(claves['clientes'])} clientes "
+              f"y {len(claves['proyectos']) + len(claves['con_imagenes'])} proyectos")
+        mediciones, errores, segundos = ejecutar(carpeta, args.sesiones, args.iteraciones, claves, args.semilla)
+    finally:
+        os.chdir(original)
+        if temporal:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    resumen = resumir(mediciones, segundos)
+    imprimir(resumen, segundos, errores)
+
+    if ruta_guardar:
+        with open(ruta_guardar, "w", encoding="utf-8") as f:
+            json.dump({"parametros": parametros, "flujos": resumen}, f, ensure_ascii=False, indent=1)
+        print(f"Línea base guardada en {ruta_guardar}")
+
+    if ruta_base:
+        with open(ruta_base, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("parametros") != parametros:
+            print("Aviso: la línea base se tomó con otros parámetros; la comparación es orientativa")
+        regresiones = comparar(resumen, base)
+        for flujo, percentil, anterior, actual in regresiones:
+            print(f"REGRESIÓN {flujo} {percentil}: {anterior:.1f} ms -> {actual:.1f} ms")
+        if regresiones:
+            return 1
+        print("Sin regresiones respecto de la línea base")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from datos import (
+    CLAVES,
+    CLIENTES_CSV,
+    ESQUEMAS,
+    PROYECTOS_CSV,
+    PROYECTOS_ARCHIVO_CSV,
+    aplicar_esquema,
+    buscar,
+    cargar_clientes,
+    cargar_con_firma,
+    cargar_proyectos,
+    cargar_tabla,
+    claves_normalizadas,
+    compactar_tablas,
+    con_cliente_id,
+    conteo_proyectos_por_cliente,
+    desarchivar_proyectos,
+    escribir_tabla,
+    eventos_desde,
+    insertar_registros,
+    invalidar_cache,
+    listar_clientes,
+    listar_proyectos,
+    particiones,
+    reconstruir_tabla,
+    registros,
+    resolver_clientes,
+)
+from busqueda import indices_comentarios
+from estadisticas import ESTADISTICAS
+from integridad import REVISION, problemas_encontrados, reparables
+from respaldo import (
+    crear_backup_zip,
+    limpiar_imagenes_huerfanas,
+    listar_snapshots,
+    restaurar_backup,
+    tomar_snapshot,
+)
+from trabajos import MESES_ARCHIVO, VENTANA_DESHACER_MIN, archivar_vencidos, purgar_eliminados
+
+
+# ------------------ LÍNEA DE COMANDOS ------------------
+# Operaciones por lotes sin levantar Streamlit, pensadas para cron o el Programador de tareas.
+# Usan las mismas funciones que main.py. Se ejecutan desde la carpeta de la aplicación:
+#
+#   python cli.py backup --salida respaldos/
+#   python cli.py restore backup_datos.zip
+#   python cli.py restore --snapshot 20240501-080000
+#   python cli.py snapshot
+#   python cli.py gc --simular
+#   python cli.py purge --minutos 0
+#   python cli.py archivar --meses 18
+#   python cli.py archivar --desarchivar OC-1024 OC-1031
+#   python cli.py reindex
+#   python cli.py import nuevos_clientes.csv --tabla clientes
+#   python cli.py export --tabla proyectos --formato json --salida proyectos.json
+#   python cli.py verify --reparar
+#   python cli.py compactar
+#   python cli.py historial --tabla clientes --desde "2024-05-01 08:00"
+#   python cli.py reconstruir --tabla proyectos --momento "2024-05-02 17:30" --salida proyectos_antes.csv
+#
+# Cada comando informa tiempos y cantidades; verify termina con código 1 si encuentra problemas.
+TABLAS = {
+    "clientes": CLIENTES_CSV,
+    "proyectos": PROYECTOS_CSV,
+    "proyectos_archivo": PROYECTOS_ARCHIVO_CSV,
+}
+
+
+@contextmanager
+def cronometro(tarea):
+    inicio = time.perf_counter()
+    yield
+    print(f"{tarea}: {time.perf_counter() - inicio:.2f} s")
+
+
+def _mb(n_bytes):
+    return f"{n_bytes / 1_048_576:.1f} MB"
+
+
+# ------------------ COMANDOS ------------------
+def cmd_backup(args):
+    salida = args.salida or "."
+    if os.path.isdir(salida):
+        salida = os.path.join(salida, f"backup_datos_{datetime.now():%Y%m%d-%H%M%S}.zip")
+
+    tiempos = {}
+    crear_backup_zip(salida, tiempos)      # Directo al archivo, sin armar el ZIP en memoria
+    for fase, segundos in tiempos.items():
+        print(f"{fase}: {segundos:.2f} s")
+
+    with zipfile.ZipFile(salida) as zipf:
+        miembros = zipf.infolist()
+    guardados = sum(m.compress_type == zipfile.ZIP_STORED for m in miembros)
+    print(f"{salida}: {len(miembros)} archivos ({guardados} sin comprimir), {_mb(os.path.getsize(salida))}")
+    return 0
+
+
+def cmd_restore(args):
+    if bool(args.archivo) == bool(args.snapshot):
+        print("Indique un archivo ZIP o --snapshot, no ambos")
+        return 1
+    with cronometro("restore"):
+        restaurar_backup(args.archivo, snapshot=args.snapshot)
+    print(f"{len(cargar_clientes())} clientes y {len(cargar_proyectos())} proyectos restaurados")
+    return 0
+
+
+def cmd_snapshot(args):
+    if not args.listar:
+        with cronometro("snapshot"):
+            resultado = tomar_snapshot()
+        print(f"{resultado['nombre']}: {resultado['copiadas']} imágenes copiadas, {resultado['enlazadas']} enlazadas al anterior")
+
+    for nombre, _ in listar_snapshots():
+        print(f"  {nombre}")
+    return 0
+
+
+def cmd_gc(args):
+    with cronometro("gc"):
+        huerfanas = limpiar_imagenes_huerfanas(simular=args.simular)
+
+    for ruta in huerfanas:
+        print(("  sobra " if args.simular else "  borrada ") + ruta)
+    verbo = "se borrarían" if args.simular else "borradas"
+    print(f"{len(huerfanas)} imágenes huérfanas {verbo}")
+    return 0
+
+
+def cmd_purge(args):
+    with cronometro("purge"):
+        clientes, proyectos, imagenes = purgar_eliminados(args.minutos)
+    print(f"Purgados {clientes} clientes, {proyectos} proyectos y {imagenes} imágenes de la papelera")
+    return 0
+
+
+def cmd_archivar(args):
+    if args.desarchivar:
+        with cronometro("desarchivar"):
+            movidos = desarchivar_proyectos(args.desarchivar)
+        print(f"{movidos} proyectos devueltos a la tabla activa")
+        return 0
+
+    with cronometro("archivar"):
+        movidos = archivar_vencidos(args.meses)
+    print(
+        f"{movidos} proyectos archivados; activos: {len(cargar_proyectos())}, "
+        f"archivados: {len(cargar_tabla(PROYECTOS_ARCHIVO_CSV))}"
+    )
+    return 0
+
+
+def cmd_reindex(args):
+    invalidar_cache()
+
+    with cronometro("carga de tablas"):
+        clientes = cargar_clientes()
+        proyectos = cargar_proyectos()
+
+    with cronometro("índices de búsqueda y listados"):
+        buscar("x", limite=1)
+        conteo_proyectos_por_cliente()
+        listar_clientes()
+        listar_proyectos()
+
+    with cronometro("estadísticas"):
+        ESTADISTICAS.recalcular()
+
+    with cronometro("índice de comentarios"):
+        for indice in indices_comentarios(incluir_archivo=True):
+            indice.reconstruir()
+
+    print(f"{len(clientes)} clientes, {len(proyectos)} proyectos")
+    return 0
+
+
+def cmd_compactar(args):
+    with cronometro("compactación"):
+        compactar_tablas()
+    print("Bitácoras volcadas en los CSV")
+    return 0
+
+
+def cmd_historial(args):
+    archivo = TABLAS[args.tabla]
+    clave = CLAVES[archivo]
+    eventos = eventos_desde(archivo, args.desde)
+    for evento in eventos[-args.mostrar:] if args.mostrar else eventos:
+        claves = evento["claves"] if "claves" in evento else [f[clave] for f in evento["filas"]]
+        print(f"  #{evento['n']} {evento['t']} {evento['op']}: {', '.join(map(str, claves))}")
+    print(f"{len(eventos)} eventos en {args.tabla}")
+    return 0
+
+
+def cmd_reconstruir(args):
+    archivo = TABLAS[args.tabla]
+    try:
+        momento = pd.Timestamp(args.momento)
+        if pd.isna(momento):
+            raise ValueError(args.momento)
+    except ValueError:
+        print(f"Momento inválido: {args.momento} (se espera una fecha como \"2024-05-02 17:30\")")
+        return 1
+    salida = args.salida or f"{args.tabla}_{momento:%Y%m%d-%H%M%S}.csv"
+
+    with cronometro("reconstrucción"):
+        try:
+            df = reconstruir_tabla(archivo, args.momento)
+        except ValueError as e:
+            print(e)
+            return 1
+        escribir_tabla(df, archivo, salida)
+
+    print(f"{salida}: {len(df)} {args.tabla} al {args.momento}")
+    return 0
+
+
+def cmd_import(args):
+    archivo = TABLAS[args.tabla]
+    clave = CLAVES[archivo]
+
+    with cronometro("lectura"):
+        nuevos = aplicar_esquema(pd.read_csv(args.archivo, dtype=str), ESQUEMAS[archivo])
+
+    # Los ids son propios de cada instalación: las filas importadas reciben ids nuevos y los
+    # proyectos se enlazan con su cliente por la Cédula/NIT (cliente_id) si el archivo la trae
+    nuevos["id"] = ""
+    if "cliente" in ESQUEMAS[archivo] and "cliente_id" in nuevos.columns:
+        nuevos["cliente"] = pd.Categorical([""] * len(nuevos))
+        resolver_clientes(nuevos)
+
+    # Incluye la papelera y el archivo: esas claves siguen ocupadas
+    ocupadas = set()
+    for parte in particiones(archivo):
+        actual, _ = cargar_con_firma(parte)
+        ocupadas.update(claves_normalizadas(actual[clave]))
+    claves = claves_normalizadas(nuevos[clave])
+
+    sin_clave = claves == ""
+    repetidas = claves.duplicated() & ~sin_clave
+    existentes = claves.isin(ocupadas)
+    aceptadas = nuevos[~(sin_clave | repetidas | existentes)]
+
+    if archivo != CLIENTES_CSV:
+        sin_cliente = ~aceptadas["cliente"].astype(str).isin(set(cargar_clientes(["id"])["id"]))
+        if sin_cliente.any():
+            print(f"Aviso: {int(sin_cliente.sum())} proyectos importados apuntan a clientes que no existen")
+
+    if not aceptadas.empty:
+        with cronometro("escritura"):
+            insertar_registros(archivo, aceptadas)
+
+    print(
+        f"{len(aceptadas)} {args.tabla} importados; omitidos: {int(existentes.sum())} ya existentes, "
+        f"{int(repetidas.sum())} repetidos en el archivo, {int(sin_clave.sum())} sin {clave}"
+    )
+    return 0
+
+
+def cmd_export(args):
+    archivo = TABLAS[args.tabla]
+    salida = args.salida or f"{args.tabla}.{args.formato}"
+
+    with cronometro("export"):
+        df = cargar_tabla(archivo)
+        if "cliente" in ESQUEMAS[archivo]:
+            df = con_cliente_id(df)     # Para poder importarlo en otra instalación
+        filas = registros(df, archivo)
+        if args.formato == "json":
+            with open(salida, "w", encoding="utf-8") as f:
+                json.dump(filas, f, ensure_ascii=False, indent=1)
+        else:
+            pd.DataFrame(filas, columns=df.columns).to_csv(salida, index=False)
+
+    print(f"{salida}: {len(filas)} {args.tabla}")
+    return 0
+
+
+def cmd_verify(args):
+    with cronometro("verify"):
+        informe = REVISION.revisar()
+    if args.reparar and reparables(informe):
+        with cronometro("reparar"):
+            cambiadas, informe = REVISION.reparar()
+        print(f"{cambiadas} registros corregidos")
+
+    for problema in informe["problemas"].values():
+        cantidad, detalles = problema["cantidad"], problema["detalles"]
+        reparable = f" ({problema['reparables']} reparables con --reparar)" if problema["reparables"] else ""
+        print(f"{problema['descripcion']}: {cantidad}{reparable}")
+        for detalle in detalles[:args.mostrar]:
+            print(f"  {detalle}")
+        if cantidad > args.mostrar:
+            print(f"  ... y {cantidad - args.mostrar} más")
+
+    total = problemas_encontrados(informe)
+    print("Sin problemas" if not total else f"{total} problemas encontrados")
+    return 1 if total else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Operaciones por lotes sobre los datos de la aplicación")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("backup", help="Crea un ZIP con los CSV y las imágenes")
+    p.add_argument("--salida", help="Archivo o carpeta de destino (por defecto, la carpeta actual)")
+    p.set_defaults(funcion=cmd_backup)
+
+    p = sub.add_parser("restore", help="Restaura un ZIP creado con backup o un snapshot local")
+    p.add_argument("archivo", nargs="?")
+    p.add_argument("--snapshot", help="Nombre del snapshot (ver: snapshot --listar)")
+    p.set_defaults(funcion=cmd_restore)
+
+    p = sub.add_parser("snapshot", help="Toma un snapshot local y poda los viejos")
+    p.add_argument("--listar", action="store_true", help="Solo lista los snapshots existentes")
+    p.set_defaults(funcion=cmd_snapshot)
+
+    p = sub.add_parser("gc", help="Borra las imágenes que ningún registro usa")
+    p.add_argument("--simular", action="store_true", help="Solo lista lo que se borraría")
+    p.set_defaults(funcion=cmd_gc)
+
+    p = sub.add_parser("purge", help="Borra definitivamente las bajas de la papelera")
+    p.add_argument("--minutos", type=int, default=VENTANA_DESHACER_MIN,
+                   help="Solo las bajas con más de estos minutos (0 = toda la papelera)")
+    p.set_defaults(funcion=cmd_purge)
+
+    p = sub.add_parser("archivar", help="Pasa al archivo los proyectos terminados hace tiempo")
+    p.add_argument("--meses", type=int, default=MESES_ARCHIVO or 12,
+                   help="Proyectos con fecha final de hace más de estos meses (por defecto "
+                        "DCC_MESES_ARCHIVO, o 12 si el archivo automático está desactivado)")
+    p.add_argument("--desarchivar", nargs="+", metavar="CODIGO", help="Devuelve estos proyectos a la tabla activa")
+    p.set_defaults(funcion=cmd_archivar)
+
+    p = sub.add_parser("reindex", help="Vuelve a cargar las tablas y reconstruye índices y estadísticas")
+    p.set_defaults(funcion=cmd_reindex)
+
+    p = sub.add_parser("import", help="Agrega registros desde un CSV, omitiendo claves existentes")
+    p.add_argument("archivo")
+    p.add_argument("--tabla", choices=sorted(TABLAS), required=True)
+    p.set_defaults(funcion=cmd_import)
+
+    p = sub.add_parser("export", help="Exporta una tabla a CSV o JSON")
+    p.add_argument("--tabla", choices=sorted(TABLAS), required=True)
+    p.add_argument("--formato", choices=["csv", "json"], default="csv")
+    p.add_argument("--salida")
+    p.set_defaults(funcion=cmd_export)
+
+    p = sub.add_parser("verify", help="Revisa duplicados, proyectos sin cliente e imágenes faltantes")
+    p.add_argument("--mostrar", type=int, default=10, help="Detalles a listar por problema")
+    p.add_argument("--reparar", action="store_true", help="Aplica las reparaciones automáticas antes de informar")
+    p.set_defaults(funcion=cmd_verify)
+
+    p = sub.add_parser("compactar", help="Vuelca la bitácora de cambios en los CSV")
+    p.set_defaults(funcion=cmd_compactar)
+
+    p = sub.add_parser("historial", help="Lista los cambios registrados en la bitácora")
+    p.add_argument("--tabla", choices=sorted(TABLAS), required=True)
+    p.add_argument("--desde", help="Solo los cambios desde este momento (AAAA-MM-DD HH:MM)")
+    p.add_argument("--mostrar", type=int, default=50, help="Últimos cambios a listar (0 = todos)")
+    p.set_defaults(funcion=cmd_historial)
+
+    p = sub.add_parser("reconstruir", help="Escribe una tabla tal como estaba en un momento dado")
+    p.add_argument("--tabla", choices=sorted(TABLAS), required=True)
+    p.add_argument("--momento", required=True, help="AAAA-MM-DD HH:MM[:SS]")
+    p.add_argument("--salida", help="CSV de destino (no reemplaza los datos de la aplicación)")
+    p.set_defaults(funcion=cmd_reconstruir)
+
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
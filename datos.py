@@ -0,0 +1,1296 @@
+import os
+import sys
+import threading
+import uuid
+from collections import Counter, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bitacora import COMPACTAR_CADA, Bitacora
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+def ruta_recurso(ruta_relativa):
+    try:
+        base_path = sys._MEIPASS  # cuando es .exe
+    except Exception:
+        base_path = os.path.abspath(".")  # cuando es .py
+    return os.path.join(base_path, ruta_relativa)
+
+
+# ------------------ CONFIG ------------------
+# CSV
+CLIENTES_CSV = ruta_recurso("data/clientes.csv")
+PROYECTOS_CSV = ruta_recurso("data/proyectos.csv")
+PROYECTOS_ARCHIVO_CSV = ruta_recurso("data/proyectos_archivo.csv")    # Proyectos cerrados hace tiempo (ver ARCHIVO)
+
+# Bitácora de cambios (ver bitacora.py)
+BITACORA_DIR = ruta_recurso("data/bitacora")
+
+# Archivo que serializa entre procesos (aplicación y CLI) las cargas y escrituras de las tablas
+BLOQUEO_DATOS_PATH = ruta_recurso("data/datos.lock")
+
+# Carpetas de imágenes
+IMG_CLIENTES_DIR = ruta_recurso("assets/imagenes_clientes")
+IMG_PROYECTOS_DIR = ruta_recurso("assets/imagenes_proyectos")
+
+# Imágenes sueltas
+LOGO_PATH = ruta_recurso("assets/LOGO_DCC.png")
+SIN_IMAGEN_PATH = ruta_recurso("assets/sin_imagen.png")
+
+# Formato con el que se guardan las fechas en los CSV
+FORMATO_FECHA = "%Y-%m-%d"
+FORMATO_MARCA = "%Y-%m-%d %H:%M:%S"    # Fecha y hora (marcas de eliminación)
+
+
+# Crear carpetas si no existen
+os.makedirs(IMG_CLIENTES_DIR, exist_ok=True)
+os.makedirs(IMG_PROYECTOS_DIR, exist_ok=True)
+
+
+# ------------------ ESQUEMA ------------------
+# Cada columna declara su tipo ("texto", "fecha", "marca" o "categoria"), si admite vacíos y el
+# valor con el que se rellena cuando falta. Las fechas y marcas (fecha y hora) vacías quedan
+# como NaT.
+# eliminado_en es la marca de borrado: las filas con valor están en la papelera, no se muestran
+# y se purgan cuando vence la ventana para deshacer.
+# id es el identificador interno de cada registro: se asigna al darlo de alta y no cambia nunca.
+# La Cédula/NIT y el código de orden son datos editables como cualquier otro; los proyectos
+# apuntan a su cliente por el id (ver IDS INTERNOS).
+Columna = namedtuple("Columna", ["tipo", "nulo", "defecto"])
+
+ESQUEMA_CLIENTES = {
+    "id": Columna("texto", False, ""),
+    "cliente_id": Columna("texto", False, ""),
+    "nombre": Columna("texto", False, ""),
+    "apellido": Columna("texto", False, ""),
+    "direccion": Columna("texto", False, ""),
+    "imagen_path": Columna("texto", False, ""),
+    "fecha_nacimiento": Columna("fecha", True, None),
+    "eliminado_en": Columna("marca", True, None),
+}
+
+ESQUEMA_PROYECTOS = {
+    "id": Columna("texto", False, ""),
+    "codigo_orden": Columna("texto", False, ""),
+    "nombre_proyecto": Columna("texto", False, ""),
+    "cliente": Columna("categoria", False, ""),      # id del cliente. Se repite en muchos proyectos, como categoría ocupa mucho menos
+    "fecha_inicio": Columna("fecha", True, None),
+    "fecha_fin": Columna("fecha", True, None),       # Vacía = proyecto en proceso
+    "imagenes_paths": Columna("texto", False, ""),
+    "comentarios": Columna("texto", False, ""),
+    "eliminado_en": Columna("marca", True, None),
+}
+
+ESQUEMAS = {
+    CLIENTES_CSV: ESQUEMA_CLIENTES,
+    PROYECTOS_CSV: ESQUEMA_PROYECTOS,
+    PROYECTOS_ARCHIVO_CSV: ESQUEMA_PROYECTOS,
+}
+
+# Columna con la que el usuario identifica cada registro (única, pero editable)
+CLAVES = {
+    CLIENTES_CSV: "cliente_id",
+    PROYECTOS_CSV: "codigo_orden",
+    PROYECTOS_ARCHIVO_CSV: "codigo_orden",
+}
+
+# Partición de archivo de cada tabla que tiene una: mismo esquema, filas que casi no se abren
+ARCHIVOS = {
+    PROYECTOS_CSV: PROYECTOS_ARCHIVO_CSV,
+}
+
+BITACORAS = {archivo: Bitacora(archivo, BITACORA_DIR) for archivo in ESQUEMAS}
+
+
+def aplicar_esquema(df, esquema):
+    # Columnas que faltan en el CSV (archivos de versiones anteriores) se rellenan con su defecto
+    for columna, col in esquema.items():
+        if columna not in df.columns:
+            df[columna] = col.defecto
+
+    # Columnas del esquema primero; las que no conoce el esquema se conservan al final
+    extras = [c for c in df.columns if c not in esquema]
+    df = df[list(esquema) + extras].copy()
+
+    for columna, col in esquema.items():
+        if col.tipo in ("fecha", "marca"):
+            df[columna] = pd.to_datetime(df[columna], errors="coerce", format="ISO8601")
+            continue
+
+        if not col.nulo:
+            df[columna] = df[columna].fillna(col.defecto)
+
+        if col.tipo == "categoria":
+            df[columna] = df[columna].astype("category")
+
+    return df
+
+
+def _a_texto(df, esquema):
+    # Convierte las fechas de vuelta al formato del CSV (NaT -> vacío)
+    fechas = {}
+    for columna, col in esquema.items():
+        if col.tipo in ("fecha", "marca") and columna in df.columns:
+            fechas[columna] = pd.to_datetime(
+                df[columna], errors="coerce", format="ISO8601"
+            ).dt.strftime(FORMATO_FECHA if col.tipo == "fecha" else FORMATO_MARCA)
+    return df.assign(**fechas)
+
+
+# ------------------ LECTURA / ESCRITURA ------------------
+def leer_tabla(archivo, ruta=None):
+    # ruta permite leer otra copia de la tabla (un snapshot del historial) con el mismo esquema
+    esquema = ESQUEMAS[archivo]
+    ruta = ruta or archivo
+    if not os.path.exists(ruta):   # Se utiliza OS para revisar que el archivo exista
+        return tabla_vacia(archivo)
+    return aplicar_esquema(pd.read_csv(ruta, dtype=str), esquema)
+
+
+def tabla_vacia(archivo):
+    esquema = ESQUEMAS[archivo]
+    return aplicar_esquema(pd.DataFrame(columns=list(esquema)), esquema)
+
+
+def escribir_tabla(df, archivo, ruta=None):
+    # Se escribe a un temporal y se reemplaza de una vez, así ningún lector (la API, otras
+    # herramientas) ve el CSV a medio escribir. ruta permite escribir la tabla en otro archivo
+    ruta = ruta or archivo
+    temporal = f"{ruta}.tmp"
+    _a_texto(df, ESQUEMAS[archivo]).to_csv(temporal, index=False)
+    os.replace(temporal, ruta)
+
+
+def registros(df, archivo):
+    # Filas como diccionarios listos para JSON: fechas en el formato del CSV y vacíos como None
+    df = _a_texto(df, ESQUEMAS[archivo]).astype(object)
+    return df.where(df.notna(), None).to_dict("records")
+
+
+def actualizar_filas(df, mascara, valores):
+    # Asigna valores a las filas seleccionadas respetando el tipo de cada columna
+    for columna, valor in valores.items():
+        serie = df[columna]
+
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            if valor not in serie.cat.categories:
+                df[columna] = serie.cat.add_categories([valor])
+        elif pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            valor = pd.NaT if valor is None or valor == "" else pd.Timestamp(valor)
+
+        df.loc[mascara, columna] = valor
+
+
+def actualizar_por_fila(df, posiciones, valores):
+    # Como actualizar_filas, pero con un valor por fila: valores es {columna: [valor de cada
+    # fila]} en el orden de posiciones
+    for columna, lista in valores.items():
+        serie = df[columna]
+
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            nuevas = pd.Index(lista).difference(serie.cat.categories)
+            if len(nuevas):
+                df[columna] = serie.cat.add_categories(nuevas)
+        elif pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            lista = [pd.NaT if valor is None or valor == "" else pd.Timestamp(valor) for valor in lista]
+
+        df.iloc[posiciones, df.columns.get_loc(columna)] = lista
+
+
+def _concatenar(df_actual, df_nuevo, esquema):
+    # Une las categorías antes de concatenar; si no, pandas convierte la columna a texto
+    if df_actual.empty:
+        return df_nuevo.reset_index(drop=True)
+    df_actual = df_actual.copy()
+    df_nuevo = df_nuevo.copy()
+    for columna, col in esquema.items():
+        if col.tipo == "categoria":
+            categorias = df_actual[columna].cat.categories.union(df_nuevo[columna].cat.categories)
+            df_actual[columna] = df_actual[columna].cat.set_categories(categorias)
+            df_nuevo[columna] = df_nuevo[columna].cat.set_categories(categorias)
+    return pd.concat([df_actual, df_nuevo], ignore_index=True)
+
+
+# ------------------ EVENTOS DE LA BITÁCORA ------------------
+# Cada modificación se guarda como un evento JSON: "insertar" lleva las filas nuevas;
+# "actualizar" y "eliminar" llevan las posiciones de las filas en la tabla completa (para
+# reproducirlo exacto aunque haya claves repetidas), sus claves y cómo estaban antes (para
+# auditoría), y "actualizar" además los valores asignados. "actualizar_filas" es una
+# actualización donde cada fila recibe sus propios valores: una lista por columna, en el orden
+# de las posiciones.
+def _valor_json(valor):
+    # Las fechas se guardan como texto ISO
+    if valor is None or valor is pd.NaT:
+        return None
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+def _valores_json(valores):
+    return {
+        columna: [_valor_json(v) for v in valor] if isinstance(valor, list) else _valor_json(valor)
+        for columna, valor in valores.items()
+    }
+
+
+def evento_filas(op, archivo, mascara, antes, valores=None):
+    evento = {
+        "tabla": BITACORAS[archivo].nombre,
+        "op": op,
+        "posiciones": np.flatnonzero(np.asarray(mascara)).tolist(),
+        "claves": antes[CLAVES[archivo]].astype(str).tolist(),
+    }
+    if valores is not None:
+        evento["valores"] = _valores_json(valores)
+    evento["antes"] = registros(antes, archivo)
+    return evento
+
+
+def aplicar_evento(df, evento, archivo):
+    # Reproduce un evento sobre una tabla de trabajo (las actualizaciones la modifican en sitio).
+    # Devuelve la tabla resultante
+    if evento["op"] == "insertar":
+        nuevas = aplicar_esquema(pd.DataFrame(evento["filas"], dtype=str), ESQUEMAS[archivo])
+        return _concatenar(df, nuevas, ESQUEMAS[archivo])
+
+    mascara = np.zeros(len(df), dtype=bool)
+    mascara[evento["posiciones"]] = True
+    if evento["op"] == "actualizar":
+        actualizar_filas(df, mascara, evento["valores"])
+        return df
+    if evento["op"] == "actualizar_filas":
+        actualizar_por_fila(df, evento["posiciones"], evento["valores"])
+        return df
+    if evento["op"] == "eliminar":
+        return df[~mascara].reset_index(drop=True)
+    raise ValueError(f"Evento desconocido en la bitácora: {evento['op']}")
+
+
+def reproducir(df, eventos, archivo, hasta=None):
+    # Aplica los eventos en orden sobre una copia de df; hasta (texto ISO) corta en ese momento
+    df = df.copy()
+    for evento in eventos:
+        if hasta is not None and evento["t"] > hasta:
+            break
+        df = aplicar_evento(df, evento, archivo)
+    return df
+
+
+# ------------------ REPOSITORIO EN MEMORIA ------------------
+# Un único objeto por proceso guarda las tablas ya parseadas junto con su versión (la del CSV
+# y la de su bitácora) y las comparte entre todas las sesiones. Junto a cada tabla se guardan
+# estructuras derivadas (órdenes, textos de búsqueda, conteos) que se descartan solas cuando
+# la tabla cambia.
+# Una tabla se carga como el CSV (snapshot) más los eventos de su bitácora que todavía no se
+# compactaron. Las escrituras de la aplicación pasan por registrar(): bajo el lock se agrega
+# el evento a la bitácora (una línea, en lugar de reescribir el CSV) y la tabla nueva
+# reemplaza a la anterior en memoria, así que la siguiente lectura no vuelve a parsear nada.
+# Si el CSV o la bitácora cambian por fuera de la aplicación, la versión no coincide y la
+# tabla se recarga.
+# Cada entrada guarda la tabla completa ("completo", con las filas en la papelera) y la vista
+# sin ellas ("df"), que es la que usan las páginas, los listados y la búsqueda.
+# Las tablas devueltas son compartidas: quien necesite modificarlas debe trabajar sobre .copy()
+def firma_archivo(archivo):
+    try:
+        info = os.stat(archivo)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def firma_tabla(archivo):
+    # Versión de una tabla: cambia con el CSV y con cada evento que se agrega a su bitácora
+    firmas = [f for f in (firma_archivo(archivo), firma_archivo(BITACORAS[archivo].ruta)) if f]
+    if not firmas:
+        return None
+    return (max(f[0] for f in firmas), sum(f[1] for f in firmas))
+
+
+# ---- Bloqueo entre procesos ----
+# La aplicación y la CLI pueden escribir las mismas tablas a la vez. Los eventos de la bitácora
+# se refieren a posiciones de filas, así que un proceso no puede calcular un cambio sobre una
+# tabla vieja: el lock del repositorio es este bloqueo, que además de los hilos del proceso
+# excluye a los otros procesos (un archivo bloqueado con flock, o msvcrt en Windows). Con él
+# tomado se vuelve a cargar la tabla si su versión cambió, se calcula el cambio y se agrega el
+# evento, sin que otro proceso escriba en el medio. Es reentrante dentro del proceso (solo el
+# primer nivel bloquea el archivo). Con entre_procesos en False es un RLock común.
+class BloqueoArchivo:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.entre_procesos = True
+        self._lock = threading.RLock()
+        self._nivel = 0
+        self._archivo = None
+
+    def _bloquear(self):
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        archivo = open(self.ruta, "a+b")
+        try:
+            if os.name == "nt":
+                archivo.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue      # LK_LOCK se rinde a los 10 s; se sigue esperando
+            else:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            archivo.close()
+            raise
+        return archivo
+
+    def _liberar(self):
+        try:
+            if os.name == "nt":
+                self._archivo.seek(0)
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._archivo.close()
+            self._archivo = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._nivel == 0 and self.entre_procesos:
+            try:
+                self._archivo = self._bloquear()
+            except BaseException:
+                self._lock.release()
+                raise
+        self._nivel += 1
+        return self
+
+    def __exit__(self, *error):
+        self._nivel -= 1
+        try:
+            if self._nivel == 0 and self._archivo is not None:
+                self._liberar()
+        finally:
+            self._lock.release()
+
+
+class Repositorio:
+    def __init__(self):
+        self._tablas = {}
+        # Serializa las escrituras entre sesiones y procesos y evita que dos sesiones parseen a
+        # la vez el mismo CSV. Es reentrante porque los suscriptores leen tablas durante un cambio
+        self.lock = BloqueoArchivo(BLOQUEO_DATOS_PATH)
+        # Solo lectura (la API): cargar una tabla nunca escribe el CSV ni toca la bitácora
+        self.solo_lectura = False
+
+    def entrada(self, archivo):
+        entrada = self._tablas.get(archivo)
+        if entrada is not None and entrada["firma"] == firma_tabla(archivo):
+            return entrada
+
+        with self.lock:
+            # Mientras se esperaba el lock otra sesión pudo cargarla o una escritura publicarla
+            firma = firma_tabla(archivo)
+            entrada = self._tablas.get(archivo)
+            if entrada is None or entrada["firma"] != firma:
+                completo, rotada = self._cargar(archivo)
+                if rotada:
+                    firma = firma_tabla(archivo)
+                entrada = self._nueva_entrada(firma, completo)
+                self._tablas[archivo] = entrada
+            return entrada
+
+    @staticmethod
+    def _leer(archivo):
+        # CSV más la cola de la bitácora, sin escribir nada. Si la bitácora no corresponde al CSV
+        # (se reemplazó por fuera, por ejemplo a mano) manda el CSV y sus eventos no se aplican.
+        # Las filas sin id (CSV de una versión anterior, agregadas a mano) reciben uno en memoria.
+        # Devuelve (tabla, bitácora desfasada, ids migrados)
+        completo = leer_tabla(archivo)
+        cabecera, eventos = BITACORAS[archivo].leer()
+        base = firma_archivo(archivo)
+        desfasada = cabecera is not None and cabecera["base"] != (list(base) if base else None)
+        if cabecera is not None and not desfasada:
+            completo = reproducir(completo, eventos, archivo)
+        return completo, desfasada, _migrar_ids(archivo, completo)
+
+    def _cargar(self, archivo):
+        # Se llama con el lock tomado. Devuelve (tabla, rotada). Fuera del modo de solo lectura
+        # lo que _leer resolvió en memoria se guarda: la tabla migrada se escribe, para que la
+        # próxima carga vea los mismos ids, y la bitácora desfasada pasa al historial con un
+        # segmento nuevo sobre el CSV
+        completo, desfasada, migrada = self._leer(archivo)
+        if self.solo_lectura or not (desfasada or migrada):
+            return completo, False
+
+        if migrada:
+            escribir_tabla(completo, archivo)
+        BITACORAS[archivo].rotar(firma_archivo(archivo))
+        return completo, True
+
+    @staticmethod
+    def _nueva_entrada(firma, completo):
+        eliminados = completo["eliminado_en"].notna()
+        vigentes = completo[~eliminados].reset_index(drop=True) if eliminados.any() else completo
+        return {"firma": firma, "completo": completo, "df": vigentes, "derivados": {}}
+
+    def union(self, archivos):
+        # Entrada con las particiones de una tabla juntas (activa y archivo) y sus propios
+        # derivados; se rearma cuando cambia cualquiera de ellas
+        partes = [self.entrada(archivo) for archivo in archivos]
+        firma = tuple(parte["firma"] for parte in partes)
+        entrada = self._tablas.get(archivos)
+        if entrada is not None and entrada["firma"] == firma:
+            return entrada
+
+        with self.lock:
+            entrada = self._tablas.get(archivos)
+            if entrada is None or entrada["firma"] != firma:
+                completo = partes[0]["completo"]
+                for parte in partes[1:]:
+                    completo = _concatenar(completo, parte["completo"], ESQUEMAS[archivos[0]])
+                entrada = self._nueva_entrada(firma, completo)
+                self._tablas[archivos] = entrada
+            return entrada
+
+    def registrar(self, archivo, df, evento):
+        # Quien llama debe tener el lock. La tabla en memoria se reemplaza recién cuando el
+        # evento quedó escrito, para que un error de disco no deje a la memoria adelantada
+        BITACORAS[archivo].agregar(evento, firma_archivo(archivo))
+        firma = firma_tabla(archivo)
+        self._tablas[archivo] = self._nueva_entrada(firma, df)
+        return firma
+
+    def compactar(self, archivo):
+        # Reescribe el CSV con todos los eventos aplicados y abre un segmento nuevo de la
+        # bitácora. La tabla no cambia, así que conserva sus derivados. Devuelve las versiones
+        # de antes y después
+        with self.lock:
+            entrada = self.entrada(archivo)
+            firma_previa = entrada["firma"]
+            escribir_tabla(entrada["completo"], archivo)
+            BITACORAS[archivo].rotar(firma_archivo(archivo))
+            entrada["firma"] = firma_tabla(archivo)
+            return firma_previa, entrada["firma"]
+
+    def invalidar(self):
+        with self.lock:
+            self._tablas.clear()
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+REPOSITORIO = Repositorio()
+
+
+def modo_solo_lectura():
+    # Para procesos que solo consultan (la API): las tablas se cargan sin migrar ids, rotar la
+    # bitácora ni escribir nada; lo pendiente lo guardan la aplicación o la CLI al abrirlas. Como
+    # no escribe, tampoco espera el bloqueo entre procesos
+    REPOSITORIO.solo_lectura = True
+    REPOSITORIO.lock.entre_procesos = False
+
+
+def _entrada(archivo):
+    return REPOSITORIO.entrada(archivo)
+
+
+def invalidar_cache():
+    REPOSITORIO.invalidar()
+
+
+def _derivado(entrada, clave, construir):
+    derivados = entrada["derivados"]
+    if clave not in derivados:
+        derivados[clave] = construir(entrada["df"])
+    return derivados[clave]
+
+
+# ---- Proyecciones y registros sueltos ----
+# Las páginas que recorren muchas filas (búsqueda, cumpleaños, selectores, tablero) piden solo
+# las columnas que usan, y los campos pesados (comentarios, rutas de imágenes) se leen de a un
+# registro cuando se abre un perfil o una edición, buscándolo por clave en O(1).
+# La proyección no se guarda: la tabla completa ya está en memoria y, con el copy-on-write de
+# pandas 3 (ver requirements.txt), elegir columnas devuelve un DataFrame que comparte sus datos
+# en lugar de copiarlos.
+def _proyeccion(entrada, columnas):
+    if columnas is None:
+        return entrada["df"]
+    return entrada["df"][list(columnas)]
+
+
+def cargar_tabla(archivo, columnas=None):
+    return _proyeccion(_entrada(archivo), columnas)
+
+
+def cargar_clientes(columnas=None):
+    return cargar_tabla(CLIENTES_CSV, columnas)
+
+
+def cargar_proyectos(columnas=None, incluir_archivo=False):
+    return _proyeccion(_entrada_proyectos(incluir_archivo), columnas)
+
+
+def _indice_valores(valores):
+    # Valores ordenados (como texto) y la posición de cada uno en la tabla: las filas con un
+    # valor dado se ubican con dos búsquedas binarias, sin recorrer la tabla. Los vacíos no
+    # se indexan (no coinciden con nada, igual que al comparar)
+    validos = np.flatnonzero(valores.notna().to_numpy())
+    claves = valores.iloc[validos].astype(str).to_numpy(dtype=object)
+    orden = np.argsort(claves, kind="stable")
+    return claves[orden], validos[orden]
+
+
+def _buscar_posiciones(indice, valor):
+    claves, orden = indice
+    inicio = np.searchsorted(claves, valor, side="left")
+    fin = np.searchsorted(claves, valor, side="right")
+    return orden[inicio:fin]
+
+
+def _posiciones_por(entrada, columna, valor):
+    indice = _derivado(entrada, ("indice", columna), lambda df: _indice_valores(df[columna]))
+    return _buscar_posiciones(indice, str(valor))
+
+
+def filas_con_clave(archivo, valor, columnas=None, columna=None):
+    # DataFrame con el registro que tiene esa clave (vacío si no existe); columna permite buscar
+    # por id. Con claves repetidas en un CSV viejo queda el primero, como hacían las páginas. Si
+    # no está en la tabla activa se busca en su archivo: abrir un proyecto archivado es lo único
+    # que carga esa partición
+    for parte in particiones(archivo):
+        entrada = _entrada(parte)
+        filas = _proyeccion(entrada, columnas).iloc[_posiciones_por(entrada, columna or CLAVES[parte], valor)[:1]]
+        if not filas.empty:
+            break
+    return filas
+
+
+def obtener_registro(archivo, valor, columnas=None, columna=None):
+    # La misma fila como Series, o None
+    filas = filas_con_clave(archivo, valor, columnas, columna)
+    return None if filas.empty else filas.iloc[0]
+
+
+def obtener_cliente(cliente_id, columnas=None):
+    return obtener_registro(CLIENTES_CSV, cliente_id, columnas)
+
+
+def obtener_cliente_por_id(id_cliente, columnas=None):
+    return obtener_registro(CLIENTES_CSV, id_cliente, columnas, "id")
+
+
+def obtener_proyecto(codigo_orden, columnas=None):
+    return obtener_registro(PROYECTOS_CSV, codigo_orden, columnas)
+
+
+def obtener_proyecto_por_id(id_proyecto, columnas=None):
+    return obtener_registro(PROYECTOS_CSV, id_proyecto, columnas, "id")
+
+
+def proyectos_de_cliente(id_cliente, columnas=None, incluir_archivo=False):
+    entrada = _entrada_proyectos(incluir_archivo)
+    return _proyeccion(entrada, columnas).iloc[_posiciones_por(entrada, "cliente", id_cliente)]
+
+
+def _cliente_id_por_id():
+    # {id: Cédula/NIT} de los clientes, armado una vez por versión de la tabla
+    return _derivado(_entrada(CLIENTES_CSV), "cliente_id_por_id", lambda df: dict(zip(df["id"], df["cliente_id"])))
+
+
+def con_cliente_id(proyectos):
+    # Los proyectos con la Cédula/NIT de su cliente al lado (vacía si el cliente no existe), para
+    # mostrarla o exportarla: se lee de la tabla de clientes, así un cambio de Cédula/NIT se ve
+    # enseguida sin tocar los proyectos
+    cliente_id = proyectos["cliente"].astype(str).map(_cliente_id_por_id())
+    if "cliente_id" in proyectos.columns:       # Proyectos cuyo cliente no existía al pasar a ids
+        cliente_id = cliente_id.fillna(proyectos["cliente_id"])
+    return proyectos.assign(cliente_id=cliente_id.fillna(""))
+
+
+COLUMNAS_CUMPLEANOS = ["cliente_id", "nombre", "apellido", "imagen_path"]      # Las de la tarjeta de la página de inicio
+
+
+def cumpleanos(fecha, columnas=None):
+    # Clientes que cumplen años en fecha (día y mes), sin recorrer la tabla en cada recarga
+    entrada = _entrada(CLIENTES_CSV)
+    por_dia = _derivado(entrada, "cumpleanos", lambda df: _indice_valores(df["fecha_nacimiento"].dt.strftime("%m-%d")))
+    return _proyeccion(entrada, columnas).iloc[_buscar_posiciones(por_dia, f"{fecha:%m-%d}")]
+
+
+# ------------------ LISTADOS ------------------
+COLUMNAS_FILTRO_CLIENTES = ["nombre", "apellido", "cliente_id"]
+COLUMNAS_BUSQUEDA_PROYECTOS = ["nombre_proyecto", "codigo_orden"]
+
+
+def _posiciones_ordenadas(serie, ascendente):
+    return (
+        serie.reset_index(drop=True)
+        .sort_values(ascending=ascendente, kind="stable", na_position="last")
+        .index.to_numpy()
+    )
+
+
+def _orden(entrada, columna, ascendente):
+    # Posiciones de las filas ordenadas por columna; se calcula una vez por versión del archivo
+    return _derivado(
+        entrada,
+        ("orden", columna, ascendente),
+        lambda df: _posiciones_ordenadas(df[columna], ascendente)
+    )
+
+
+def _rango_orden(entrada, columna, ascendente):
+    # Lugar de cada fila dentro de _orden, para ordenar un subconjunto sin ordenar la tabla
+    def construir(df):
+        rango = np.empty(len(df), dtype=np.int64)
+        rango[_orden(entrada, columna, ascendente)] = np.arange(len(df))
+        return rango
+
+    return _derivado(entrada, ("rango_orden", columna, ascendente), construir)
+
+
+def _indice_fechas(entrada, columna):
+    # Fechas no vacías de la columna ordenadas de menor a mayor y la posición de cada una en la
+    # tabla: un rango de fechas se resuelve con dos búsquedas binarias
+    def construir(df):
+        posiciones = _orden(entrada, columna, True)      # Las vacías quedan al final
+        valores = df[columna].to_numpy()[posiciones]
+        con_fecha = len(valores) - int(np.isnat(valores).sum())
+        return valores[:con_fecha], posiciones[:con_fecha]
+
+    return _derivado(entrada, ("fechas", columna), construir)
+
+
+def _en_rango(entrada, columna, desde=None, hasta=None):
+    # Posiciones de las filas con columna entre desde y hasta (días completos, ambos incluidos)
+    valores, posiciones = _indice_fechas(entrada, columna)
+    inicio, fin = 0, len(valores)
+    if desde is not None:
+        limite = pd.Timestamp(desde).normalize().to_datetime64().astype(valores.dtype)
+        inicio = np.searchsorted(valores, limite, side="left")
+    if hasta is not None:
+        limite = (pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1)).to_datetime64().astype(valores.dtype)
+        fin = np.searchsorted(valores, limite, side="left")
+    return posiciones[inicio:max(inicio, fin)]
+
+
+def _en_proceso(entrada):
+    # Mapa de bits de los proyectos en proceso (fecha_fin vacía)
+    return _derivado(entrada, "en_proceso", lambda df: df["fecha_fin"].isna().to_numpy())
+
+
+def _por_estado(entrada, estado):
+    # Posiciones de los proyectos en proceso o terminados
+    return _derivado(entrada, ("estado", estado), lambda df: np.flatnonzero(_en_proceso(entrada) == (estado == "en_proceso")))
+
+
+def _coincidencias(entrada, columnas, texto):
+    # Texto en minúsculas de las columnas filtrables, unido por un separador que nadie escribe
+    def construir(df):
+        partes = [df[c].astype(str).str.lower() for c in columnas]
+        busqueda = partes[0]
+        for parte in partes[1:]:
+            busqueda = busqueda + "\x1f" + parte
+        return busqueda
+
+    busqueda = _derivado(entrada, ("busqueda",) + tuple(columnas), construir)
+    return busqueda.str.contains(texto.lower(), regex=False).to_numpy()
+
+
+def _con_cliente_coincidente(entrada, texto):
+    # Proyectos cuyo cliente tiene una Cédula/NIT que contiene texto
+    clientes = _entrada(CLIENTES_CSV)
+    ids = clientes["df"]["id"][_coincidencias(clientes, ["cliente_id"], texto)]
+    return entrada["df"]["cliente"].isin(ids).to_numpy()
+
+
+def _cortar_pagina(df, posiciones, pagina, tamano):
+    inicio = (max(pagina, 1) - 1) * tamano
+    return df.iloc[posiciones[inicio:inicio + tamano]]
+
+
+def buscar(texto, limite=None, incluir_archivo=False):
+    # Búsqueda de la página de inicio: clientes por nombre, apellido o ID y proyectos por nombre
+    # o código de orden. Devuelve los resultados (hasta limite) y el total de coincidencias
+    entrada_c = _entrada(CLIENTES_CSV)
+    entrada_p = _entrada_proyectos(incluir_archivo)
+    clientes = entrada_c["df"][_coincidencias(entrada_c, COLUMNAS_FILTRO_CLIENTES, texto)]
+    proyectos = entrada_p["df"][_coincidencias(entrada_p, COLUMNAS_BUSQUEDA_PROYECTOS, texto)]
+    total = len(clientes) + len(proyectos)
+
+    if limite is not None:
+        clientes = clientes.head(limite)
+        proyectos = proyectos.head(limite - len(clientes))
+
+    resultados = [
+        {"tipo": "Cliente", "nombre": f"{nombre} {apellido}", "codigo": str(cliente_id)}
+        for cliente_id, nombre, apellido in zip(clientes["cliente_id"], clientes["nombre"], clientes["apellido"])
+    ] + [
+        {"tipo": "Proyecto", "nombre": nombre, "codigo": str(codigo)}
+        for codigo, nombre in zip(proyectos["codigo_orden"], proyectos["nombre_proyecto"])
+    ]
+    return resultados, total
+
+
+def sugerir_clientes(texto="", limite=20):
+    # Opciones para el selector de cliente con búsqueda: coincidencias por nombre, apellido o ID
+    # ordenadas por nombre, con el cliente cuyo ID es exactamente el texto en primer lugar.
+    # Devuelve {cliente_id: etiqueta} con a lo sumo limite opciones y el total de coincidencias
+    entrada = _entrada(CLIENTES_CSV)
+    clientes = entrada["df"]
+    texto = texto.strip()
+
+    posiciones = _orden(entrada, "nombre", True)
+    if texto:
+        posiciones = posiciones[_coincidencias(entrada, COLUMNAS_FILTRO_CLIENTES, texto)[posiciones]]
+
+    exacto = clientes[clientes["cliente_id"] == texto] if texto else clientes.iloc[:0]
+    visibles = pd.concat([exacto, clientes.iloc[posiciones[:limite]]]).head(limite)
+
+    opciones = {}
+    for cliente_id, nombre, apellido in zip(visibles["cliente_id"], visibles["nombre"], visibles["apellido"]):
+        opciones.setdefault(str(cliente_id), f"{nombre} {apellido} ({cliente_id})")
+    return opciones, len(posiciones)
+
+
+def conteo_proyectos_por_cliente():
+    # Cantidad de proyectos y de proyectos en proceso (fecha_fin vacía) por id de cliente
+    def construir(df):
+        conteos = (
+            df.assign(en_proceso=df["fecha_fin"].isna())
+            .groupby("cliente", observed=True)["en_proceso"]
+            .agg(n_proyectos="size", n_en_proceso="sum")
+        )
+        conteos.index = conteos.index.astype(str)
+        return conteos
+
+    return _derivado(_entrada(PROYECTOS_CSV), "conteo_por_cliente", construir)
+
+
+def listar_clientes(filtro="", orden="nombre", ascendente=True, pagina=1, tamano=25):
+    entrada = _entrada(CLIENTES_CSV)
+    clientes = entrada["df"]
+    conteos = conteo_proyectos_por_cliente()
+
+    if orden in conteos.columns:
+        # Los conteos dependen de proyectos.csv, se ordenan en el momento
+        valores = clientes["id"].map(conteos[orden]).fillna(0)
+        posiciones = _posiciones_ordenadas(valores, ascendente)
+    else:
+        posiciones = _orden(entrada, orden, ascendente)
+
+    if filtro:
+        posiciones = posiciones[_coincidencias(entrada, COLUMNAS_FILTRO_CLIENTES, filtro)[posiciones]]
+
+    # Solo las filas de la página visible reciben los conteos y salen hacia el navegador
+    visibles = _cortar_pagina(clientes, posiciones, pagina, tamano)
+    visibles = visibles.assign(**{
+        columna: visibles["id"].map(conteos[columna]).fillna(0).astype(int)
+        for columna in conteos.columns
+    })
+    return visibles, len(posiciones)
+
+
+def listar_proyectos(filtro="", orden="fecha_inicio", ascendente=False, pagina=1, tamano=25, estado="todos",
+                     inicio_desde=None, inicio_hasta=None, fin_desde=None, fin_hasta=None, incluir_archivo=False):
+    # Los rangos de fechas y el estado se resuelven con los índices ordenados y el mapa de bits:
+    # se toman solo las filas que cumplen y después se ordenan según orden
+    entrada = _entrada_proyectos(incluir_archivo)
+    proyectos = entrada["df"]
+
+    candidatos = None
+    for columna, desde, hasta in (("fecha_inicio", inicio_desde, inicio_hasta), ("fecha_fin", fin_desde, fin_hasta)):
+        if desde is not None or hasta is not None:
+            en_rango = _en_rango(entrada, columna, desde, hasta)
+            candidatos = en_rango if candidatos is None else np.intersect1d(candidatos, en_rango, assume_unique=True)
+
+    if estado != "todos":
+        if candidatos is None:
+            candidatos = _por_estado(entrada, estado)
+        else:
+            candidatos = candidatos[_en_proceso(entrada)[candidatos] == (estado == "en_proceso")]
+
+    if orden == "cliente_id":
+        # La Cédula/NIT está en la tabla de clientes, se ordena en el momento
+        posiciones = _posiciones_ordenadas(con_cliente_id(proyectos)["cliente_id"], ascendente)
+        if candidatos is not None:
+            elegidas = np.zeros(len(proyectos), dtype=bool)
+            elegidas[candidatos] = True
+            posiciones = posiciones[elegidas[posiciones]]
+    elif candidatos is None:
+        posiciones = _orden(entrada, orden, ascendente)
+    else:
+        posiciones = candidatos[np.argsort(_rango_orden(entrada, orden, ascendente)[candidatos], kind="stable")]
+
+    if filtro:
+        coinciden = _coincidencias(entrada, COLUMNAS_BUSQUEDA_PROYECTOS, filtro) | _con_cliente_coincidente(entrada, filtro)
+        posiciones = posiciones[coinciden[posiciones]]
+
+    visibles = con_cliente_id(_cortar_pagina(proyectos, posiciones, pagina, tamano))
+    visibles = visibles.assign(en_proceso=visibles["fecha_fin"].isna())
+    return visibles, len(posiciones)
+
+
+# ------------------ MODIFICACIONES ------------------
+# Todas las altas, ediciones y bajas pasan por aquí. Cada cambio se agrega como evento a la
+# bitácora de la tabla y después se avisa a los suscriptores con las filas antes y después del
+# cambio, junto con la versión de la tabla sobre la que se aplicó y la que quedó, para que
+# puedan actualizarse sin releer la tabla completa.
+Cambio = namedtuple("Cambio", ["archivo", "antes", "despues", "firma_previa", "firma_nueva"])
+
+_suscriptores = []
+
+
+def suscribir(funcion):
+    _suscriptores.append(funcion)
+
+
+def _notificar(cambio):
+    for funcion in _suscriptores:
+        funcion(cambio)
+
+
+def _publicar(archivo, df, antes, despues, firma_previa, evento):
+    # Registra el evento, deja la tabla nueva en memoria y avisa a los suscriptores. Se llama
+    # con el lock del repositorio tomado, así los cambios llegan a los suscriptores en orden
+    firma_nueva = REPOSITORIO.registrar(archivo, df, evento)
+    _notificar(Cambio(archivo, antes, despues, firma_previa, firma_nueva))
+
+    if BITACORAS[archivo].pendientes() >= COMPACTAR_CADA:
+        compactar(archivo)
+
+
+def compactar(archivo):
+    # Vuelca la bitácora en el CSV. No cambia ninguna fila: los suscriptores solo actualizan la
+    # versión con la que comparan
+    with REPOSITORIO.lock:
+        if not BITACORAS[archivo].pendientes():
+            return
+        firma_previa, firma_nueva = REPOSITORIO.compactar(archivo)
+        _notificar(Cambio(archivo, None, None, firma_previa, firma_nueva))
+
+
+def compactar_tablas():
+    for archivo in ESQUEMAS:
+        compactar(archivo)
+
+
+def cargar_con_firma(archivo):
+    # Tabla completa, incluidas las filas en la papelera, con su versión
+    entrada = _entrada(archivo)
+    return entrada["completo"], entrada["firma"]
+
+
+def texto_csv(archivo):
+    # La tabla completa al día (CSV más bitácora) como texto CSV, sin escribir el archivo
+    df, _ = cargar_con_firma(archivo)
+    return _a_texto(df, ESQUEMAS[archivo]).to_csv(index=False)
+
+
+def insertar_registros(archivo, df_nuevo):
+    # Agrega varias filas (ya con el esquema aplicado) en un solo evento. Las que no traen id
+    # reciben uno nuevo
+    df_nuevo = df_nuevo.copy()
+    asignar_ids(df_nuevo)
+    with REPOSITORIO.lock:
+        df_actual, firma = cargar_con_firma(archivo)
+        df = _concatenar(df_actual, df_nuevo, ESQUEMAS[archivo])  # Se añaden los datos al final de la tabla de datos
+        evento = {"tabla": BITACORAS[archivo].nombre, "op": "insertar", "filas": registros(df_nuevo, archivo)}
+        _publicar(archivo, df, None, df_nuevo, firma, evento)
+
+
+def guardar_csv(data, archivo):
+    df_nuevo = aplicar_esquema(pd.DataFrame([data], dtype=str), ESQUEMAS[archivo])   # Se convierten los datos a la estructura de Pandas
+    insertar_registros(archivo, df_nuevo)
+
+
+def _actualizar(archivo, seleccionar, valores):
+    # Asigna valores a las filas que devuelve seleccionar(df). Devuelve cuántas filas cambiaron
+    with REPOSITORIO.lock:
+        df_actual, firma = cargar_con_firma(archivo)
+        mascara = seleccionar(df_actual)
+        if not mascara.any():
+            return 0
+
+        df = df_actual.copy()
+        antes = df[mascara].copy()
+        actualizar_filas(df, mascara, valores)
+        evento = evento_filas("actualizar", archivo, mascara, antes, valores)
+        _publicar(archivo, df, antes, df[mascara], firma, evento)
+        return len(antes)
+
+
+def actualizar_posiciones(archivo, posiciones, valores):
+    # Cada fila (posición en la tabla completa) recibe sus propios valores, {columna: [valor de
+    # cada fila]}, en un solo evento. Quien calcula las posiciones debe tener el lock del
+    # repositorio desde que leyó la tabla. Devuelve cuántas filas cambiaron
+    if not len(posiciones):
+        return 0
+    orden = np.argsort(posiciones, kind="stable")      # El evento guarda las posiciones en orden
+    posiciones = np.asarray(posiciones)[orden]
+    valores = {columna: [lista[i] for i in orden] for columna, lista in valores.items()}
+
+    with REPOSITORIO.lock:
+        df_actual, firma = cargar_con_firma(archivo)
+        mascara = np.zeros(len(df_actual), dtype=bool)
+        mascara[posiciones] = True
+
+        df = df_actual.copy()
+        antes = df[mascara].copy()
+        actualizar_por_fila(df, posiciones, valores)
+        evento = evento_filas("actualizar_filas", archivo, mascara, antes, valores)
+        _publicar(archivo, df, antes, df[mascara], firma, evento)
+        return len(antes)
+
+
+def valores_por_fila(df, cambios):
+    # {posición: {columna: valor}} -> (posiciones, {columna: [valor de cada fila]}) para
+    # actualizar_posiciones; las filas que no cambian una columna conservan su valor actual
+    posiciones = list(cambios)
+    valores = {}
+    for columna in {c for valores_fila in cambios.values() for c in valores_fila}:
+        actuales = df[columna].iloc[posiciones]
+        valores[columna] = [
+            cambios[p].get(columna, None if pd.isna(actual) else actual)
+            for p, actual in zip(posiciones, actuales)
+        ]
+    return posiciones, valores
+
+
+def _eliminar(archivo, seleccionar):
+    # Quita del archivo las filas que devuelve seleccionar(df). Devuelve las filas eliminadas
+    with REPOSITORIO.lock:
+        df_actual, firma = cargar_con_firma(archivo)
+        mascara = seleccionar(df_actual)
+        antes = df_actual[mascara]
+        if antes.empty:
+            return antes
+
+        evento = evento_filas("eliminar", archivo, mascara, antes)
+        _publicar(archivo, df_actual[~mascara].reset_index(drop=True), antes, None, firma, evento)
+        return antes
+
+
+def _en_particiones(archivo, columna, buscadas, operacion):
+    # Aplica operacion(particion) a la tabla y a su archivo y suma las filas que cambiaron.
+    # Buscando por clave o por id se corta en cuanto cambiaron las buscadas (no se repiten
+    # entre particiones), así editar un proyecto activo no carga el archivo
+    cambiadas = 0
+    for parte in particiones(archivo):
+        cambiadas += operacion(parte)
+        if columna in (CLAVES[archivo], "id") and cambiadas >= buscadas:
+            break
+    return cambiadas
+
+
+def _eliminar_en_particiones(archivo, seleccionar):
+    eliminadas = [_eliminar(parte, seleccionar) for parte in particiones(archivo)]
+    resultado = eliminadas[0]
+    for filas in eliminadas[1:]:
+        if not filas.empty:
+            resultado = _concatenar(resultado, filas, ESQUEMAS[archivo])
+    return resultado
+
+
+def actualizar_registros(archivo, columna, valor, valores):
+    # Actualiza todas las filas donde columna == valor. Devuelve cuántas filas cambiaron
+    return _en_particiones(archivo, columna, 1, lambda parte: _actualizar(parte, lambda df: df[columna] == valor, valores))
+
+
+def actualizar_en_lote(archivo, columna, cambios):
+    # Cada registro (buscado por columna, normalmente el id) recibe sus propios valores:
+    # cambios es {valor de columna: {columna: valor}}. Una sola escritura por partición que
+    # tenga alguno. Devuelve cuántas filas cambiaron
+    def operacion(parte):
+        with REPOSITORIO.lock:
+            df, _ = cargar_con_firma(parte)
+            posiciones = np.flatnonzero(df[columna].isin(list(cambios)).to_numpy())
+            filas = {p: cambios[valor] for p, valor in zip(posiciones, df[columna].iloc[posiciones])}
+            return actualizar_posiciones(parte, *valores_por_fila(df, filas))
+    return _en_particiones(archivo, columna, len(cambios), operacion)
+
+
+def eliminar_registros(archivo, columna, valores):
+    # Elimina de verdad las filas cuyo valor en columna esté en valores. Devuelve las filas eliminadas
+    return _eliminar_en_particiones(archivo, lambda df: df[columna].isin(valores))
+
+
+# ------------------ PAPELERA ------------------
+# Las bajas desde la aplicación solo marcan eliminado_en; la fila desaparece de las páginas pero
+# sigue en el CSV (y su clave sigue ocupada) hasta que la purga la borra junto con sus imágenes.
+# momento identifica la baja: restaurar con el mismo momento deshace exactamente esa baja.
+def momento_actual():
+    # Sin microsegundos, para que coincida con lo que queda escrito en el CSV
+    return pd.Timestamp.now().floor("s")
+
+
+def marcar_eliminados(archivo, columna, valores, momento):
+    return _en_particiones(archivo, columna, len(set(valores)), lambda parte: _actualizar(
+        parte,
+        lambda df: df[columna].isin(valores) & df["eliminado_en"].isna(),
+        {"eliminado_en": momento}
+    ))
+
+
+def restaurar_eliminados(archivo, columna, valores, momento):
+    return _en_particiones(archivo, columna, len(set(valores)), lambda parte: _actualizar(
+        parte,
+        lambda df: df[columna].isin(valores) & (df["eliminado_en"] == momento),
+        {"eliminado_en": None}
+    ))
+
+
+def purgar_registros(archivo, limite):
+    # Borra de una sola escritura por partición las filas marcadas hasta limite. Devuelve las filas borradas
+    return _eliminar_en_particiones(archivo, lambda df: df["eliminado_en"] <= limite)
+
+
+# ------------------ ARCHIVO ------------------
+# Los proyectos terminados hace más de cierto tiempo pasan a una partición aparte
+# (proyectos_archivo.csv, con su propia bitácora). Las búsquedas, listados y perfiles leen
+# solo la tabla activa salvo que pidan incluir el archivo; el archivo se carga la primera vez
+# que hace falta (incluirlo, abrir un proyecto archivado o una modificación que lo alcance) y
+# después queda en memoria como cualquier tabla. Las ediciones, bajas y restauraciones buscan
+# el registro en las dos particiones, así que un proyecto archivado se edita como cualquiera.
+def hay_archivo(archivo=PROYECTOS_CSV):
+    # Sin CSV de archivo no hay nada archivado y no se carga nada
+    return archivo in ARCHIVOS and os.path.exists(ARCHIVOS[archivo])
+
+
+def particiones(archivo):
+    return [archivo, ARCHIVOS[archivo]] if hay_archivo(archivo) else [archivo]
+
+
+def _entrada_proyectos(incluir_archivo=False):
+    if incluir_archivo and hay_archivo(PROYECTOS_CSV):
+        return REPOSITORIO.union(tuple(particiones(PROYECTOS_CSV)))
+    return _entrada(PROYECTOS_CSV)
+
+
+def particion_de(archivo, valor):
+    # Partición donde está el registro con esa clave, o None
+    for parte in particiones(archivo):
+        entrada = _entrada(parte)
+        if len(_posiciones_por(entrada, CLAVES[parte], valor)):
+            return parte
+    return None
+
+
+def proyecto_archivado(codigo_orden):
+    return particion_de(PROYECTOS_CSV, codigo_orden) == PROYECTOS_ARCHIVO_CSV
+
+
+def _mover(origen, destino, seleccionar):
+    # Pasa las filas que devuelve seleccionar(df) de una partición a la otra: primero se
+    # agregan al destino y después se quitan del origen, así un corte entre las dos escrituras
+    # deja el registro repetido y nunca perdido (la próxima pasada solo lo quita del origen).
+    # Se compacta enseguida para que el arranque no reproduzca eventos tan grandes
+    clave = CLAVES[origen]
+    with REPOSITORIO.lock:
+        df, _ = cargar_con_firma(origen)
+        filas = df[seleccionar(df)]
+        if filas.empty:
+            return 0
+
+        en_destino, _ = cargar_con_firma(destino)
+        nuevas = filas[~filas[clave].isin(set(en_destino[clave]))]
+        if not nuevas.empty:
+            insertar_registros(destino, nuevas.reset_index(drop=True))
+        _eliminar(origen, seleccionar)
+        compactar(destino)
+        compactar(origen)
+        return len(filas)
+
+
+def limite_archivo(meses, hoy=None):
+    # Los proyectos con fecha final anterior a este día se archivan
+    return pd.Timestamp(hoy or pd.Timestamp.now()).normalize() - pd.DateOffset(months=meses)
+
+
+def archivar_proyectos(meses, hoy=None):
+    # Archiva los proyectos terminados hace más de meses (los de la papelera se quedan hasta la
+    # purga). Devuelve cuántos se movieron
+    limite = limite_archivo(meses, hoy)
+    return _mover(PROYECTOS_CSV, PROYECTOS_ARCHIVO_CSV, lambda df: (df["fecha_fin"] < limite) & df["eliminado_en"].isna())
+
+
+def desarchivar_proyectos(codigos):
+    # Devuelve proyectos archivados a la tabla activa (por ejemplo, un trabajo que se reabre)
+    if not hay_archivo(PROYECTOS_CSV):
+        return 0
+    return _mover(PROYECTOS_ARCHIVO_CSV, PROYECTOS_CSV, lambda df: df["codigo_orden"].isin(codigos))
+
+
+# ------------------ IDS INTERNOS ------------------
+# Los ids son uuid4 acortados: se generan sin consultar la tabla, así una sesión puede nombrar
+# las imágenes de un alta antes de que el guardado llegue a la cola. Las ediciones y bajas
+# buscan el registro por id y los proyectos apuntan a su cliente por id; cambiar una Cédula/NIT
+# o un código de orden modifica una sola fila y ningún archivo (las imágenes se nombran por id).
+def nuevo_id():
+    return uuid.uuid4().hex[:16]
+
+
+def asignar_ids(df):
+    # Da un id nuevo a las filas de df que no tienen. Devuelve cuántas eran
+    sin_id = (df["id"] == "").to_numpy()
+    if sin_id.any():
+        df.loc[sin_id, "id"] = [nuevo_id() for _ in range(int(sin_id.sum()))]
+    return int(sin_id.sum())
+
+
+def resolver_clientes(proyectos):
+    # Proyectos que traen la Cédula/NIT de su cliente en cliente_id (CSV anteriores a los ids,
+    # importaciones) pasan a apuntarlo por id; la columna se quita. Si el cliente no existe, su
+    # Cédula/NIT queda en cliente_id para corregirlo a mano. Modifica proyectos; devuelve True si
+    # cambió algo
+    if "cliente_id" not in proyectos.columns:
+        return False
+
+    clientes = _entrada(CLIENTES_CSV)["completo"]      # Con la papelera: sus proyectos también están ahí
+    por_cliente_id = dict(zip(clientes["cliente_id"].astype(str)[::-1], clientes["id"][::-1]))   # Repetidas: el primero
+    legado = proyectos["cliente_id"].fillna("").astype(str)
+    ids = legado.map(por_cliente_id)
+    pendientes = ((proyectos["cliente"] == "") & (legado != "")).to_numpy()
+    resueltos = pendientes & ids.notna().to_numpy()
+
+    if resueltos.any():
+        cliente = proyectos["cliente"].astype(str).to_numpy(dtype=object)
+        cliente[resueltos] = ids.to_numpy()[resueltos]
+        proyectos["cliente"] = pd.Categorical(cliente)
+
+    sin_cliente = legado.where(pendientes & ~resueltos, "")
+    if (sin_cliente != "").any():
+        proyectos["cliente_id"] = sin_cliente
+        return bool(resueltos.any()) or not sin_cliente.equals(legado)
+    proyectos.drop(columns="cliente_id", inplace=True)
+    return True
+
+
+def _migrar_ids(archivo, df):
+    # Se llama al cargar cada tabla. Devuelve True si le cambió algo
+    cambio = asignar_ids(df) > 0
+    if "cliente" in ESQUEMAS[archivo]:
+        cambio = resolver_clientes(df) or cambio
+    return cambio
+
+
+# ------------------ ÍNDICE DE CLAVES ------------------
+# Conjunto de claves (cliente_id, codigo_orden) normalizadas sin distinguir mayúsculas ni
+# espacios, para validar duplicados en O(1) al crear y al editar. Se arma una vez por tabla y
+# después se mantiene con cada alta, edición y baja; solo se reconstruye si el CSV cambió por
+# fuera de la aplicación. Se cuentan las apariciones porque un CSV viejo puede traer repetidas.
+def normalizar_clave(valor):
+    return str(valor).strip().casefold()
+
+
+def claves_normalizadas(serie):
+    return serie.astype(str).str.strip().str.casefold()
+
+
+class IndiceClaves:
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.columna = CLAVES[archivo]
+        self._lock = threading.Lock()
+        self._firma = None
+        self._claves = None
+
+    def _reconstruir(self):
+        df, firma = cargar_con_firma(self.archivo)
+        self._claves = Counter(claves_normalizadas(df[self.columna]))
+        self._firma = firma
+
+    def existe(self, valor, excepto=None):
+        # True si otro registro ya usa la clave. excepto es la clave original del registro que
+        # se está editando, para que cambiarle solo las mayúsculas no cuente como duplicado
+        clave = normalizar_clave(valor)
+        with self._lock:
+            if self._claves is None or self._firma != firma_tabla(self.archivo):
+                self._reconstruir()
+            apariciones = self._claves[clave]
+
+        if excepto is not None and normalizar_clave(excepto) == clave:
+            apariciones -= 1
+        return apariciones > 0
+
+    def aplicar(self, cambio):
+        if cambio.archivo != self.archivo:
+            return
+        with self._lock:
+            if self._claves is None or self._firma != cambio.firma_previa:
+                self._claves = None       # Se reconstruye en la próxima consulta
+                return
+            if cambio.antes is not None:
+                for clave in claves_normalizadas(cambio.antes[self.columna]):
+                    self._claves[clave] -= 1
+                    if self._claves[clave] <= 0:
+                        del self._claves[clave]
+            if cambio.despues is not None:
+                self._claves.update(claves_normalizadas(cambio.despues[self.columna]))
+            self._firma = cambio.firma_nueva
+
+
+INDICES_CLAVES = {archivo: IndiceClaves(archivo) for archivo in CLAVES}
+for _indice in INDICES_CLAVES.values():
+    suscribir(_indice.aplicar)
+
+
+def clave_existe(archivo, valor, excepto=None):
+    # Una clave ocupada en el archivo tampoco se puede usar en la tabla activa
+    return any(INDICES_CLAVES[parte].existe(valor, excepto) for parte in particiones(archivo))
+
+
+# ------------------ HISTORIAL ------------------
+# Auditoría y recuperación a un momento dado a partir de la bitácora y su historial
+def reiniciar_bitacoras():
+    # Después de reemplazar los CSV (restaurar un backup): cada bitácora abre un segmento nuevo
+    # sobre el CSV restaurado y la memoria se vuelve a cargar
+    with REPOSITORIO.lock:
+        for archivo, bitacora in BITACORAS.items():
+            bitacora.rotar(firma_archivo(archivo))
+        invalidar_cache()
+
+
+def _momento_iso(momento):
+    return pd.Timestamp(momento).isoformat(timespec="seconds")
+
+
+def eventos_desde(archivo, momento=None):
+    # Eventos registrados desde momento (o todos los que guarda el historial), del más viejo
+    # al más nuevo
+    bitacora = BITACORAS[archivo]
+    desde = _momento_iso(momento) if momento is not None else ""
+    eventos = []
+    for segmento in bitacora.segmentos():
+        _, _, del_segmento = bitacora.segmento(segmento)
+        eventos.extend(e for e in del_segmento if e["t"] >= desde)
+    return eventos
+
+
+def reconstruir_tabla(archivo, momento):
+    # Tabla completa (papelera incluida) tal como estaba en momento: se parte del último
+    # snapshot anterior y se reproducen los eventos hasta ese momento
+    bitacora = BITACORAS[archivo]
+    hasta = _momento_iso(momento)
+    segmentos = bitacora.segmentos()
+
+    inicio = None
+    for segmento in reversed(segmentos):
+        _, cabecera, _ = bitacora.segmento(segmento)
+        if cabecera is not None and cabecera["creado"] <= hasta:
+            inicio = segmento
+            break
+    if inicio is None:
+        raise ValueError(f"El historial de {bitacora.nombre} no llega hasta {hasta}")
+
+    snapshot, _, _ = bitacora.segmento(inicio)
+    df = leer_tabla(archivo, snapshot) if snapshot else tabla_vacia(archivo)   # Sin snapshot: la tabla no existía
+    for segmento in segmentos[segmentos.index(inicio):]:
+        _, _, eventos = bitacora.segmento(segmento)
+        df = reproducir(df, eventos, archivo, hasta)
+        if eventos and eventos[-1]["t"] > hasta:
+            break
+    return df
@@ -0,0 +1,95 @@
+import threading
+from collections import Counter
+
+from datos import PROYECTOS_CSV, cargar_con_firma, firma_tabla, suscribir
+
+
+# ------------------ ESTADÍSTICAS DE OPERACIÓN ------------------
+# Agregados de proyectos que se mantienen en memoria para el tablero. Se calculan completos una
+# vez y luego se corrigen con cada alta, edición o baja hecha desde la aplicación (restando las
+# filas de antes y sumando las de después). Si proyectos.csv cambia por fuera de la aplicación,
+# la firma del archivo deja de coincidir y se recalculan desde cero en la siguiente consulta.
+class Estadisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._firma = None
+        self._vigentes = False
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.en_proceso = 0
+        self.terminados = 0
+        self.por_mes = Counter()        # "AAAA-MM" de fecha_inicio -> proyectos iniciados
+        self.por_cliente = Counter()    # id del cliente -> proyectos
+        self.dias_total = 0             # Suma de duraciones (fecha_fin - fecha_inicio) en días
+        self.con_duracion = 0           # Proyectos terminados con ambas fechas
+
+    def _sumar(self, filas, signo):
+        # Suma (signo=1) o resta (signo=-1) el aporte de un grupo de filas, de forma vectorizada.
+        # Las filas en la papelera no cuentan: marcar una baja resta, deshacerla vuelve a sumar
+        if filas is None:
+            return
+        filas = filas[filas["eliminado_en"].isna()]
+        if filas.empty:
+            return
+
+        abiertos = int(filas["fecha_fin"].isna().sum())
+        self.en_proceso += signo * abiertos
+        self.terminados += signo * (len(filas) - abiertos)
+
+        meses = filas["fecha_inicio"].dropna().dt.strftime("%Y-%m").value_counts()
+        clientes = filas["cliente"].astype(str).value_counts()
+        duraciones = (filas["fecha_fin"] - filas["fecha_inicio"]).dropna().dt.days
+
+        if signo > 0:
+            self.por_mes.update(meses.to_dict())
+            self.por_cliente.update(clientes.to_dict())
+        else:
+            self.por_mes.subtract(meses.to_dict())
+            self.por_cliente.subtract(clientes.to_dict())
+            self.por_mes = +self.por_mes           # Se descartan los conteos que quedaron en cero
+            self.por_cliente = +self.por_cliente
+
+        self.dias_total += signo * int(duraciones.sum())
+        self.con_duracion += signo * len(duraciones)
+
+    def recalcular(self):
+        proyectos, firma = cargar_con_firma(PROYECTOS_CSV)
+        with self._lock:
+            self._reiniciar()
+            self._sumar(proyectos, 1)
+            self._firma = firma
+            self._vigentes = True
+
+    def aplicar(self, cambio):
+        # Suscriptor de datos.py: solo se corrige en sitio si los agregados correspondían a la
+        # versión del archivo que se modificó; si no, quedan marcados para recalcular
+        if cambio.archivo != PROYECTOS_CSV:
+            return
+
+        with self._lock:
+            if not self._vigentes or self._firma != cambio.firma_previa:
+                self._vigentes = False
+                return
+            self._sumar(cambio.antes, -1)
+            self._sumar(cambio.despues, 1)
+            self._firma = cambio.firma_nueva
+
+    def resumen(self, top_clientes=10):
+        if not self._vigentes or self._firma != firma_tabla(PROYECTOS_CSV):
+            self.recalcular()
+
+        with self._lock:
+            return {
+                "en_proceso": self.en_proceso,
+                "terminados": self.terminados,
+                "total": self.en_proceso + self.terminados,
+                "duracion_promedio": self.dias_total / self.con_duracion if self.con_duracion else None,
+                "por_mes": dict(sorted(self.por_mes.items())),
+                "top_clientes": self.por_cliente.most_common(top_clientes),
+            }
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+ESTADISTICAS = Estadisticas()
+suscribir(ESTADISTICAS.aplicar)
@@ -0,0 +1,48 @@
+import base64
+import mimetypes
+
+import streamlit.components.v1 as components
+from streamlit import runtime
+
+from datos import ruta_recurso
+from imagenes import ANCHO_MAXIMO, bytes_imagen
+
+
+# ------------------ CONFIG ------------------
+# Ancho de las miniaturas que viajan con la página (el resto se pide al abrir cada imagen)
+ANCHO_MINIATURA = 160
+
+
+# ------------------ GALERÍA DE IMÁGENES ------------------
+# Componente HTML (componentes/galeria/index.html) que recibe de una vez las miniaturas de todas
+# las imágenes y la dirección de cada imagen completa. Navegar, abrir y precargar las vecinas
+# ocurre en el navegador, sin volver a correr la página.
+# Las completas (reducidas al ancho de la página, desde la caché de imágenes) se registran en
+# el gestor de archivos multimedia de Streamlit, el mismo que sirve las de st.image: cada una
+# queda en su propia dirección, solo para la sesión que está viendo el proyecto, y el navegador
+# la descarga recién cuando la abre o la precarga. No se sirve ninguna carpeta de imágenes.
+_galeria = components.declare_component("galeria", path=ruta_recurso("componentes/galeria"))
+
+
+def _tipo(ruta):
+    return mimetypes.guess_type(ruta)[0] or "image/png"
+
+
+def _data_uri(datos, ruta):
+    return f"data:{_tipo(ruta)};base64,{base64.b64encode(datos).decode()}"
+
+
+def _imagen(ruta, id_proyecto, indice):
+    miniatura = _data_uri(bytes_imagen(ruta, ANCHO_MINIATURA), ruta)
+    if not runtime.exists():      # Sin servidor (pruebas, modo "bare") no hay dónde servirla
+        return {"miniatura": miniatura, "completa": _data_uri(bytes_imagen(ruta, ANCHO_MAXIMO), ruta)}
+    # Las coordenadas (proyecto e índice) hacen que una imagen reemplazada libere la anterior
+    url = runtime.get_instance().media_file_mgr.add(
+        bytes_imagen(ruta, ANCHO_MAXIMO), _tipo(ruta), f"galeria.{id_proyecto}.{indice}"
+    )
+    return {"miniatura": miniatura, "url": url}
+
+
+def galeria_imagenes(rutas, id_proyecto, key=None):
+    imagenes = [_imagen(ruta, id_proyecto, i) for i, ruta in enumerate(rutas)]
+    _galeria(imagenes=imagenes, key=key, default=None)
@@ -0,0 +1,212 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from datos import IMG_CLIENTES_DIR, IMG_PROYECTOS_DIR
+
+
+# ------------------ CONFIG ------------------
+# Memoria máxima para imágenes ya listas para enviar al navegador (se puede cambiar con la
+# variable de entorno DCC_CACHE_IMAGENES_MB)
+LIMITE_CACHE_IMAGENES_MB = int(os.environ.get("DCC_CACHE_IMAGENES_MB", "64"))
+
+# Las imágenes que se muestran a todo el ancho del contenedor se reducen a este ancho
+ANCHO_MAXIMO = 1280
+
+# Ancho del logo y de las fotos de las tarjetas de cumpleaños
+ANCHO_TARJETA = 200
+
+# Cada cuántos segundos, como máximo, se revisa el mtime de una carpeta de imágenes
+INTERVALO_REVISION_CARPETAS = 2.0
+
+
+# ------------------ MANIFIESTO DE IMÁGENES ------------------
+# Inventario de las carpetas de imágenes armado con una sola pasada de os.scandir. Las preguntas
+# de "¿existe esta imagen?" y "¿cuál es su mtime?" se responden desde memoria en lugar de tocar
+# el disco (lo que más demora en carpetas compartidas por red). El inventario de una carpeta se
+# rehace cuando cambia su mtime (archivos agregados, borrados o renombrados por fuera) y se
+# corrige en el momento cuando la propia aplicación escribe o borra una imagen.
+# Sobrescribir un archivo por fuera sin cambiar la carpeta no se detecta hasta el siguiente
+# cambio de la carpeta.
+class ManifiestoImagenes:
+    def __init__(self, carpetas):
+        self._lock = threading.Lock()
+        self._carpetas = {self._normalizar(c): None for c in carpetas}
+
+    @staticmethod
+    def _normalizar(ruta):
+        return os.path.normcase(os.path.abspath(ruta))
+
+    def _inventario(self, carpeta):
+        # Devuelve {nombre: mtime_ns} de la carpeta, re-escaneando solo si su mtime cambió
+        entrada = self._carpetas[carpeta]
+        ahora = time.monotonic()
+        if entrada is not None and ahora - entrada["revisado"] < INTERVALO_REVISION_CARPETAS:
+            return entrada["archivos"]
+
+        try:
+            mtime = os.stat(carpeta).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if entrada is None or entrada["mtime"] != mtime:
+            archivos = {}
+            if mtime is not None:
+                with os.scandir(carpeta) as it:
+                    for e in it:
+                        if e.is_file():
+                            archivos[os.path.normcase(e.name)] = e.stat().st_mtime_ns
+            entrada = {"mtime": mtime, "archivos": archivos}
+            self._carpetas[carpeta] = entrada
+
+        entrada["revisado"] = ahora
+        return entrada["archivos"]
+
+    def mtime(self, ruta):
+        # mtime_ns de la imagen, o None si no existe
+        carpeta, nombre = os.path.split(self._normalizar(ruta))
+        if carpeta not in self._carpetas:
+            try:
+                return os.stat(ruta).st_mtime_ns      # Rutas fuera de las carpetas administradas
+            except FileNotFoundError:
+                return None
+
+        with self._lock:
+            return self._inventario(carpeta).get(nombre)
+
+    def existe(self, ruta):
+        return self.mtime(ruta) is not None
+
+    def registrar(self, ruta):
+        # La aplicación acaba de escribir la imagen: se anota sin volver a escanear la carpeta
+        carpeta, nombre = os.path.split(self._normalizar(ruta))
+        if carpeta not in self._carpetas:
+            return
+        with self._lock:
+            archivos = self._inventario(carpeta)
+            archivos[nombre] = os.stat(ruta).st_mtime_ns
+            self._carpetas[carpeta]["mtime"] = os.stat(carpeta).st_mtime_ns
+
+    def olvidar(self, ruta):
+        carpeta, nombre = os.path.split(self._normalizar(ruta))
+        if carpeta not in self._carpetas:
+            return
+        with self._lock:
+            self._inventario(carpeta).pop(nombre, None)
+            self._carpetas[carpeta]["mtime"] = os.stat(carpeta).st_mtime_ns
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+MANIFIESTO = ManifiestoImagenes([IMG_CLIENTES_DIR, IMG_PROYECTOS_DIR])
+
+
+def existe_imagen(ruta):
+    return isinstance(ruta, str) and ruta.strip() != "" and MANIFIESTO.existe(ruta.strip())
+
+
+# ------------------ CACHÉ LRU DE IMÁGENES ------------------
+# Guarda los bytes codificados de cada imagen por (ruta, mtime, ancho). Una imagen reemplazada
+# cambia de mtime y por lo tanto de clave; invalidar() además libera de inmediato lo que quedó
+# de una ruta borrada o reemplazada. Cuando se pasa del límite se descarta lo menos usado.
+class CacheImagenes:
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, ruta, ancho=None):
+        mtime = MANIFIESTO.mtime(ruta)
+        if mtime is None:
+            raise FileNotFoundError(ruta)
+        clave = (ruta, mtime, ancho or ANCHO_MAXIMO)
+
+        with self._lock:
+            datos = self._datos.get(clave)
+            if datos is not None:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return datos
+            self.fallos += 1
+
+        # La decodificación se hace fuera del lock para no frenar a las demás sesiones
+        datos = preparar_imagen(ruta, clave[2])
+
+        with self._lock:
+            if clave not in self._datos and len(datos) <= self.limite_bytes:
+                self._datos[clave] = datos
+                self.bytes += len(datos)
+                while self.bytes > self.limite_bytes:
+                    _, descartado = self._datos.popitem(last=False)
+                    self.bytes -= len(descartado)
+        return datos
+
+    def invalidar(self, ruta):
+        with self._lock:
+            for clave in [c for c in self._datos if c[0] == ruta]:
+                self.bytes -= len(self._datos.pop(clave))
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._datos),
+                "bytes": self.bytes,
+                "limite_bytes": self.limite_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else None,
+            }
+
+
+def preparar_imagen(ruta, ancho):
+    # Si la imagen ya cabe en el ancho pedido se envían los bytes del archivo tal cual; si no,
+    # se reduce y se vuelve a codificar en su mismo formato
+    with Image.open(ruta) as img:
+        if img.width <= ancho:
+            with open(ruta, "rb") as f:
+                return f.read()
+
+        formato = img.format or "PNG"
+        reducida = img.copy()
+        reducida.thumbnail((ancho, img.height))
+
+    if formato == "JPEG" and reducida.mode not in ("RGB", "L"):
+        reducida = reducida.convert("RGB")
+
+    buffer = io.BytesIO()
+    reducida.save(buffer, format=formato, **({"quality": 85} if formato == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+CACHE_IMAGENES = CacheImagenes(LIMITE_CACHE_IMAGENES_MB * 1024 * 1024)
+
+
+def bytes_imagen(ruta, ancho=None):
+    return CACHE_IMAGENES.obtener(ruta, ancho)
+
+
+def invalidar_imagen(ruta):
+    CACHE_IMAGENES.invalidar(ruta)
+
+
+# ------------------ ESCRITURA DE IMÁGENES ------------------
+# Toda escritura o borrado de imágenes pasa por aquí para que la caché no sirva bytes viejos
+# y el manifiesto quede al día sin re-escanear la carpeta
+def guardar_imagen(origen, ruta):
+    Image.open(origen).save(ruta)
+    invalidar_imagen(ruta)
+    MANIFIESTO.registrar(ruta)
+
+
+def borrar_imagen(ruta):
+    os.remove(ruta)
+    invalidar_imagen(ruta)
+    MANIFIESTO.olvidar(ruta)
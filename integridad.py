@@ -0,0 +1,335 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from datos import (
+    CLIENTES_CSV,
+    IMG_CLIENTES_DIR,
+    IMG_PROYECTOS_DIR,
+    PROYECTOS_CSV,
+    REPOSITORIO,
+    actualizar_posiciones,
+    cargar_con_firma,
+    valores_por_fila,
+    claves_normalizadas,
+    nuevo_id,
+    particiones,
+)
+from trabajos import imagen_en_proceso
+
+
+# ------------------ CONFIG ------------------
+# Revisar la integridad de los datos al levantar la aplicación (variable de entorno
+# DCC_REVISAR_AL_INICIAR, 0 = solo a pedido desde el tablero o con "python cli.py verify")
+REVISAR_AL_INICIAR = os.environ.get("DCC_REVISAR_AL_INICIAR", "1") != "0"
+
+# Detalles que se guardan por problema (la cantidad se cuenta siempre completa)
+MAX_DETALLES = 200
+
+
+# ------------------ REVISIÓN DE INTEGRIDAD ------------------
+# Busca en una pasada vectorizada los daños que dejan las ediciones a mano de los CSV y los
+# cortes a mitad de una operación: claves e ids vacíos o repetidos (también entre proyectos
+# activos y archivados), proyectos cuyo cliente no existe o está en la papelera, imágenes
+# registradas que no están en disco y proyectos que terminan antes de empezar.
+#
+# Cada problema trae su plan de reparación automática cuando hay una que no pierde datos:
+#   - claves repetidas: la primera aparición se queda con la clave, las demás pasan a clave-2,
+#     clave-3... (sin chocar con otra existente)
+#   - ids vacíos o repetidos: las filas siguientes reciben un id nuevo (los proyectos siguen
+#     apuntando al primero)
+#   - proyectos activos de un cliente en la papelera: van a la papelera con la misma marca,
+#     así se restauran junto con él
+#   - imágenes faltantes: se quitan de la ficha
+# Los proyectos sin cliente, las claves vacías y las fechas invertidas se corrigen a mano.
+def _tablas():
+    # [(archivo, tabla completa)] de clientes y de cada partición de proyectos, leídas juntas
+    with REPOSITORIO.lock:
+        return [(archivo, cargar_con_firma(archivo)[0]) for archivo in [CLIENTES_CSV] + particiones(PROYECTOS_CSV)]
+
+
+def _unir(tablas, columnas):
+    # Las particiones de proyectos en una sola tabla, con la partición y la posición de cada fila
+    partes = [
+        df[columnas].assign(archivo=archivo, posicion=np.arange(len(df)))
+        for archivo, df in tablas
+    ]
+    unidas = pd.concat(partes, ignore_index=True)
+    if "cliente" in unidas.columns:
+        unidas["cliente"] = unidas["cliente"].astype(str)      # Las categorías de cada partición no coinciden
+    return unidas
+
+
+def _en(serie, valores):
+    # isin para conjuntos grandes (ids de clientes, archivos de una carpeta): las columnas de
+    # texto de pandas convierten uno por uno los valores buscados; como objetos se usa la tabla hash
+    return serie.astype(object).isin(valores).to_numpy()
+
+
+def _problema(descripcion, detalles, reparaciones=None):
+    return {"descripcion": descripcion, "detalles": detalles, "reparaciones": reparaciones or []}
+
+
+# -------- CLAVES E IDS --------
+def _claves_repetidas(df, clave):
+    # Filas con una clave (no vacía) que ya apareció antes. Propone clave-N libre para cada una
+    normales = claves_normalizadas(df[clave])
+    vacias = (normales == "").to_numpy()
+    repetidas = normales.duplicated(keep=False).to_numpy() & ~vacias
+    sobran = normales.duplicated(keep="first").to_numpy() & ~vacias
+
+    detalles = sorted(set(df.loc[repetidas, clave].astype(str)))
+    reparaciones = []
+    usadas = set(normales.tolist()) if sobran.any() else set()
+    for fila in df[sobran].itertuples(index=False):
+        base, n = str(getattr(fila, clave)).strip(), 2
+        while f"{base}-{n}".casefold() in usadas:
+            n += 1
+        nueva = f"{base}-{n}"
+        usadas.add(nueva.casefold())
+        reparaciones.append((fila.archivo, fila.posicion, clave, nueva))
+    return detalles, reparaciones, df.loc[vacias, "id"].astype(str).tolist()
+
+
+def _ids_repetidos(df):
+    # Filas sin id o con el id de una fila anterior: reciben uno nuevo
+    vacios = (df["id"] == "").to_numpy()
+    sobran = df["id"].duplicated(keep="first").to_numpy() | vacios
+    malas = df[sobran]
+    detalles = [f"{clave or 'sin clave'} ({id_fila or 'sin id'})" for clave, id_fila in zip(malas["clave"], malas["id"])]
+    reparaciones = [(archivo, posicion, "id", nuevo_id()) for archivo, posicion in zip(malas["archivo"], malas["posicion"])]
+    return detalles, reparaciones
+
+
+# -------- REFERENCIAS A CLIENTES --------
+def _sin_cliente(proyectos, clientes):
+    # Anti-join: proyectos cuyo id de cliente no está entre los clientes (incluidos los vacíos)
+    huerfanos = proyectos[~_en(proyectos["cliente"], set(clientes["id"].tolist()))]
+    legado = huerfanos["cliente_id"] if "cliente_id" in huerfanos.columns else pd.Series("", index=huerfanos.index)
+    return [
+        f"{codigo} -> {anterior or cliente or 'sin cliente'}"
+        for codigo, cliente, anterior in zip(huerfanos["codigo_orden"], huerfanos["cliente"], legado.fillna(""))
+    ]
+
+
+def _cliente_en_papelera(proyectos, clientes):
+    # Proyectos activos cuyo cliente está en la papelera: la baja del cliente quedó a medias
+    borrados = clientes[clientes["eliminado_en"].notna()].drop_duplicates("id").set_index("id")["eliminado_en"]
+    afectados = proyectos[proyectos["eliminado_en"].isna() & proyectos["cliente"].isin(borrados.index)]
+    marcas = borrados.reindex(afectados["cliente"]).tolist()
+    detalles = afectados["codigo_orden"].astype(str).tolist()
+    reparaciones = [
+        (archivo, posicion, "eliminado_en", marca)
+        for archivo, posicion, marca in zip(afectados["archivo"], afectados["posicion"], marcas)
+    ]
+    return detalles, reparaciones
+
+
+# -------- IMÁGENES --------
+def _normalizar(ruta):
+    return os.path.normcase(os.path.abspath(ruta or "."))
+
+
+def _en_disco():
+    # {carpeta normalizada: nombres normalizados de sus archivos} de las carpetas de imágenes
+    archivos = {}
+    for carpeta in (IMG_CLIENTES_DIR, IMG_PROYECTOS_DIR):
+        try:
+            with os.scandir(carpeta) as entradas:
+                nombres = {os.path.normcase(e.name) for e in entradas if e.is_file()}
+        except FileNotFoundError:
+            nombres = set()
+        archivos[_normalizar(carpeta)] = nombres
+    return archivos
+
+
+def _faltantes(rutas, en_disco):
+    # Máscara de las rutas (una por elemento) que no existen. Se comparan contra el listado de
+    # las carpetas de imágenes; solo las que apuntan a otra carpeta se consultan una por una
+    partes = rutas.str.replace("\\", "/", regex=False).str.rpartition("/")
+    carpetas = partes[0].map({c: _normalizar(c) for c in partes[0].unique()})
+    nombres = partes[2].map({n: os.path.normcase(n) for n in partes[2].unique()})
+
+    existe = np.zeros(len(rutas), dtype=bool)
+    conocidas = carpetas.isin(en_disco).to_numpy()
+    for carpeta, archivos in en_disco.items():
+        en_carpeta = (carpetas == carpeta).to_numpy()
+        existe[en_carpeta] = _en(nombres[en_carpeta], archivos)
+
+    otras = np.flatnonzero(~conocidas)
+    existe[otras] = [os.path.exists(ruta) for ruta in rutas.iloc[otras]]
+    # Las que un guardado en segundo plano todavía está escribiendo no cuentan
+    faltan = np.flatnonzero(~existe)
+    existe[faltan] = [imagen_en_proceso(ruta) for ruta in rutas.iloc[faltan]]
+    return ~existe
+
+
+def _imagenes_faltantes(df, columna, en_disco):
+    # Rutas de columna (separadas por comas) que no están en disco. La reparación deja en cada
+    # fila solo las que sí están
+    con_imagenes = df[df[columna] != ""]
+    rutas = con_imagenes[columna].str.split(",").explode().str.strip()
+    rutas = rutas[rutas != ""]
+    if rutas.empty:
+        return [], []
+
+    faltan = _faltantes(rutas, en_disco)
+    if not faltan.any():
+        return [], []
+
+    detalles = sorted(set(rutas[faltan]))
+    quedan = rutas[~faltan].groupby(level=0).agg(",".join)
+    filas = con_imagenes.loc[rutas.index[faltan].unique()]
+    reparaciones = [
+        (archivo, posicion, columna, quedan.get(indice, ""))
+        for indice, archivo, posicion in zip(filas.index, filas["archivo"], filas["posicion"])
+    ]
+    return detalles, reparaciones
+
+
+# -------- REVISIÓN COMPLETA --------
+def _revisar(tablas):
+    # {nombre del problema: {"descripcion", "detalles", "reparaciones"}}, con las reparaciones
+    # como [(archivo, posición, columna, valor nuevo)]
+    clientes = _unir(tablas[:1], ["id", "cliente_id", "imagen_path", "eliminado_en"])
+    columnas = ["id", "codigo_orden", "cliente", "fecha_inicio", "fecha_fin", "imagenes_paths", "eliminado_en"]
+    if any("cliente_id" in df.columns for _, df in tablas[1:]):
+        columnas.append("cliente_id")      # Cédula/NIT de los proyectos cuyo cliente no se encontró
+    proyectos = _unir(
+        [(archivo, df.reindex(columns=columnas, fill_value="")) for archivo, df in tablas[1:]],
+        columnas,
+    )
+    problemas = {}
+
+    for nombre, df, clave in (("clientes", clientes, "cliente_id"), ("proyectos", proyectos, "codigo_orden")):
+        repetidas, reparaciones, vacias = _claves_repetidas(df, clave)
+        problemas[f"{clave} duplicados"] = _problema(f"{clave} repetidos (sin distinguir mayúsculas ni espacios)", repetidas, reparaciones)
+        problemas[f"{nombre} sin {clave}"] = _problema(f"{nombre.capitalize()} sin {clave}", [f"id {i}" for i in vacias])
+        problemas[f"ids de {nombre}"] = _problema(f"Ids de {nombre} vacíos o repetidos", *_ids_repetidos(df.assign(clave=df[clave])))
+
+    problemas["proyectos con cliente inexistente"] = _problema(
+        "Proyectos cuyo cliente no existe", _sin_cliente(proyectos, clientes)
+    )
+    problemas["proyectos de clientes eliminados"] = _problema(
+        "Proyectos activos de clientes que están en la papelera", *_cliente_en_papelera(proyectos, clientes)
+    )
+
+    en_disco = _en_disco()
+    detalles_clientes, reparaciones_clientes = _imagenes_faltantes(clientes, "imagen_path", en_disco)
+    detalles_proyectos, reparaciones_proyectos = _imagenes_faltantes(proyectos, "imagenes_paths", en_disco)
+    problemas["imágenes faltantes"] = _problema(
+        "Imágenes registradas que no están en disco",
+        sorted(set(detalles_clientes) | set(detalles_proyectos)),
+        reparaciones_clientes + reparaciones_proyectos,
+    )
+
+    invertidas = proyectos[proyectos["fecha_fin"] < proyectos["fecha_inicio"]]
+    problemas["fechas invertidas"] = _problema(
+        "Proyectos con fecha de fin anterior a la de inicio",
+        invertidas["codigo_orden"].astype(str).tolist(),
+    )
+    return problemas
+
+
+def _informe(problemas, segundos):
+    # Lo que se muestra: cantidades y los primeros detalles, sin las reparaciones en sí
+    return {
+        "momento": datetime.now(),
+        "segundos": segundos,
+        "problemas": {
+            nombre: {
+                "descripcion": problema["descripcion"],
+                "cantidad": len(problema["detalles"]),
+                "detalles": problema["detalles"][:MAX_DETALLES],
+                "reparables": len(problema["reparaciones"]),
+            }
+            for nombre, problema in problemas.items()
+        },
+    }
+
+
+def _aplicar(problemas):
+    # Agrupa las reparaciones por tabla y escribe cada tabla en un solo evento. Si una fila
+    # recibe dos valores para la misma columna, queda el último. Devuelve las filas cambiadas
+    por_tabla = {}
+    for problema in problemas.values():
+        for archivo, posicion, columna, valor in problema["reparaciones"]:
+            por_tabla.setdefault(archivo, {}).setdefault(int(posicion), {})[columna] = valor
+
+    cambiadas = 0
+    for archivo, filas in por_tabla.items():
+        df, _ = cargar_con_firma(archivo)
+        cambiadas += actualizar_posiciones(archivo, *valores_por_fila(df, filas))
+    return cambiadas
+
+
+class RevisionIntegridad:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._informe = None
+        self._en_curso = False
+        self._iniciada = False
+
+    def revisar(self):
+        # Revisa los datos actuales y guarda el informe. Devuelve el informe
+        inicio = time.perf_counter()
+        problemas = _revisar(_tablas())
+        informe = _informe(problemas, time.perf_counter() - inicio)
+        with self._lock:
+            self._informe = informe
+        return informe
+
+    def reparar(self):
+        # Aplica las reparaciones automáticas sobre los datos de este momento (con el lock del
+        # repositorio tomado, para que las posiciones no cambien en el medio) y vuelve a revisar.
+        # Devuelve (filas cambiadas, informe nuevo)
+        with REPOSITORIO.lock:
+            cambiadas = _aplicar(_revisar(_tablas()))
+        return cambiadas, self.revisar()
+
+    def informe(self):
+        # Último informe, o None si todavía no se revisó
+        with self._lock:
+            return self._informe
+
+    def en_curso(self):
+        with self._lock:
+            return self._en_curso
+
+    def _revisar_al_iniciar(self):
+        try:
+            self.revisar()
+        except Exception:
+            pass      # Sin informe: se puede pedir desde el tablero
+        finally:
+            with self._lock:
+                self._en_curso = False
+
+    def iniciar(self):
+        # Lanza la revisión en segundo plano una sola vez por proceso
+        with self._lock:
+            if self._iniciada:
+                return
+            self._iniciada = self._en_curso = True
+        threading.Thread(target=self._revisar_al_iniciar, name="dcc-integridad", daemon=True).start()
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+REVISION = RevisionIntegridad()
+
+
+def iniciar_revision():
+    if REVISAR_AL_INICIAR:
+        REVISION.iniciar()
+
+
+def problemas_encontrados(informe):
+    return sum(problema["cantidad"] for problema in informe["problemas"].values())
+
+
+def reparables(informe):
+    return sum(problema["reparables"] for problema in informe["problemas"].values())
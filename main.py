@@ -1,40 +1,50 @@
 import streamlit as st
 import pandas as pd
 import os
-import sys
 from datetime import datetime, date
-from PIL import Image
-import zipfile
-import io
-import shutil
+from html import escape
+
+from datos import (
+    CLIENTES_CSV,
+    PROYECTOS_CSV,
+    IMG_CLIENTES_DIR,
+    IMG_PROYECTOS_DIR,
+    LOGO_PATH,
+    SIN_IMAGEN_PATH,
+    FORMATO_FECHA,
+    actualizar_registros,
+    marcar_eliminados,
+    restaurar_eliminados,
+    momento_actual,
+    clave_existe,
+    cargar_clientes,
+    cargar_proyectos,
+    nuevo_id,
+    obtener_cliente,
+    obtener_cliente_por_id,
+    obtener_proyecto,
+    obtener_proyecto_por_id,
+    proyectos_de_cliente,
+    cumpleanos,
+    COLUMNAS_CUMPLEANOS,
+    hay_archivo,
+    proyecto_archivado,
+    listar_clientes,
+    listar_proyectos,
+    buscar,
+    sugerir_clientes,
+)
+from estadisticas import ESTADISTICAS
+from busqueda import buscar_comentarios
+from respaldo import crear_backup_zip, restaurar_backup, listar_snapshots, iniciar_snapshots, FORMATO_SNAPSHOT
+from galeria import galeria_imagenes
+from imagenes import bytes_imagen, existe_imagen, guardar_imagen, borrar_imagen, CACHE_IMAGENES, ANCHO_TARJETA
+from trabajos import encolar, estado_trabajo, imagen_en_proceso, guardar_cliente, guardar_proyecto, editar_proyecto, editar_proyectos
+from trabajos import iniciar_purga, VENTANA_DESHACER_MIN
+from integridad import REVISION, iniciar_revision, problemas_encontrados, reparables
+from precarga import iniciar_precarga
 
 
-def ruta_recurso(ruta_relativa):
-    try:
-        base_path = sys._MEIPASS  # cuando es .exe
-    except Exception:
-        base_path = os.path.abspath(".")  # cuando es .py
-    return os.path.join(base_path, ruta_relativa)
-
-
-# ------------------ CONFIG ------------------
-# CSV
-CLIENTES_CSV = ruta_recurso("data/clientes.csv")
-PROYECTOS_CSV = ruta_recurso("data/proyectos.csv")
-
-# Carpetas de imágenes
-IMG_CLIENTES_DIR = ruta_recurso("assets/imagenes_clientes")
-IMG_PROYECTOS_DIR = ruta_recurso("assets/imagenes_proyectos")
-
-# Imágenes sueltas
-LOGO_PATH = ruta_recurso("assets/LOGO_DCC.png")
-SIN_IMAGEN_PATH = ruta_recurso("assets/sin_imagen.png")
-
-
-# Crear carpetas si no existen
-os.makedirs(IMG_CLIENTES_DIR, exist_ok=True)
-os.makedirs(IMG_PROYECTOS_DIR, exist_ok=True)
-
 # ------------------ INICIALIZAR session_state ------------------
 def init_state():
     if "pagina" not in st.session_state:   # Si el usuario no ha hecho ninguna acción en ningun boton, se debe llevar a el inicio
@@ -65,105 +75,23 @@ div[data-testid="stButton"] button:hover {
 </style>
 """, unsafe_allow_html=True)
 
-# ------------------ FUNCIONES AUXILIARES ------------------
-def guardar_csv(data, archivo):
-    df_nuevo = pd.DataFrame([data])    # Se convierten los datos a la estructura de Pandas
-    if os.path.exists(archivo):      # OS Revisa que el archivo exista
-        df = pd.read_csv(archivo, dtype=str)
-        df = pd.concat([df, df_nuevo], ignore_index=True)  # Se añaden los datos al final de la tabla de datos 
-    else:
-        df = df_nuevo   # Si no existe, se crea el archivo y se añade el dato
-    df.to_csv(archivo, index=False)
-
-def cargar_clientes():
-    if os.path.exists(CLIENTES_CSV):   # Se utiliza OS para revisar que el archivo exista
-        return pd.read_csv(CLIENTES_CSV, dtype=str)
-    return pd.DataFrame(columns=["cliente_id", "nombre", "apellido", "direccion", "imagen_path"])
-
-def cargar_proyectos():
-    if os.path.exists(PROYECTOS_CSV):
-        return pd.read_csv(PROYECTOS_CSV, dtype=str)     # Utilizando el pd.DataFtame, se puede guardar el CSV de manera ordenada y constante en el archivo
-    return pd.DataFrame(columns=["codigo_orden", "nombre_proyecto", "cliente_id", "fecha_inicio", "fecha_fin", "imagenes_paths", "comentarios"])
-
-def crear_backup_zip():
-    buffer = io.BytesIO()
-
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-
-        # CSV
-        if os.path.exists(CLIENTES_CSV):
-            zipf.write(CLIENTES_CSV, arcname="clientes.csv")
-
-        if os.path.exists(PROYECTOS_CSV):
-            zipf.write(PROYECTOS_CSV, arcname="proyectos.csv")
-
-        # Imágenes clientes
-        img_clientes_dir = os.path.join("assets", "imagenes_clientes")
-        if os.path.exists(img_clientes_dir):
-            for root, _, files in os.walk(img_clientes_dir):
-                for file in files:
-                    path = os.path.join(root, file)
-                    zipf.write(path, arcname=os.path.join("assets/imagenes_clientes", file))
-
-        # Imágenes proyectos
-        img_proyectos_dir = os.path.join("assets", "imagenes_proyectos")
-        if os.path.exists(img_proyectos_dir):
-            for root, _, files in os.walk(img_proyectos_dir):
-                for file in files:
-                    path = os.path.join(root, file)
-                    zipf.write(path, arcname=os.path.join("assets/imagenes_proyectos", file))
-
-    buffer.seek(0)
-    return buffer
-
-def restaurar_backup(uploaded_zip):
-    temp_dir = "temp_restore"
-
-    # Crear carpeta temporal
-    if os.path.exists(temp_dir):
-        shutil.rmtree(temp_dir)
-    os.makedirs(temp_dir)
-
-    # Extraer ZIP
-    with zipfile.ZipFile(uploaded_zip, "r") as zip_ref:
-        zip_ref.extractall(temp_dir)
-
-    # Restaurar CSV
-    clientes_path = os.path.join(temp_dir, "clientes.csv")
-    proyectos_path = os.path.join(temp_dir, "proyectos.csv")
-
-    if os.path.exists(clientes_path):
-        shutil.copy(clientes_path, CLIENTES_CSV)
-
-    if os.path.exists(proyectos_path):
-        shutil.copy(proyectos_path, PROYECTOS_CSV)
-
-    # Restaurar imágenes
-    src_clientes = os.path.join(temp_dir, "assets", "imagenes_clientes")
-    dst_clientes = os.path.join("assets", "imagenes_clientes")
-
-    if os.path.exists(src_clientes):
-        if os.path.exists(dst_clientes):
-            shutil.rmtree(dst_clientes)
-        shutil.copytree(src_clientes, dst_clientes)
-
-    src_proyectos = os.path.join(temp_dir, "assets", "imagenes_proyectos")
-    dst_proyectos = os.path.join("assets", "imagenes_proyectos")
-
-    if os.path.exists(src_proyectos):
-        if os.path.exists(dst_proyectos):
-            shutil.rmtree(dst_proyectos)
-        shutil.copytree(src_proyectos, dst_proyectos)
-
-    # Limpiar temporal
-    shutil.rmtree(temp_dir)
-
-
 # ------------------ TOPBARS ------------------
 def topbar_inicial():
     logo, top1, top2, top3 = st.columns([1, 5, 5, 2])
     with logo:
-        st.image(LOGO_PATH, width=200)
+        st.image(bytes_imagen(LOGO_PATH, ANCHO_TARJETA), width=ANCHO_TARJETA)
+
+    with top1:
+        nav_clientes, nav_proyectos, nav_tablero = st.columns(3)
+        with nav_clientes:
+            if st.button("Ver clientes", key="btn_lista_clientes_top"):
+                st.session_state.pagina = "pg_lista_clientes"
+        with nav_proyectos:
+            if st.button("Ver proyectos", key="btn_lista_proyectos_top"):
+                st.session_state.pagina = "pg_lista_proyectos"
+        with nav_tablero:
+            if st.button("Tablero", key="btn_tablero_top"):
+                st.session_state.pagina = "pg_tablero"
 
     with top3:
         # Toggle del menú
@@ -185,7 +113,7 @@ def topbar_inicial():
 def topbar_secundaria():
     logo, _, _, top3 = st.columns([1, 5, 5, 2])
     with logo:
-        st.image(LOGO_PATH, width=200)       # Se mantiene el logo de la empresa
+        st.image(bytes_imagen(LOGO_PATH, ANCHO_TARJETA), width=ANCHO_TARJETA)       # Se mantiene el logo de la empresa
     with top3:
         if st.button("Inicio", key="home_btn"):   # El boton de inicio cambia st.session_state.pagina para que lea inicio y el router lo interprete y cambie la -
             st.session_state.pagina = "inicio"    # pestaña.
@@ -193,17 +121,81 @@ def topbar_secundaria():
 
 
 
+# -------- TRABAJOS EN SEGUNDO PLANO ---------
+# Los guardados con imágenes se encolan en trabajos.py; la sesión recuerda los IDs y avisa
+# cuando terminan (o fallan) en la siguiente pasada de la página
+def encolar_guardado(descripcion, funcion, *args, rutas=()):
+    id_trabajo = encolar(descripcion, funcion, *args, rutas=rutas)
+    st.session_state.setdefault("trabajos", []).append(id_trabajo)
+    return id_trabajo
+
+
+def avisos_trabajos():
+    pendientes = []
+    for id_trabajo in st.session_state.get("trabajos", []):
+        trabajo = estado_trabajo(id_trabajo)
+        if trabajo is None:
+            continue
+        if trabajo["estado"] == "listo":
+            st.toast(f"{trabajo['descripcion']}: guardado", icon="✅")
+        elif trabajo["estado"] == "error":
+            st.error(f"{trabajo['descripcion']}: no se pudo guardar ({trabajo['error']})")
+        else:
+            pendientes.append(id_trabajo)
+
+    st.session_state.trabajos = pendientes
+    if pendientes:
+        vigilar_trabajos()
+
+
+@st.fragment(run_every=1)
+def vigilar_trabajos():
+    # Revisa cada segundo sin redibujar la página; cuando algo termina se redibuja completa
+    for id_trabajo in st.session_state.get("trabajos", []):
+        trabajo = estado_trabajo(id_trabajo)
+        if trabajo is None or trabajo["estado"] != "pendiente":
+            st.rerun()
+
+
+def hay_trabajos_pendientes():
+    return bool(st.session_state.get("trabajos"))
+
+
+# -------- DESHACER BAJA ---------
+def aviso_deshacer():
+    # Ofrece deshacer la última baja de la sesión mientras no venza la ventana de la papelera
+    deshacer = st.session_state.get("deshacer")
+    if not deshacer:
+        return
+
+    if momento_actual() - deshacer["momento"] > pd.Timedelta(minutes=VENTANA_DESHACER_MIN):
+        del st.session_state.deshacer
+        return
+
+    col_txt, col_btn = st.columns([4, 1])
+    with col_txt:
+        st.info(f"{deshacer['descripcion']}: eliminado.")
+    with col_btn:
+        if st.button("Deshacer", key="deshacer_baja", use_container_width=True):
+            for archivo, columna, valores in deshacer["marcas"]:
+                restaurar_eliminados(archivo, columna, valores, deshacer["momento"])
+            del st.session_state.deshacer
+            st.toast(f"{deshacer['descripcion']}: restaurado", icon="↩️")
+            st.rerun()
+
+
 # -------- TARJETA IMAGEN ---------
 def tarjeta_imagen(imagen_path):
-    if isinstance(imagen_path, str) and imagen_path and os.path.exists(imagen_path):
+    if existe_imagen(imagen_path):
         st.markdown('<div class="img-wrapper">', unsafe_allow_html=True)
-        st.image(imagen_path, use_container_width=True)
+        st.image(bytes_imagen(imagen_path), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     else:
+        texto = "Procesando imagen…" if imagen_en_proceso(imagen_path) else "Sin imagen"
         st.markdown(
-            """
+            f"""
             <div class="img-wrapper">
-                <div class="img-placeholder">Sin imagen</div>
+                <div class="img-placeholder">{texto}</div>
             </div>
             """,
             unsafe_allow_html=True
@@ -211,43 +203,37 @@ def tarjeta_imagen(imagen_path):
 
 
 # ------------------ PÁGINAS ------------------
+MAX_RESULTADOS = 200   # Resultados de búsqueda que se dibujan como máximo
+MAX_OPCIONES_CLIENTE = 50   # Opciones del selector de cliente en "Nuevo Proyecto"
 
 # -------- PÁGINA INICIO (BÚSQUEDA) --------
 def pagina_inicio():
     topbar_inicial()
+    aviso_deshacer()
 
     st.markdown("<h1 style='text-align:center; color:#e98450; font-style:italic;'>Búsqueda de Datos</h1>", unsafe_allow_html=True) # Titulos de la pagina
-    st.markdown("<p style='text-align:center; color:#ccc;'>Busque por cliente, nombre de proyecto o código de orden</p>", unsafe_allow_html=True)
-
-    clientes_df = cargar_clientes()       # Se cargan los datos existentes desde los archivos CSV usando Pandas
-    proyectos_df = cargar_proyectos()
+    st.markdown("<p style='text-align:center; color:#ccc;'>Busque por cliente, nombre de proyecto, código de orden o palabras de los comentarios</p>", unsafe_allow_html=True)
 
     # Barra de texto donde el usuario hace la busqueda
-    query = st.text_input("", placeholder="🔍 Buscar por nombre, ID o código de orden...", label_visibility="collapsed") 
+    query = st.text_input("", placeholder="🔍 Buscar por nombre, ID, código de orden o comentario...", label_visibility="collapsed") 
 
-    if query: # Si el usuario busco algo, se convierte a minusculas para evitar errores de mayusculas
-        query = query.lower() 
-        resultados = []  # Lista donde se almacenan los resultados coincidentes
+    # Los proyectos archivados (terminados hace tiempo) solo se buscan si se pide
+    incluir_archivo = hay_archivo() and st.checkbox("Incluir proyectos archivados", key="inicio_incluir_archivo")
 
-        # ---- Búsqueda dentro del archivo CSV de clientes ----
-        for _, row in clientes_df.iterrows():  # Recorre cada fila del archivo de clientes
-            # Se verifican coincidencias basadas en nombre, apellido, o ID. 
-            if query in str(row["nombre"]).lower() or query in str(row["apellido"]).lower() or query in str(row["cliente_id"]).lower():
-                resultados.append({
-                    "tipo": "Cliente",
-                    "nombre": f"{row['nombre']} {row['apellido']}",
-                    "codigo": str(row["cliente_id"])
-                })
-
-        # ---- Búsqueda dentro del archivo CSV de proyectos ----
-        for _, row in proyectos_df.iterrows():  # Recorre cada fila del archivo de proyectos
-            # Se verifican coincidencias basadas en nombre del proyecto o codigo de orden de producción.
-            if query in str(row["nombre_proyecto"]).lower() or query in str(row["codigo_orden"]).lower():
-                resultados.append({
-                    "tipo": "Proyecto",
-                    "nombre": row["nombre_proyecto"],
-                    "codigo": str(row["codigo_orden"])
-                })
+    if query: # Si el usuario busco algo, se busca sin distinguir mayusculas sobre los textos ya indexados
+        # Se buscan clientes por nombre, apellido o ID y proyectos por nombre o código de orden
+        resultados, total = buscar(query, limite=MAX_RESULTADOS, incluir_archivo=incluir_archivo)
+
+        # Y proyectos cuyo comentario menciona las palabras buscadas (materiales, medidas, notas),
+        # ordenados por relevancia, sin repetir los que ya coincidieron por nombre o código
+        ya_listados = {r["codigo"] for r in resultados if r["tipo"] == "Proyecto"}
+        en_comentarios, total_comentarios = buscar_comentarios(query, limite=MAX_RESULTADOS, incluir_archivo=incluir_archivo)
+        nuevos = [r for r in en_comentarios if r["codigo"] not in ya_listados]
+        resultados += nuevos[:max(MAX_RESULTADOS - len(resultados), 0)]
+        total += total_comentarios - (len(en_comentarios) - len(nuevos))
+
+        if total > len(resultados):
+            st.caption(f"Mostrando {len(resultados)} de {total} resultados. Escriba una búsqueda más específica o use los listados.")
 
         # Si hay coincidencias, se muestran los resultados
         if resultados:
@@ -292,6 +278,16 @@ def pagina_inicio():
                     """
                     st.markdown(html, unsafe_allow_html=True)
 
+                    # Coincidencia en el comentario: se muestra el fragmento con la palabra resaltada
+                    if r.get("fragmento"):
+                        texto = r["fragmento"]
+                        if r["resaltado"]:
+                            ini, fin = r["resaltado"]
+                            fragmento_html = f"{escape(texto[:ini])}<b style='color:#e98450;'>{escape(texto[ini:fin])}</b>{escape(texto[fin:])}"
+                        else:
+                            fragmento_html = escape(texto)
+                        st.markdown(f"<p style='color:#ccc; margin:0 0 6px 10px;'>💬 {fragmento_html}</p>", unsafe_allow_html=True)
+
                     # Botón que permite abrir el perfil del cliente o proyecto seleccionado
                     submit = st.form_submit_button(label="Abrir perfil", use_container_width=True)
                     if submit:
@@ -303,16 +299,10 @@ def pagina_inicio():
             st.info("No se encontraron resultados.")
 
 # ---------- CUMPLEAÑOS -----------
-    clientes_df = cargar_clientes()
-
     hoy = date.today()
-    cumple_hoy = []
 
-    for _, c in clientes_df.iterrows():
-        if isinstance(c["fecha_nacimiento"], str) and c["fecha_nacimiento"]:
-            fn = pd.to_datetime(c["fecha_nacimiento"]).date()
-            if fn.day == hoy.day and fn.month == hoy.month:
-                cumple_hoy.append(c)
+    # Índice por día y mes armado una vez por versión de la tabla; solo las columnas de la tarjeta
+    cumple_hoy = [c for _, c in cumpleanos(hoy, COLUMNAS_CUMPLEANOS).iterrows()]
 
     if cumple_hoy:
         st.markdown(
@@ -325,10 +315,10 @@ def pagina_inicio():
         for i, cliente in enumerate(cumple_hoy):
             with cols[i % 4]:
 
-                if isinstance(cliente["imagen_path"], str) and cliente["imagen_path"] and os.path.exists(cliente["imagen_path"]):
-                    st.image(cliente["imagen_path"], width=200)
+                if existe_imagen(cliente["imagen_path"]):
+                    st.image(bytes_imagen(cliente["imagen_path"], ANCHO_TARJETA), width=ANCHO_TARJETA)
                 else:
-                    st.image(SIN_IMAGEN_PATH, width=200)
+                    st.image(bytes_imagen(SIN_IMAGEN_PATH, ANCHO_TARJETA), width=ANCHO_TARJETA)
 
                 st.markdown(
                     f"""
@@ -370,15 +360,23 @@ def pagina_inicio():
     col_backup1, col_backup2 = st.columns(2)
     
     with col_backup1:
-        backup_data = crear_backup_zip()
-        st.download_button(
-            "Descargar backup",
-            data=backup_data,
-            file_name="backup_datos.zip",
-            mime="application/zip",
-            use_container_width=True,
-            key="btn_backup"
-        )
+        # El ZIP se arma solo cuando se pide, no en cada recarga de la página
+        if st.session_state.get("backup_zip") is None:
+            if st.button("Preparar backup", use_container_width=True, key="btn_preparar_backup"):
+                with st.spinner("Armando backup..."):
+                    st.session_state.backup_zip = crear_backup_zip().getvalue()
+                st.rerun()
+        else:
+            descargado = st.download_button(
+                "Descargar backup",
+                data=st.session_state.backup_zip,
+                file_name="backup_datos.zip",
+                mime="application/zip",
+                use_container_width=True,
+                key="btn_backup"
+            )
+            if descargado:
+                st.session_state.backup_zip = None
     
     with col_backup2:
         if "mostrar_uploader" not in st.session_state:
@@ -400,6 +398,24 @@ def pagina_inicio():
             st.success("Backup restaurado correctamente")
             st.session_state.mostrar_uploader = False
 
+        # Snapshots locales que toma la aplicación automáticamente
+        snapshots = listar_snapshots()
+        if snapshots:
+            col_snap1, col_snap2 = st.columns([3, 1])
+            with col_snap1:
+                elegido = st.selectbox(
+                    "O restaurar un snapshot local",
+                    [nombre for nombre, _ in snapshots],
+                    format_func=lambda nombre: f"{datetime.strptime(nombre, FORMATO_SNAPSHOT):%d/%m/%Y %H:%M:%S}",
+                    key="snapshot_restaurar"
+                )
+            with col_snap2:
+                st.write("")
+                if st.button("Restaurar snapshot", use_container_width=True, key="btn_restore_snapshot"):
+                    restaurar_backup(snapshot=elegido)
+                    st.success("Snapshot restaurado correctamente")
+                    st.session_state.mostrar_uploader = False
+
         
 # -------- PÁGINA PERFIL CLIENTE --------
 def pagina_perfil_cliente():
@@ -419,39 +435,37 @@ def pagina_perfil_cliente():
 
     cliente_id = seleccion["codigo"]
 
-    # Cargar datos
-    clientes_df = cargar_clientes()
-    proyectos_df = cargar_proyectos()
-
-    cliente = clientes_df[clientes_df["cliente_id"] == cliente_id].iloc[0]
+    # Cargar datos (el registro se busca por clave, sin recorrer la tabla)
+    cliente = obtener_cliente(cliente_id)
+    if cliente is None:
+        if hay_trabajos_pendientes():
+            st.info("Guardando los cambios…")
+        else:
+            st.warning("El cliente ya no existe.")
+        return
 
     nombre = cliente["nombre"]
     apellido = cliente["apellido"]
     imagen_path = cliente["imagen_path"]
     direccion = cliente["direccion"]
-    fecha_nacimiento = cliente.get("fecha_nacimiento", "")
+    fecha_nacimiento = cliente["fecha_nacimiento"]
 
-    if isinstance(fecha_nacimiento, str) and fecha_nacimiento:
-        fecha_nacimiento_fmt = pd.to_datetime(fecha_nacimiento).strftime("%d/%m/%Y")
+    if pd.notna(fecha_nacimiento):
+        fecha_nacimiento_fmt = fecha_nacimiento.strftime("%d/%m/%Y")
     else:
         fecha_nacimiento_fmt = "No registrada"
 
-    proyectos_cliente = proyectos_df[proyectos_df["cliente_id"] == cliente_id]
-
     # --- Layout ---
     col_img, col_info = st.columns([2, 5])
 
     # Imagen del cliente
     with col_img:
-        if (
-            isinstance(imagen_path, str) and
-            imagen_path.strip() != "" and
-            os.path.exists(imagen_path)
-        ):
-            st.image(imagen_path, use_container_width=True)
+        if existe_imagen(imagen_path):
+            st.image(bytes_imagen(imagen_path), use_container_width=True)
         else:
+            texto = "Procesando imagen…" if imagen_en_proceso(imagen_path) else "Sin imagen"
             st.markdown(
-                """
+                f"""
                 <div style="
                     height:250px;
                     background-color:#555;
@@ -463,7 +477,7 @@ def pagina_perfil_cliente():
                     color:#bbb;
                     font-style:italic;
                 ">
-                    Sin imagen
+                    {texto}
                 </div>
                 """,
                 unsafe_allow_html=True
@@ -486,6 +500,9 @@ def pagina_perfil_cliente():
 
         st.markdown("<h4 style='color:white;'>Proyectos Asociados</h4>", unsafe_allow_html=True)
 
+        incluir_archivo = hay_archivo() and st.checkbox("Incluir proyectos archivados", key=f"archivo_cliente_{cliente_id}")
+        proyectos_cliente = proyectos_de_cliente(cliente["id"], ["codigo_orden", "nombre_proyecto"], incluir_archivo)
+
         if proyectos_cliente.empty:
             st.info("Este cliente no tiene proyectos asociados.")
         else:
@@ -510,7 +527,7 @@ def pagina_perfil_cliente():
 
     # Botón editar
     if st.button("Editar", use_container_width=True):
-        st.session_state.editar_cliente_id = cliente_id
+        st.session_state.editar_id_cliente = cliente["id"]      # Por id: sigue siendo el mismo aunque le cambien la Cédula/NIT
         st.session_state.pagina = "pg_editar_cliente"
 
 # -------- PÁGINA NUEVO CLIENTE --------
@@ -522,8 +539,6 @@ def pagina_nuevo_cliente():
         unsafe_allow_html=True
     )
 
-    clientes_df = cargar_clientes()
-
     # -------- FORMULARIO --------
     cliente_id = st.text_input("Ingrese Cédula o NIT del cliente")
     nombre = st.text_input("Ingrese Nombre del cliente")
@@ -572,23 +587,28 @@ def pagina_nuevo_cliente():
             st.error("El ID y el nombre son obligatorios.")
             return
 
-        if cliente_id in clientes_df["cliente_id"].values:
+        if clave_existe(CLIENTES_CSV, cliente_id):
             st.error(f"Ya existe un cliente con la identificación {cliente_id}.")
             return
 
         # -------- MANEJO DE IMAGEN --------
+        # La imagen se procesa en segundo plano; aquí solo se leen los bytes subidos. Se nombra
+        # con el id interno, que no cambia aunque después se corrija la Cédula/NIT
+        id_cliente = nuevo_id()
         imagen_path = ""
+        imagenes_nuevas = []
 
         if img_cliente:
             ext = img_cliente.name.split(".")[-1]
             imagen_path = os.path.join(
                 IMG_CLIENTES_DIR,
-                f"{cliente_id}.{ext}"
+                f"{id_cliente}.{ext}"
             )
-            Image.open(img_cliente).save(imagen_path)
+            imagenes_nuevas.append((img_cliente.getvalue(), imagen_path))
 
         # -------- GUARDAR --------
         data = {
+            "id": id_cliente,
             "cliente_id": cliente_id,
             "nombre": nombre,
             "apellido": apellido,
@@ -597,7 +617,11 @@ def pagina_nuevo_cliente():
             "fecha_nacimiento": fecha_nacimiento_str
         }
 
-        guardar_csv(data, CLIENTES_CSV)
+        encolar_guardado(
+            f"Cliente {nombre} {apellido}",
+            guardar_cliente, data, imagenes_nuevas,
+            rutas=[ruta for _, ruta in imagenes_nuevas]
+        )
 
         st.session_state.pagina = "pg_guardado_cliente"
         st.session_state.nombre_guardado = f"{nombre} {apellido}"
@@ -608,12 +632,12 @@ def pagina_nuevo_cliente():
 def pagina_editar_cliente():
     topbar_secundaria()
 
-    editar_id = st.session_state.get("editar_cliente_id")
+    id_cliente = st.session_state.get("editar_id_cliente")
 
     if "confirmar_eliminar_cliente" not in st.session_state:
         st.session_state.confirmar_eliminar_cliente = False
 
-    if editar_id and "eliminar_imagen" not in st.session_state:
+    if id_cliente and "eliminar_imagen" not in st.session_state:
         st.session_state.eliminar_imagen = False
 
     st.markdown(
@@ -621,21 +645,21 @@ def pagina_editar_cliente():
         unsafe_allow_html=True
     )
 
-    cliente_id_original = st.session_state.get("editar_cliente_id")
-
-
-    if not cliente_id_original:
+    if not id_cliente:
         st.warning("No hay cliente seleccionado para editar.")
         if st.button("Volver al inicio"):
             st.session_state.pagina = "inicio"
         return
 
-    clientes_df = cargar_clientes()
-    proyectos_df = cargar_proyectos()
-
-    cliente = clientes_df[
-        clientes_df["cliente_id"] == cliente_id_original
-    ].iloc[0]
+    # Se busca por id: otra sesión pudo cambiarle la Cédula/NIT o mandarlo a la papelera
+    cliente = obtener_cliente_por_id(id_cliente)
+    if cliente is None:
+        st.error("El cliente ya no existe: otra sesión lo eliminó.")
+        if st.button("Volver al inicio"):
+            st.session_state.editar_id_cliente = None
+            st.session_state.pagina = "inicio"
+        return
+    cliente_id_original = cliente["cliente_id"]
 
     # -------- DATOS ACTUALES --------
     cliente_id = st.text_input(
@@ -644,10 +668,8 @@ def pagina_editar_cliente():
     )
 
     fecha_nacimiento_actual = None
-    if isinstance(cliente["fecha_nacimiento"], str) and cliente["fecha_nacimiento"]:
-        fecha_nacimiento_actual = pd.to_datetime(
-            cliente["fecha_nacimiento"]
-        ).date()
+    if pd.notna(cliente["fecha_nacimiento"]):
+        fecha_nacimiento_actual = cliente["fecha_nacimiento"].date()
 
 
     nombre = st.text_input("Nombre", value=cliente["nombre"])
@@ -665,8 +687,8 @@ def pagina_editar_cliente():
 
     # -------- PREVISUALIZACIÓN DE IMAGEN --------
     with col_img:
-        if isinstance(imagen_path_actual, str) and imagen_path_actual and os.path.exists(imagen_path_actual):
-            st.image(imagen_path_actual, caption="Imagen actual", use_container_width=True)
+        if existe_imagen(imagen_path_actual):
+            st.image(bytes_imagen(imagen_path_actual), caption="Imagen actual", use_container_width=True)
         else:
             st.markdown(
                 "<div style='height:220px; background:#444; border:2px dashed #999; "
@@ -683,7 +705,7 @@ def pagina_editar_cliente():
             type=["png", "jpg", "jpeg"]
         )
 
-        if imagen_path_actual and isinstance(imagen_path_actual, str) and os.path.exists(imagen_path_actual):
+        if existe_imagen(imagen_path_actual):
             if st.button("Eliminar imagen"):
                 st.session_state.eliminar_imagen = True
                 st.info("La imagen se eliminará al guardar los cambios.")
@@ -703,23 +725,18 @@ def pagina_editar_cliente():
 
     with col_guardar:
         if st.button("Guardar cambios", use_container_width=True):
-            # -------- VALIDAR ID SOLO SI CAMBIÓ --------
-            if cliente_id != cliente_id_original:
-                ids_existentes = clientes_df[
-                    clientes_df["cliente_id"] != cliente_id_original
-                ]["cliente_id"].values
-
-                if cliente_id in ids_existentes:
-                    st.error("Ya existe un cliente con ese ID.")
-                    return
+            # -------- VALIDAR ID ÚNICO --------
+            if clave_existe(CLIENTES_CSV, cliente_id, excepto=cliente_id_original):
+                st.error("Ya existe un cliente con ese ID.")
+                return
 
             # -------- MANEJO DE IMAGEN --------
             imagen_final = imagen_path_actual
 
             # Caso 1: eliminar imagen (solo ahora se borra)
             if st.session_state.eliminar_imagen:
-                if imagen_path_actual and os.path.exists(imagen_path_actual):
-                    os.remove(imagen_path_actual)
+                if existe_imagen(imagen_path_actual):
+                    borrar_imagen(imagen_path_actual)
                 imagen_final = ""
                 st.session_state.eliminar_imagen = False  # reset flag
 
@@ -728,51 +745,26 @@ def pagina_editar_cliente():
                 ext = img_nueva.name.split(".")[-1]
                 imagen_final = os.path.join(
                     IMG_CLIENTES_DIR,
-                    f"{cliente_id}.{ext}"
-                )
-                Image.open(img_nueva).save(imagen_final)
-
-            # Caso 3: cambiar ID y mantener imagen
-            elif imagen_path_actual and cliente_id != cliente_id_original:
-                ext = imagen_path_actual.split(".")[-1]
-                nueva_ruta = os.path.join(
-                    IMG_CLIENTES_DIR,
-                    f"{cliente_id}.{ext}"
+                    f"{cliente['id']}.{ext}"
                 )
-                if os.path.exists(imagen_path_actual):
-                    os.rename(imagen_path_actual, nueva_ruta)
-                    imagen_final = nueva_ruta
-                    
+                guardar_imagen(img_nueva, imagen_final)
 
             # -------- ACTUALIZAR CLIENTE --------
-            clientes_df.loc[
-                clientes_df["cliente_id"] == cliente_id_original,
-                [
-                    "cliente_id",
-                    "nombre",
-                    "apellido",
-                    "direccion",
-                    "imagen_path",
-                    "fecha_nacimiento"
-                ]
-            ] = [
-                cliente_id,
-                nombre,
-                apellido,
-                direccion,
-                imagen_final,
-                fecha_nacimiento.strftime("%Y-%m-%d") if fecha_nacimiento else ""
-            ]
-
-            clientes_df.to_csv(CLIENTES_CSV, index=False)
-
-            # -------- ACTUALIZACIÓN EN CASCADA --------
-            proyectos_df.loc[
-                proyectos_df["cliente_id"] == cliente_id_original,
-                "cliente_id"
-            ] = cliente_id
-
-            proyectos_df.to_csv(PROYECTOS_CSV, index=False)
+            # Una sola fila: los proyectos apuntan al id del cliente y la imagen se nombra con
+            # él, así cambiar la Cédula/NIT no toca proyectos ni archivos
+            actualizar_registros(
+                CLIENTES_CSV,
+                "id",
+                cliente["id"],
+                {
+                    "cliente_id": cliente_id,
+                    "nombre": nombre,
+                    "apellido": apellido,
+                    "direccion": direccion,
+                    "imagen_path": imagen_final,
+                    "fecha_nacimiento": fecha_nacimiento
+                }
+            )
 
             # -------- MENSAJE + VOLVER A PERFIL --------
             st.session_state.seleccion = {
@@ -800,7 +792,7 @@ def pagina_editar_cliente():
             " **¿Estás seguro de eliminar este cliente?**\n\n"
             "• Se eliminará el cliente **y TODOS los proyectos asociados**\n"
             "• Se borrarán **todas las imágenes relacionadas**\n"
-            "• **Esta acción NO es reversible**"
+            f"• Podrás deshacerlo desde el inicio durante **{VENTANA_DESHACER_MIN} minutos**"
         )
 
         col_no, col_si = st.columns(2)
@@ -814,49 +806,33 @@ def pagina_editar_cliente():
 
         with col_si:
             if st.button(
-                "Sí, eliminar definitivamente",
+                "Sí, eliminar",
                 use_container_width=True
             ):
-                # -------- BORRADO REAL --------
-
-                # Imagen del cliente
-                img_cliente = cliente["imagen_path"]
-                if isinstance(img_cliente, str) and img_cliente and os.path.exists(img_cliente):
-                    os.remove(img_cliente)
-
-                # Proyectos asociados
-                proyectos_cliente = proyectos_df[
-                    proyectos_df["cliente_id"] == cliente_id_original
+                # -------- BAJA A LA PAPELERA --------
+                # Cliente y proyectos quedan marcados con el mismo momento; las imágenes se
+                # borran con la purga cuando vence la ventana para deshacer
+                momento = momento_actual()
+                marcas = [
+                    (PROYECTOS_CSV, "cliente", [cliente["id"]]),
+                    (CLIENTES_CSV, "id", [cliente["id"]]),
                 ]
+                for archivo, columna, valores in marcas:
+                    marcar_eliminados(archivo, columna, valores, momento)
 
-                # Imágenes de proyectos
-                for _, p in proyectos_cliente.iterrows():
-                    imgs = p.get("imagenes_paths", "")
-                    if isinstance(imgs, str) and imgs:
-                        for ruta in imgs.split(","):
-                            ruta = ruta.strip()
-                            if os.path.exists(ruta):
-                                os.remove(ruta)
-
-                # Borrar proyectos
-                proyectos_df = proyectos_df[
-                    proyectos_df["cliente_id"] != cliente_id_original
-                ]
-                proyectos_df.to_csv(PROYECTOS_CSV, index=False)
-
-                # Borrar cliente
-                clientes_df = clientes_df[
-                    clientes_df["cliente_id"] != cliente_id_original
-                ]
-                clientes_df.to_csv(CLIENTES_CSV, index=False)
+                st.session_state.deshacer = {
+                    "descripcion": f"Cliente {cliente['nombre']} {cliente['apellido']} y sus proyectos",
+                    "momento": momento,
+                    "marcas": marcas,
+                }
 
                 # Limpiar estado
                 st.session_state.confirmar_eliminar_cliente = False
-                st.session_state.editar_cliente_id = None
+                st.session_state.editar_id_cliente = None
                 st.session_state.seleccion = None
                 st.session_state.pagina = "inicio"
 
-                st.success("Cliente y proyectos asociados eliminados correctamente.")
+                st.success("Cliente y proyectos asociados eliminados. Puedes deshacerlo desde el inicio.")
                 st.stop()
 
 
@@ -899,23 +875,22 @@ def pagina_perfil_proyecto():
         st.warning("No hay proyecto seleccionado.")
         return
 
-    proyectos_df = cargar_proyectos()
-    clientes_df = cargar_clientes()
-
-    proyecto = proyectos_df[
-        proyectos_df["codigo_orden"] == codigo_proyecto
-    ].iloc[0]
-
-    cliente_id = proyecto["cliente_id"]
+    proyecto = obtener_proyecto(codigo_proyecto)
+    if proyecto is None:
+        if hay_trabajos_pendientes():
+            st.info("Guardando los cambios…")
+        else:
+            st.warning("El proyecto ya no existe.")
+        return
 
-    cliente_row = clientes_df[
-        clientes_df["cliente_id"] == cliente_id
-    ]
+    cliente = obtener_cliente_por_id(proyecto["cliente"], ["cliente_id", "nombre", "apellido"])
 
-    if not cliente_row.empty:
-        cliente_nombre = cliente_row.iloc[0]["nombre"]
-        cliente_apellido = cliente_row.iloc[0]["apellido"]
+    if cliente is not None:
+        cliente_id = cliente["cliente_id"]
+        cliente_nombre = cliente["nombre"]
+        cliente_apellido = cliente["apellido"]
     else:
+        cliente_id = None
         cliente_nombre = "Cliente"
         cliente_apellido = "desconocido"
 
@@ -928,10 +903,10 @@ def pagina_perfil_proyecto():
 
     st.markdown(f"**Código de orden:** {proyecto['codigo_orden']}")
 
-    # ------------------ CLIENTE (ID CLICKEABLE) ------------------
-    cliente_id = proyecto["cliente_id"]
-    cliente = clientes_df[clientes_df["cliente_id"] == cliente_id].iloc[0]
+    if proyecto_archivado(proyecto["codigo_orden"]):
+        st.caption("📦 Proyecto archivado: no aparece en búsquedas ni listados salvo que se incluya el archivo. Se edita igual que uno activo y, si se reabre, vuelve a los activos.")
 
+    # ------------------ CLIENTE (ID CLICKEABLE) ------------------
     col_txt, col_btn = st.columns([4, 1])
 
     with col_txt:
@@ -959,8 +934,8 @@ def pagina_perfil_proyecto():
 
     with col_btn:
 
-        # --- DETECTAR CLICK EN CLIENTE ---
-        if st.button(
+        # --- DETECTAR CLICK EN CLIENTE (si el cliente existe) ---
+        if cliente_id is not None and st.button(
             cliente_id,
             key=f"btn_cliente_{cliente_id}",
             help="Ver perfil del cliente"
@@ -977,16 +952,21 @@ def pagina_perfil_proyecto():
 
     fecha_fin = proyecto["fecha_fin"]
 
-    if isinstance(fecha_fin, str) and fecha_fin.strip():
-        fecha_fin_txt = fecha_fin
+    if pd.notna(fecha_fin):
+        fecha_fin_txt = fecha_fin.strftime(FORMATO_FECHA)
     else:
         fecha_fin_txt = "En proceso"
 
+    if pd.notna(proyecto["fecha_inicio"]):
+        fecha_inicio_txt = proyecto["fecha_inicio"].strftime(FORMATO_FECHA)
+    else:
+        fecha_inicio_txt = ""
+
     col_fi, col_ff = st.columns(2)
 
     with col_fi:
         st.markdown("**Fecha inicio**")
-        st.markdown(proyecto["fecha_inicio"])
+        st.markdown(fecha_inicio_txt)
 
     with col_ff:
         st.markdown("**Fecha final**")
@@ -1021,56 +1001,21 @@ def pagina_perfil_proyecto():
         imagenes = [
             img.strip()
             for img in imagenes_raw.split(",")
-            if img.strip() and os.path.exists(img.strip())
+            if existe_imagen(img)
         ]
+        en_proceso = sum(imagen_en_proceso(img) for img in imagenes_raw.split(","))
     else:
         imagenes = []
+        en_proceso = 0
 
-    # Inicializar índice si no existe
-    if "img_index" not in st.session_state:
-        st.session_state.img_index = 0
-
-    # 🔒 Asegurar índice válido SIEMPRE
-    if st.session_state.img_index >= len(imagenes):
-        st.session_state.img_index = 0
+    if en_proceso:
+        st.info(f"Procesando {en_proceso} imagen(es)…")
 
-    # ----- CASO 0: SIN IMÁGENES -----
     if len(imagenes) == 0:
         st.info("Este proyecto no tiene imágenes asociadas.")
-
-    # ----- CASO 1: UNA SOLA IMAGEN -----
-    elif len(imagenes) == 1:
-        st.image(imagenes[0], use_container_width=True)
-
-    # ----- CASO 2: CARRUSEL -----
     else:
-        col_prev, col_img, col_next = st.columns([1, 6, 1])
-
-        with col_prev:
-            if st.button("◀", key="prev_img"):
-                st.session_state.img_index = (
-                    st.session_state.img_index - 1
-                ) % len(imagenes)
-
-        with col_img:
-            st.image(
-                imagenes[st.session_state.img_index],
-                use_container_width=True
-            )
-
-        with col_next:
-            if st.button("▶", key="next_img"):
-                st.session_state.img_index = (
-                    st.session_state.img_index + 1
-                ) % len(imagenes)
-
-
-        st.markdown(
-            f"<p style='text-align:center; color:#aaa; margin-top:4px;'>"
-            f"Imagen {st.session_state.img_index + 1} de {len(imagenes)}"
-            f"</p>",
-            unsafe_allow_html=True
-    )
+        # La navegación entre imágenes ocurre en el navegador, sin recargar la página
+        galeria_imagenes(imagenes, proyecto["id"], key=f"galeria_{proyecto['id']}")
 
 
     # ------------------ BOTÓN EDITAR (ABAJO DERECHA) ------------------
@@ -1081,7 +1026,7 @@ def pagina_perfil_proyecto():
 
     with col_btn:
         if st.button("Editar", use_container_width=True):
-            st.session_state.editar_proyecto_codigo = proyecto["codigo_orden"]
+            st.session_state.editar_id_proyecto = proyecto["id"]      # Por id: sigue siendo el mismo aunque le cambien el código
             st.session_state.pagina = "editar_proyecto"
 
 
@@ -1092,22 +1037,25 @@ def pagina_editar_proyecto():
         st.session_state.confirmar_eliminar_proyecto = False
 
     # ------------------ OBTENER ID A EDITAR ------------------
-    codigo_original = st.session_state.get("editar_proyecto_codigo")
-    codigo_orden_original = codigo_original
+    id_proyecto = st.session_state.get("editar_id_proyecto")
 
 
-    if not codigo_original:
+    if not id_proyecto:
         st.warning("No hay proyecto seleccionado para editar.")
         if st.button("Volver"):
             st.session_state.pagina = "inicio"
         return
 
     # ------------------ CARGAR DATOS ------------------
-    proyectos_df = cargar_proyectos()
-
-    proyecto = proyectos_df[
-        proyectos_df["codigo_orden"] == codigo_original
-    ].iloc[0]
+    # Se busca por id: otra sesión pudo cambiarle el código o mandarlo a la papelera
+    proyecto = obtener_proyecto_por_id(id_proyecto)
+    if proyecto is None:
+        st.error("El proyecto ya no existe: otra sesión lo eliminó.")
+        if st.button("Volver"):
+            st.session_state.editar_id_proyecto = None
+            st.session_state.pagina = "inicio"
+        return
+    codigo_original = proyecto["codigo_orden"]
 
     # ------------------ ESTADO PARA IMÁGENES ------------------
     if "imagenes_a_eliminar" not in st.session_state:
@@ -1123,39 +1071,35 @@ def pagina_editar_proyecto():
     codigo_orden = st.text_input(
         "Código de orden",
         value=proyecto["codigo_orden"]
-    )
+    ).strip().upper()      # Igual que al crear: sin espacios y en mayúsculas
 
     nombre_proyecto = st.text_input(
         "Nombre del proyecto",
         value=proyecto["nombre_proyecto"]
     )
 
+    # El proyecto guarda el id interno del cliente; aquí se edita por su Cédula/NIT
+    cliente_actual = obtener_cliente_por_id(proyecto["cliente"], ["cliente_id"])
     cliente_id = st.text_input(
         "ID del cliente",
-        value=proyecto["cliente_id"]
+        value=cliente_actual["cliente_id"] if cliente_actual is not None else ""
     )
 
     # -------- FECHAS SEGURAS --------
     fecha_inicio_actual = None
     fecha_fin_actual = None
 
-    # Fecha inicio (OBLIGATORIA)
-    if isinstance(proyecto["fecha_inicio"], str) and proyecto["fecha_inicio"].strip():
-        fecha_inicio_actual = pd.to_datetime(
-            proyecto["fecha_inicio"],
-            errors="coerce"
-        ).date()
+    # Fecha inicio (OBLIGATORIA). Las fechas inválidas ya llegan como NaT desde el esquema
+    if pd.notna(proyecto["fecha_inicio"]):
+        fecha_inicio_actual = proyecto["fecha_inicio"].date()
 
     # Si aun así falla, forzar hoy (última barrera)
     if fecha_inicio_actual is None:
         fecha_inicio_actual = date.today()
 
     # Fecha fin (OPCIONAL)
-    if isinstance(proyecto["fecha_fin"], str) and proyecto["fecha_fin"].strip():
-        fecha_fin_actual = pd.to_datetime(
-            proyecto["fecha_fin"],
-            errors="coerce"
-        ).date()
+    if pd.notna(proyecto["fecha_fin"]):
+        fecha_fin_actual = proyecto["fecha_fin"].date()
 
 
     col_fi, col_ff = st.columns(2)
@@ -1207,8 +1151,10 @@ def pagina_editar_proyecto():
 
         for i, img_path in enumerate(imagenes):
             with cols[i % 3]:
-                if os.path.exists(img_path):
-                    st.image(img_path, use_container_width=True)
+                if existe_imagen(img_path):
+                    st.image(bytes_imagen(img_path), use_container_width=True)
+                elif imagen_en_proceso(img_path):
+                    st.info("Procesando imagen…")
                 else:
                     st.warning("Imagen no encontrada")
 
@@ -1253,65 +1199,69 @@ def pagina_editar_proyecto():
         if st.button("Guardar cambios", use_container_width=True):
 
             # ---- VALIDAR CÓDIGO ÚNICO ----
-            if codigo_orden != codigo_original:
-                codigos_existentes = (
-                    proyectos_df["codigo_orden"]
-                    .astype(str)
-                    .str.upper()
-                    .values
-                )
+            if clave_existe(PROYECTOS_CSV, codigo_orden, excepto=codigo_original):
+                st.error("Ya existe un proyecto con ese código.")
+                return
 
-                if codigo_orden.upper() in codigos_existentes:
-                    st.error("Ya existe un proyecto con ese código.")
+            # ---- CLIENTE (por su Cédula/NIT; vacío = sin cliente) ----
+            id_cliente = proyecto["cliente"]
+            if cliente_actual is None or cliente_id != cliente_actual["cliente_id"]:
+                cliente_nuevo = obtener_cliente(cliente_id, ["id"]) if cliente_id else None
+                if cliente_id and cliente_nuevo is None:
+                    st.error(f"No existe un cliente con la identificación {cliente_id}.")
                     return
+                id_cliente = cliente_nuevo["id"] if cliente_nuevo is not None else ""
 
 
-            # ---- BORRAR IMÁGENES MARCADAS ----
+            # ---- IMÁGENES MARCADAS (se borran en segundo plano) ----
             imagenes_finales = []
+            imagenes_a_borrar = []
 
             for img in imagenes:
                 if img in st.session_state.imagenes_a_eliminar:
-                    if os.path.exists(img):
-                        os.remove(img)
+                    imagenes_a_borrar.append(img)
                 else:
                     imagenes_finales.append(img)
 
-            # ---- GUARDAR NUEVAS IMÁGENES ----
+            # ---- NUEVAS IMÁGENES (se leen los bytes; se guardan en segundo plano) ----
+            # Cada una toma el siguiente número que no usa ninguna imagen del proyecto (tampoco
+            # las marcadas para borrar, que siguen en disco hasta que corre el trabajo, ni las que otro
+            # guardado todavía está escribiendo)
+            imagenes_nuevas = []
             if nuevas_imgs:
-                for idx, img in enumerate(nuevas_imgs):
+                ocupadas = {os.path.normcase(os.path.abspath(ruta)) for ruta in imagenes}
+                numero = 1
+                for img in nuevas_imgs:
                     ext = img.name.split(".")[-1]
-                    nueva_ruta = os.path.join(
-                        IMG_PROYECTOS_DIR,
-                        f"{codigo_orden}_{len(imagenes_finales)+idx}.{ext}"
-                    )
-                    Image.open(img).save(nueva_ruta)
+                    while True:
+                        nueva_ruta = os.path.join(IMG_PROYECTOS_DIR, f"{proyecto['id']}_{numero}.{ext}")
+                        numero += 1
+                        if os.path.normcase(os.path.abspath(nueva_ruta)) not in ocupadas \
+                                and not existe_imagen(nueva_ruta) and not imagen_en_proceso(nueva_ruta):
+                            break
+                    imagenes_nuevas.append((img.getvalue(), nueva_ruta))
                     imagenes_finales.append(nueva_ruta)
 
             imagenes_paths_final = ",".join(imagenes_finales)
 
-            # ---- ACTUALIZAR CSV ----
-            proyectos_df.loc[
-                proyectos_df["codigo_orden"] == codigo_original,
-                [
-                    "codigo_orden",
-                    "nombre_proyecto",
-                    "cliente_id",
-                    "fecha_inicio",
-                    "fecha_fin",
-                    "imagenes_paths",
-                    "comentarios"
-                ]
-            ] = [
-                codigo_orden,
-                nombre_proyecto,
-                cliente_id,
-                fecha_inicio,
-                fecha_fin,
-                imagenes_paths_final,
-                comentarios
-            ]
-
-            proyectos_df.to_csv(PROYECTOS_CSV, index=False)
+            # ---- ACTUALIZAR CSV E IMÁGENES ----
+            encolar_guardado(
+                f"Proyecto {nombre_proyecto}",
+                editar_proyecto,
+                proyecto["id"],
+                {
+                    "codigo_orden": codigo_orden,
+                    "nombre_proyecto": nombre_proyecto,
+                    "cliente": id_cliente,
+                    "fecha_inicio": fecha_inicio,
+                    "fecha_fin": fecha_fin,
+                    "imagenes_paths": imagenes_paths_final,
+                    "comentarios": comentarios
+                },
+                imagenes_nuevas,
+                imagenes_a_borrar,
+                rutas=[ruta for _, ruta in imagenes_nuevas]
+            )
 
             # ---- LIMPIAR ESTADO ----
             st.session_state.imagenes_a_eliminar = set()
@@ -1322,7 +1272,7 @@ def pagina_editar_proyecto():
                 "codigo": codigo_orden
             }
             st.session_state.pagina = "perfil"
-            st.session_state.mensaje_exito = "Proyecto actualizado correctamente."
+            st.session_state.mensaje_exito = "Guardando los cambios del proyecto…"
 
     # ------ ELIMINAR PROYECTO --------
     st.markdown("---")
@@ -1341,7 +1291,7 @@ def pagina_editar_proyecto():
         st.warning(
             "⚠️ **¿Estás seguro de eliminar este proyecto?**\n\n"
             "• Se eliminarán todas las imágenes del proyecto\n"
-            "• Esta acción **NO es reversible**"
+            f"• Podrás deshacerlo desde el inicio durante **{VENTANA_DESHACER_MIN} minutos**"
         )
 
         col_no, col_si = st.columns(2)
@@ -1355,30 +1305,27 @@ def pagina_editar_proyecto():
 
         with col_si:
             if st.button(
-                "Sí, eliminar definitivamente",
+                "Sí, eliminar",
                 use_container_width=True
             ):
-                # --- Eliminar imágenes ---
-                imgs = proyecto.get("imagenes_paths", "")
-                if isinstance(imgs, str) and imgs:
-                    for ruta in imgs.split(","):
-                        ruta = ruta.strip()
-                        if os.path.exists(ruta):
-                            os.remove(ruta)
-
-                # --- Eliminar proyecto ---
-                proyectos_df = proyectos_df[
-                    proyectos_df["codigo_orden"] != codigo_orden_original
-                ]
-                proyectos_df.to_csv(PROYECTOS_CSV, index=False)
+                # --- Baja a la papelera (las imágenes se borran con la purga) ---
+                momento = momento_actual()
+                marcas = [(PROYECTOS_CSV, "id", [proyecto["id"]])]
+                marcar_eliminados(PROYECTOS_CSV, "id", [proyecto["id"]], momento)
+
+                st.session_state.deshacer = {
+                    "descripcion": f"Proyecto {proyecto['nombre_proyecto']}",
+                    "momento": momento,
+                    "marcas": marcas,
+                }
 
                 # --- Limpiar estado ---
                 st.session_state.confirmar_eliminar_proyecto = False
-                st.session_state.editar_proyecto_id = None
+                st.session_state.editar_id_proyecto = None
                 st.session_state.seleccion = None
                 st.session_state.pagina = "inicio"
 
-                st.success("Proyecto eliminado correctamente.")
+                st.success("Proyecto eliminado. Puedes deshacerlo desde el inicio.")
                 st.stop()
 
 
@@ -1391,16 +1338,20 @@ def pagina_nuevo_proyecto():
 
     st.markdown("<h1 style='color:#e27032; font-style:italic;'>Nuevo Proyecto</h1>", unsafe_allow_html=True)
 
-    proyectos_df = cargar_proyectos()   # Se carga el archivo CSV de proyectos para revisar que no hayan duplicados en el codigo de orden
-    clientes_df = cargar_clientes()     # Se carga el archivo CSV de clientes para asociar el ID del cliente a el proyecto
-
-    clientes_opciones = clientes_df.apply(         # Se hace una dropdown de los clientes para que el usuario solo tenga que seleccionar
-        lambda x: f"{x['nombre']} {x['apellido']} ({x['cliente_id']})", axis=1
-    ).drop_duplicates().tolist()
-
     nombre_proyecto = st.text_input("Ingrese Nombre del Proyecto")       # Input de los datos del proyecto
     codigo_orden = st.text_input("Ingrese Código de Orden de Producción").strip().upper()
-    cliente = st.selectbox("Cliente Asociado", options=clientes_opciones if clientes_opciones else ["No hay clientes registrados"])
+
+    # Selector de cliente con búsqueda: solo viajan al navegador las mejores coincidencias
+    busqueda_cliente = st.text_input("Buscar cliente asociado", placeholder="Nombre, apellido o ID")
+    opciones_cliente, total_clientes = sugerir_clientes(busqueda_cliente, limite=MAX_OPCIONES_CLIENTE)
+    cliente_id = st.selectbox(
+        "Cliente Asociado",
+        options=list(opciones_cliente),
+        format_func=opciones_cliente.get,
+        placeholder="No hay clientes registrados" if not busqueda_cliente else "Ningún cliente coincide"
+    )
+    if total_clientes > len(opciones_cliente):
+        st.caption(f"Mostrando {len(opciones_cliente)} de {total_clientes} clientes. Escriba más para acotar la lista.")
 
     col_fi, col_ff = st.columns(2)
 
@@ -1434,41 +1385,40 @@ def pagina_nuevo_proyecto():
 
         if st.button("Guardar Proyecto", key="guardar_proyecto"):    
         # --- Validación de duplicados ---
-            codigos_existentes = (
-                proyectos_df["codigo_orden"]
-                .astype(str)
-                .str.upper()
-                .values
-            )
-
-            if codigo_orden.upper() in codigos_existentes:
+            if clave_existe(PROYECTOS_CSV, codigo_orden):
                 st.error("Ya existe un proyecto con ese código.")
                 return
 
-            # Extrae el ID del cliente del texto seleccionado en el dropdown
-            cliente_id = cliente.split("(")[-1].replace(")", "") if "(" in cliente else ""
-
-            # --- Guardado de imágenes ---
+            # --- Guardado de imágenes (en segundo plano, aquí solo se leen los bytes) ---
+            # Se nombran con el id interno del proyecto, que no cambia si se corrige el código
+            id_proyecto = nuevo_id()
             img_paths = []
+            imagenes_nuevas = []
             for i, img in enumerate(imagenes or []):
                 ext = img.name.split(".")[-1]
-                file_path = os.path.join(IMG_PROYECTOS_DIR, f"{codigo_orden}_{i+1}.{ext}") # OS crea una ruta especifica de 
-                image = Image.open(img)  # PIL abre la imagen
-                image.save(file_path) 
+                file_path = os.path.join(IMG_PROYECTOS_DIR, f"{id_proyecto}_{i+1}.{ext}") # OS crea una ruta especifica de 
+                imagenes_nuevas.append((img.getvalue(), file_path))
                 img_paths.append(file_path)
 
 
+            cliente = obtener_cliente(cliente_id, ["id"]) if cliente_id else None
+
             data = {       # Estructura del guardado de datos
+                "id": id_proyecto,
                 "codigo_orden": codigo_orden,
                 "nombre_proyecto": nombre_proyecto,
-                "cliente_id": cliente_id,
+                "cliente": cliente["id"] if cliente is not None else "",
                 "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
                 "fecha_fin": fecha_fin.strftime("%Y-%m-%d") if fecha_fin else "",
                 "imagenes_paths": ",".join(img_paths),
                 "comentarios": comentarios
             }
 
-            guardar_csv(data, PROYECTOS_CSV)                 # Guarda el nuevo registro en el CSV
+            encolar_guardado(                                # Guarda el registro y las imágenes sin frenar la página
+                f"Proyecto {nombre_proyecto}",
+                guardar_proyecto, data, imagenes_nuevas,
+                rutas=img_paths
+            )
 
             st.session_state.pagina = "pg_guardado_proyecto"   # Se redirige a guardado correcto
             st.session_state.nombre_guardado = nombre_proyecto
@@ -1483,27 +1433,486 @@ def pagina_nuevo_proyecto():
                 unsafe_allow_html=True
             )
 
-def limpiar_imagenes_huerfanas():
-    if not os.path.exists(IMG_CLIENTES_DIR):
+# -------- PÁGINAS DE LISTADO --------
+TAMANOS_PAGINA = [25, 50, 100]
+
+
+def _mover_pagina(clave, paso):
+    st.session_state[clave] = max(1, st.session_state.get(clave, 1) + paso)
+
+
+def _reiniciar_pagina(clave):
+    st.session_state[clave] = 1
+
+
+def controles_listado(prefijo, columnas_orden, orden_defecto, ascendente_defecto):
+    # Filtro, orden y tamaño de página. Cualquier cambio vuelve a la primera página
+    clave_pagina = f"{prefijo}_pagina"
+    col_filtro, col_orden, col_dir, col_tam = st.columns([4, 2, 1, 1])
+
+    with col_filtro:
+        filtro = st.text_input(
+            "Filtrar",
+            placeholder="🔍 Filtrar...",
+            key=f"{prefijo}_filtro",
+            on_change=_reiniciar_pagina,
+            args=(clave_pagina,)
+        )
+    with col_orden:
+        opciones = list(columnas_orden)
+        orden = st.selectbox(
+            "Ordenar por",
+            opciones,
+            index=opciones.index(orden_defecto),
+            format_func=columnas_orden.get,
+            key=f"{prefijo}_orden",
+            on_change=_reiniciar_pagina,
+            args=(clave_pagina,)
+        )
+    with col_dir:
+        ascendente = st.selectbox(
+            "Dirección",
+            [True, False],
+            index=0 if ascendente_defecto else 1,
+            format_func=lambda a: "Asc" if a else "Desc",
+            key=f"{prefijo}_ascendente",
+            on_change=_reiniciar_pagina,
+            args=(clave_pagina,)
+        )
+    with col_tam:
+        tamano = st.selectbox(
+            "Por página",
+            TAMANOS_PAGINA,
+            key=f"{prefijo}_tamano",
+            on_change=_reiniciar_pagina,
+            args=(clave_pagina,)
+        )
+
+    return filtro, orden, ascendente, tamano
+
+
+def paginador(prefijo, total, tamano):
+    clave = f"{prefijo}_pagina"
+    paginas = max(1, -(-total // tamano))
+    pagina = min(st.session_state.get(clave, 1), paginas)
+
+    col_prev, col_info, col_next = st.columns([1, 6, 1])
+    with col_prev:
+        st.button("◀", key=f"{prefijo}_prev", disabled=pagina <= 1, on_click=_mover_pagina, args=(clave, -1))
+    with col_info:
+        st.markdown(
+            f"<p style='text-align:center; color:#aaa;'>Página {pagina} de {paginas} · {total} registros</p>",
+            unsafe_allow_html=True
+        )
+    with col_next:
+        st.button("▶", key=f"{prefijo}_next", disabled=pagina >= paginas, on_click=_mover_pagina, args=(clave, 1))
+
+
+def pagina_lista_clientes():
+    topbar_secundaria()
+
+    st.markdown("<h1 style='color:#e27032; font-style:italic;'>Clientes</h1>", unsafe_allow_html=True)
+
+    filtro, orden, ascendente, tamano = controles_listado(
+        "lista_clientes",
+        {
+            "nombre": "Nombre",
+            "apellido": "Apellido",
+            "cliente_id": "Cédula / NIT",
+            "n_proyectos": "Proyectos",
+            "n_en_proceso": "En proceso",
+        },
+        "nombre",
+        True
+    )
+
+    # El filtrado, orden y corte se hacen en el servidor; solo la página visible se dibuja
+    pagina = st.session_state.get("lista_clientes_pagina", 1)
+    visibles, total = listar_clientes(filtro, orden, ascendente, pagina, tamano)
+    if visibles.empty and total:
+        pagina = st.session_state["lista_clientes_pagina"] = 1
+        visibles, total = listar_clientes(filtro, orden, ascendente, pagina, tamano)
+
+    if not total:
+        st.info("No se encontraron clientes.")
         return
 
-    clientes_df = cargar_clientes()
-    rutas_validas = set(clientes_df["imagen_path"].dropna().values)
+    for _, c in visibles.iterrows():
+        col_nombre, col_id, col_proy, col_btn = st.columns([4, 2, 2, 1])
+        with col_nombre:
+            st.markdown(
+                f"<div style='background:#555; padding:8px; border-radius:6px; color:white;'>"
+                f"{c['nombre']} {c['apellido']}</div>",
+                unsafe_allow_html=True
+            )
+        with col_id:
+            st.markdown(f"**{c['cliente_id']}**")
+        with col_proy:
+            en_proceso = f" · {c['n_en_proceso']} en proceso" if c["n_en_proceso"] else ""
+            st.markdown(f"{c['n_proyectos']} proyectos{en_proceso}")
+        with col_btn:
+            if st.button("Abrir", key=f"lista_cliente_{c['cliente_id']}"):
+                st.session_state.seleccion = {
+                    "tipo": "Cliente",
+                    "codigo": c["cliente_id"]
+                }
+                st.session_state.pagina = "perfil"
+
+    paginador("lista_clientes", total, tamano)
+
+
+def limites_rango(rango):
+    # st.date_input con rango devuelve (), (desde,) mientras se elige, o (desde, hasta)
+    if not rango:
+        return None, None
+    return rango[0], rango[-1]
+
+
+# ---- Edición en lote ----
+# La selección es un conjunto de ids en session_state que sobrevive al cambiar de página o de
+# filtro. Las casillas llevan la versión de la selección en su key: al seleccionar o quitar
+# varios de una vez se crean de nuevo y toman el valor del conjunto.
+def _seleccion_lote():
+    return st.session_state.setdefault("lote_proyectos", set())
+
+
+def _alternar_lote(id_proyecto):
+    _seleccion_lote().symmetric_difference_update({id_proyecto})
+
+
+def _marcar_lote(ids):
+    _seleccion_lote().update(ids)
+    st.session_state.lote_version = st.session_state.get("lote_version", 0) + 1
+
+
+def _marcar_filtrados(filtro, orden, ascendente, estado, incluir_archivo, fechas, total):
+    todos, _ = listar_proyectos(filtro, orden, ascendente, 1, max(total, 1), estado, incluir_archivo=incluir_archivo, **fechas)
+    _marcar_lote(todos["id"])
+
+
+def _limpiar_lote():
+    _seleccion_lote().clear()
+    st.session_state.lote_version = st.session_state.get("lote_version", 0) + 1
+    st.session_state.confirmar_eliminar_lote = False
+
+
+def validar_lote(seleccion, fijar_fin, fecha_fin, cambiar_cliente, cliente_id, agregar_comentario, comentario):
+    # Revisa todo antes de escribir. Devuelve (errores, valores a asignar)
+    if not (fijar_fin or cambiar_cliente or agregar_comentario):
+        return ["Elija al menos un cambio para aplicar."], {}
+
+    errores, valores = [], {}
+    proyectos = cargar_proyectos(["id", "codigo_orden", "fecha_inicio"], incluir_archivo=hay_archivo())
+    elegidos = proyectos[proyectos["id"].isin(list(seleccion))]
+    if len(elegidos) < len(seleccion):
+        errores.append(f"{len(seleccion) - len(elegidos)} de los proyectos seleccionados ya no existen. Quite la selección y vuelva a elegirlos.")
+
+    if fijar_fin:
+        invertidos = elegidos[elegidos["fecha_inicio"] > pd.Timestamp(fecha_fin)]
+        if not invertidos.empty:
+            codigos = ", ".join(invertidos["codigo_orden"].astype(str).head(10))
+            errores.append(f"La fecha final queda antes del inicio en {len(invertidos)} proyectos: {codigos}")
+        valores["fecha_fin"] = fecha_fin
+
+    if cambiar_cliente:
+        cliente = obtener_cliente(cliente_id.strip(), ["id"]) if cliente_id.strip() else None
+        if cliente is None:
+            errores.append(f"No existe un cliente con la identificación {cliente_id}." if cliente_id.strip() else "Escriba la identificación del cliente.")
+        else:
+            valores["cliente"] = cliente["id"]
+
+    if agregar_comentario and not comentario.strip():
+        errores.append("Escriba el comentario que se agregará.")
+    return errores, valores
+
+
+def panel_lote(seleccion):
+    # Cambios para todos los proyectos seleccionados; se aplican en una sola escritura
+    n = len(seleccion)
+    with st.container(border=True):
+        st.markdown(f"**{n} proyectos seleccionados**")
+
+        col_fecha, col_cliente = st.columns(2)
+        with col_fecha:
+            fijar_fin = st.checkbox("Fijar fecha final", key="lote_fijar_fin")
+            fecha_fin = st.date_input("Fecha final", value=date.today(), format="DD/MM/YYYY", key="lote_fecha_fin", disabled=not fijar_fin)
+        with col_cliente:
+            cambiar_cliente = st.checkbox("Cambiar cliente", key="lote_cambiar_cliente")
+            cliente_id = st.text_input("ID del cliente", key="lote_cliente_id", disabled=not cambiar_cliente)
+        agregar_comentario = st.checkbox("Agregar comentario", key="lote_agregar_comentario")
+        comentario = st.text_area("Comentario (se agrega al final del de cada proyecto)", key="lote_comentario", disabled=not agregar_comentario)
+
+        col_aplicar, col_eliminar = st.columns(2)
+        with col_aplicar:
+            if st.button(f"Aplicar a {n} proyectos", key="lote_aplicar", use_container_width=True):
+                errores, valores = validar_lote(seleccion, fijar_fin, fecha_fin, cambiar_cliente, cliente_id, agregar_comentario, comentario)
+                if errores:
+                    for error in errores:
+                        st.error(error)
+                else:
+                    cambiados = editar_proyectos(list(seleccion), valores, comentario.strip() if agregar_comentario else "")
+                    _limpiar_lote()
+                    st.session_state.mensaje_lote = f"{cambiados} proyectos actualizados."
+                    st.rerun()
+
+        with col_eliminar:
+            if not st.session_state.get("confirmar_eliminar_lote"):
+                if st.button(f"Eliminar {n} proyectos", key="lote_eliminar", use_container_width=True):
+                    st.session_state.confirmar_eliminar_lote = True
+                    st.rerun()
+            else:
+                st.warning(f"⚠️ ¿Eliminar {n} proyectos? Podrás deshacerlo desde el inicio durante {VENTANA_DESHACER_MIN} minutos.")
+                col_no, col_si = st.columns(2)
+                with col_no:
+                    if st.button("No", key="lote_eliminar_no", use_container_width=True):
+                        st.session_state.confirmar_eliminar_lote = False
+                        st.rerun()
+                with col_si:
+                    if st.button("Sí, eliminar", key="lote_eliminar_si", use_container_width=True):
+                        # Una marca por partición para todos; se deshace como una sola baja
+                        ids = list(seleccion)
+                        momento = momento_actual()
+                        eliminados = marcar_eliminados(PROYECTOS_CSV, "id", ids, momento)
+                        st.session_state.deshacer = {
+                            "descripcion": f"{eliminados} proyectos",
+                            "momento": momento,
+                            "marcas": [(PROYECTOS_CSV, "id", ids)],
+                        }
+                        _limpiar_lote()
+                        st.session_state.mensaje_lote = f"{eliminados} proyectos eliminados. Puedes deshacerlo desde el inicio."
+                        st.rerun()
+
+
+def pagina_lista_proyectos():
+    topbar_secundaria()
+
+    st.markdown("<h1 style='color:#e27032; font-style:italic;'>Proyectos</h1>", unsafe_allow_html=True)
+
+    filtro, orden, ascendente, tamano = controles_listado(
+        "lista_proyectos",
+        {
+            "fecha_inicio": "Fecha inicio",
+            "fecha_fin": "Fecha final",
+            "codigo_orden": "Código de orden",
+            "nombre_proyecto": "Nombre",
+            "cliente_id": "Cliente",
+        },
+        "fecha_inicio",
+        False
+    )
+
+    estado = st.radio(
+        "Estado",
+        ["todos", "en_proceso", "terminados"],
+        format_func={"todos": "Todos", "en_proceso": "En proceso", "terminados": "Terminados"}.get,
+        horizontal=True,
+        key="lista_proyectos_estado",
+        on_change=_reiniciar_pagina,
+        args=("lista_proyectos_pagina",)
+    )
+
+    # Rangos de fechas (vacíos = sin filtro); se resuelven con los índices ordenados de fechas
+    with st.expander("Filtrar por fechas"):
+        col_inicio, col_fin = st.columns(2)
+        with col_inicio:
+            rango_inicio = st.date_input(
+                "Fecha de inicio entre",
+                value=(),
+                format="DD/MM/YYYY",
+                key="lista_proyectos_rango_inicio",
+                on_change=_reiniciar_pagina,
+                args=("lista_proyectos_pagina",)
+            )
+        with col_fin:
+            rango_fin = st.date_input(
+                "Fecha final entre",
+                value=(),
+                format="DD/MM/YYYY",
+                key="lista_proyectos_rango_fin",
+                on_change=_reiniciar_pagina,
+                args=("lista_proyectos_pagina",)
+            )
+    incluir_archivo = hay_archivo() and st.checkbox(
+        "Incluir proyectos archivados",
+        key="lista_proyectos_archivo",
+        on_change=_reiniciar_pagina,
+        args=("lista_proyectos_pagina",)
+    )
+
+    lote = st.checkbox("Edición en lote", key="lista_proyectos_lote")
+
+    inicio_desde, inicio_hasta = limites_rango(rango_inicio)
+    fin_desde, fin_hasta = limites_rango(rango_fin)
+    fechas = {"inicio_desde": inicio_desde, "inicio_hasta": inicio_hasta, "fin_desde": fin_desde, "fin_hasta": fin_hasta}
+
+    pagina = st.session_state.get("lista_proyectos_pagina", 1)
+    visibles, total = listar_proyectos(filtro, orden, ascendente, pagina, tamano, estado, incluir_archivo=incluir_archivo, **fechas)
+    if visibles.empty and total:
+        pagina = st.session_state["lista_proyectos_pagina"] = 1
+        visibles, total = listar_proyectos(filtro, orden, ascendente, pagina, tamano, estado, incluir_archivo=incluir_archivo, **fechas)
+
+    if "mensaje_lote" in st.session_state:
+        st.success(st.session_state.pop("mensaje_lote"))
+
+    if not total:
+        st.info("No se encontraron proyectos.")
+        return
+
+    seleccion = _seleccion_lote()
+    if lote:
+        col_pagina, col_filtrados, col_limpiar = st.columns(3)
+        with col_pagina:
+            st.button("Seleccionar esta página", key="lote_pagina", use_container_width=True,
+                      on_click=_marcar_lote, args=(list(visibles["id"]),))
+        with col_filtrados:
+            st.button(f"Seleccionar los {total} filtrados", key="lote_filtrados", use_container_width=True,
+                      on_click=_marcar_filtrados, args=(filtro, orden, ascendente, estado, incluir_archivo, fechas, total))
+        with col_limpiar:
+            st.button("Quitar selección", key="lote_limpiar", use_container_width=True, disabled=not seleccion,
+                      on_click=_limpiar_lote)
+        if seleccion:
+            panel_lote(seleccion)
+
+    version = st.session_state.get("lote_version", 0)
+    for _, p in visibles.iterrows():
+        if lote:
+            col_marca, col_nombre, col_cliente, col_fecha, col_estado, col_btn = st.columns([0.5, 4, 2, 2, 2, 1])
+            with col_marca:
+                st.checkbox(
+                    p["codigo_orden"],
+                    value=p["id"] in seleccion,
+                    key=f"lote_{version}_{p['id']}",
+                    label_visibility="collapsed",
+                    on_change=_alternar_lote,
+                    args=(p["id"],)
+                )
+        else:
+            col_nombre, col_cliente, col_fecha, col_estado, col_btn = st.columns([4, 2, 2, 2, 1])
+        with col_nombre:
+            st.markdown(
+                f"<div style='background:#555; padding:8px; border-radius:6px; color:white;'>"
+                f"{p['nombre_proyecto']}</div>",
+                unsafe_allow_html=True
+            )
+        with col_cliente:
+            st.markdown(f"Cliente **{p['cliente_id']}**")
+        with col_fecha:
+            st.markdown(p["fecha_inicio"].strftime(FORMATO_FECHA) if pd.notna(p["fecha_inicio"]) else "")
+        with col_estado:
+            st.markdown("🟠 En proceso" if p["en_proceso"] else "✅ Terminado")
+        with col_btn:
+            if st.button(p["codigo_orden"], key=f"lista_proyecto_{p['codigo_orden']}"):
+                st.session_state.seleccion = {
+                    "tipo": "Proyecto",
+                    "nombre": p["nombre_proyecto"],
+                    "codigo": p["codigo_orden"]
+                }
+                st.session_state.pagina = "perfil"
+
+    paginador("lista_proyectos", total, tamano)
+
+
+# -------- TABLERO DE OPERACIÓN --------
+def _reparar_integridad():
+    cambiadas, _ = REVISION.reparar()
+    st.session_state.reparaciones_integridad = cambiadas
+
+
+def pagina_tablero():
+    topbar_secundaria()
+
+    st.markdown("<h1 style='color:#e27032; font-style:italic;'>Tablero</h1>", unsafe_allow_html=True)
+
+    # Los agregados ya están precalculados; solo se recalculan si el CSV cambió por fuera de la app
+    resumen = ESTADISTICAS.resumen()
+    if hay_archivo():
+        st.caption("Cuenta los proyectos activos; los archivados (terminados hace tiempo) no se incluyen.")
+
+    col_act, col_fin, col_dur = st.columns(3)
+    with col_act:
+        st.metric("Proyectos en proceso", resumen["en_proceso"])
+    with col_fin:
+        st.metric("Proyectos terminados", resumen["terminados"])
+    with col_dur:
+        duracion = resumen["duracion_promedio"]
+        st.metric("Duración promedio", f"{duracion:.0f} días" if duracion is not None else "Sin datos")
+
+    st.markdown("<h3 style='font-size:20px;'>Proyectos iniciados por mes</h3>", unsafe_allow_html=True)
+    if resumen["por_mes"]:
+        st.bar_chart(pd.Series(resumen["por_mes"], name="Proyectos"), color="#e98450")
+    else:
+        st.info("No hay proyectos con fecha de inicio.")
+
+    st.markdown("<h3 style='font-size:20px;'>Clientes con más proyectos</h3>", unsafe_allow_html=True)
+    if resumen["top_clientes"]:
+        clientes_df = cargar_clientes(["id", "cliente_id", "nombre", "apellido"])
+        ids = [id_cliente for id_cliente, _ in resumen["top_clientes"]]
+        top = clientes_df[clientes_df["id"].isin(ids)].set_index("id")
+        nombres = top["nombre"] + " " + top["apellido"]
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Cliente": nombres.get(id_cliente, "Cliente desconocido"),
+                        "ID": top["cliente_id"].get(id_cliente, ""),
+                        "Proyectos": n,
+                    }
+                    for id_cliente, n in resumen["top_clientes"]
+                ]
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.info("Todavía no hay proyectos registrados.")
+
+    # ---- Caché de imágenes ----
+    with st.expander("Caché de imágenes"):
+        cache = CACHE_IMAGENES.estadisticas()
+        col_tasa, col_uso, col_entradas = st.columns(3)
+        with col_tasa:
+            tasa = cache["tasa_aciertos"]
+            st.metric("Tasa de aciertos", f"{tasa:.0%}" if tasa is not None else "Sin consultas")
+        with col_uso:
+            st.metric("Memoria usada", f"{cache['bytes'] / 1_048_576:.1f} / {cache['limite_bytes'] / 1_048_576:.0f} MB")
+        with col_entradas:
+            st.metric("Imágenes en caché", cache["entradas"])
+        st.caption(f"{cache['aciertos']} aciertos · {cache['fallos']} fallos")
+
+    # ---- Integridad de los datos ----
+    # El informe lo deja la revisión que corre al arrancar; desde aquí se puede repetir y
+    # aplicar las reparaciones automáticas (en callbacks, así el título ya muestra el resultado)
+    informe = REVISION.informe()
+    total = problemas_encontrados(informe) if informe else 0
+    with st.expander(f"Integridad de los datos ({total} problemas)" if total else "Integridad de los datos"):
+        st.button("Revisar ahora", key="revisar_integridad", on_click=REVISION.revisar)
+        if "reparaciones_integridad" in st.session_state:
+            st.success(f"{st.session_state.pop('reparaciones_integridad')} registros corregidos.")
+
+        if informe is None:
+            st.info("La revisión de inicio todavía está en curso." if REVISION.en_curso() else "Todavía no se revisaron los datos.")
+        else:
+            st.caption(f"Revisado el {informe['momento']:%Y-%m-%d %H:%M:%S} en {informe['segundos']:.1f} s")
+            encontrados = {nombre: p for nombre, p in informe["problemas"].items() if p["cantidad"]}
+            if not encontrados:
+                st.success("No se encontraron problemas.")
+            for nombre, problema in encontrados.items():
+                reparable = f" · {problema['reparables']} con reparación automática" if problema["reparables"] else " · se corrige a mano"
+                st.markdown(f"**{problema['descripcion']}**: {problema['cantidad']}{reparable}")
+                st.caption(", ".join(escape(str(d)) for d in problema["detalles"][:20]) + (" …" if problema["cantidad"] > 20 else ""))
+
+            n_reparables = reparables(informe)
+            if n_reparables:
+                st.button(f"Aplicar reparaciones automáticas ({n_reparables})", key="reparar_integridad", on_click=_reparar_integridad)
 
-    for archivo in os.listdir(IMG_CLIENTES_DIR):
-        ruta = os.path.join(IMG_CLIENTES_DIR, archivo)
-        if ruta not in rutas_validas:
-            try:
-                os.remove(ruta)
-            except:
-                pass
 
 # -------- PÁGINAS DE GUARDADO CORRECTO --------
 def pagina_guardado_cliente():
     topbar_secundaria()
     nombre = st.session_state.get("nombre_guardado", "Cliente")     # Se obtienen los datos recien guardados
     st.markdown(f"<h2 style='color:#e98450; font-style:italic;'>{nombre}</h2>", unsafe_allow_html=True) # Se remplaza {nombre} por el nombre+apellido recien guardado
-    st.markdown("<h3 style='color:white;'>fue guardado exitosamente!</h3>", unsafe_allow_html=True)
+    estado = "se está guardando…" if hay_trabajos_pendientes() else "fue guardado exitosamente!"
+    st.markdown(f"<h3 style='color:white;'>{estado}</h3>", unsafe_allow_html=True)
     if st.button("Volver a Inicio"):
         st.session_state.pagina = "inicio"
 
@@ -1511,12 +1920,18 @@ def pagina_guardado_proyecto():
     topbar_secundaria()
     nombre = st.session_state.get("nombre_guardado", "Proyecto")    # Se obtienen los datos recien guardados
     st.markdown(f"<h2 style='color:#e98450; font-style:italic;'>{nombre}</h2>", unsafe_allow_html=True) # Se remplaza {nombre} por el nombre del proyecto recien guardado
-    st.markdown("<h3 style='color:white;'>fue guardado exitosamente!</h3>", unsafe_allow_html=True) 
+    estado = "se está guardando…" if hay_trabajos_pendientes() else "fue guardado exitosamente!"
+    st.markdown(f"<h3 style='color:white;'>{estado}</h3>", unsafe_allow_html=True) 
     if st.button("Volver a Inicio"):
         st.session_state.pagina = "inicio"
 
 # ------------------ RUN ------------------
 if __name__ == "__main__":
+    iniciar_precarga()                                # Tablas, índices y miniaturas en segundo plano (una vez por proceso)
+    iniciar_purga()                                   # Hilo que vacía la papelera (uno por proceso)
+    iniciar_snapshots()                               # Hilo que toma los snapshots locales (uno por proceso)
+    iniciar_revision()                                # Revisión de integridad de los datos en segundo plano (una por proceso)
+    avisos_trabajos()                                 # Avisos de guardados en segundo plano que terminaron
     p = st.session_state.get("pagina", "inicio")      # st.session_state.get toma la definicion de st.session_state["pagina"] en las distintas funciones de pestañas
     if p == "inicio":                                 # Esto asocia una palabra o codigo, como "inicio" en st.session_state a una funcion de pagina
         pagina_inicio()                               # Se corre la funcion de pagina, y se hace el display grafico correcto.
@@ -1537,6 +1952,12 @@ if __name__ == "__main__":
             pagina_perfil_proyecto()    
     elif st.session_state.pagina == "editar_proyecto":
         pagina_editar_proyecto()
+    elif p == "pg_lista_clientes":
+        pagina_lista_clientes()
+    elif p == "pg_lista_proyectos":
+        pagina_lista_proyectos()
+    elif p == "pg_tablero":
+        pagina_tablero()
 
     else:
         # fallback
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from datetime import date
+
+from streamlit.logger import get_logger
+
+from datos import (
+    CLIENTES_CSV,
+    COLUMNAS_CUMPLEANOS,
+    LOGO_PATH,
+    PROYECTOS_CSV,
+    SIN_IMAGEN_PATH,
+    buscar,
+    cargar_clientes,
+    cargar_proyectos,
+    clave_existe,
+    cumpleanos,
+)
+from busqueda import INDICE_COMENTARIOS
+from imagenes import ANCHO_TARJETA, bytes_imagen, existe_imagen
+
+
+# ------------------ CONFIG ------------------
+# Precarga al levantar la aplicación (variable de entorno DCC_PRECARGA, 0 = desactivada)
+PRECARGAR_AL_INICIAR = os.environ.get("DCC_PRECARGA", "1") != "0"
+
+LOG = get_logger(__name__)
+
+
+# ------------------ PRECARGA ------------------
+# Lo que la primera sesión después de un reinicio pagaría al abrir la página de inicio se hace
+# en un hilo apenas corre la aplicación: parsear los CSV, armar los índices de búsqueda y de
+# claves, calcular los cumpleaños de hoy y preparar las miniaturas de sus tarjetas (y el logo)
+# en la caché de imágenes. Todo queda en las estructuras compartidas del proceso, así que la
+# primera sesión encuentra lo mismo que las siguientes. Una sesión que llega antes de que
+# termine espera el lock de la tabla que se está cargando en lugar de cargarla otra vez.
+#
+# servidor.py la arranca con el proceso, antes de que el servidor acepte conexiones. main.py
+# también la pide, para cuando se levanta con "streamlit run main.py": ahí Streamlit recién
+# ejecuta el script con la primera sesión, y la precarga corre en paralelo con esa página.
+def _miniaturas_cumpleanos(hoy):
+    rutas = [LOGO_PATH, SIN_IMAGEN_PATH]
+    rutas += [ruta for ruta in cumpleanos(hoy, COLUMNAS_CUMPLEANOS)["imagen_path"] if existe_imagen(ruta)]
+    for ruta in rutas:
+        try:
+            bytes_imagen(ruta, ANCHO_TARJETA)
+        except (OSError, ValueError):
+            continue      # Una imagen dañada se informa al dibujarla, no aquí
+    return len(rutas)
+
+
+def precargar():
+    # Ejecuta los pasos en orden y devuelve [(paso, segundos)]
+    hoy = date.today()
+    pasos = [
+        ("tablas", lambda: (cargar_clientes(), cargar_proyectos())),
+        ("búsqueda", lambda: buscar("", limite=1)),
+        ("claves", lambda: (clave_existe(CLIENTES_CSV, ""), clave_existe(PROYECTOS_CSV, ""))),
+        ("comentarios", INDICE_COMENTARIOS.preparar),
+        ("cumpleaños", lambda: _miniaturas_cumpleanos(hoy)),
+    ]
+    tiempos = []
+    for nombre, paso in pasos:
+        inicio = time.perf_counter()
+        paso()
+        tiempos.append((nombre, time.perf_counter() - inicio))
+    return tiempos
+
+
+_precarga_lock = threading.Lock()
+_precarga_iniciada = False
+
+
+def _precargar_en_segundo_plano():
+    inicio = time.perf_counter()
+    try:
+        tiempos = precargar()
+    except Exception:
+        LOG.exception("Precarga interrumpida tras %.2f s", time.perf_counter() - inicio)
+        return
+    detalle = ", ".join(f"{nombre} {segundos:.2f} s" for nombre, segundos in tiempos)
+    LOG.info("Precarga terminada en %.2f s (%s)", time.perf_counter() - inicio, detalle)
+
+
+def iniciar_precarga():
+    # Arranca la precarga una sola vez por proceso
+    global _precarga_iniciada
+    if not PRECARGAR_AL_INICIAR:
+        return
+    with _precarga_lock:
+        if _precarga_iniciada:
+            return
+        _precarga_iniciada = True
+    threading.Thread(target=_precargar_en_segundo_plano, name="dcc-precarga", daemon=True).start()
@@ -0,0 +1,386 @@
+import io
+import os
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from datos import (
+    CLIENTES_CSV,
+    PROYECTOS_CSV,
+    PROYECTOS_ARCHIVO_CSV,
+    IMG_CLIENTES_DIR,
+    IMG_PROYECTOS_DIR,
+    cargar_con_firma,
+    compactar_tablas,
+    hay_archivo,
+    particiones,
+    reiniciar_bitacoras,
+    ruta_recurso,
+    texto_csv,
+)
+
+
+# ------------------ CONFIG ------------------
+# Tablas que van en cada respaldo y su nombre dentro del ZIP o snapshot
+CSV_RESPALDO = (
+    (CLIENTES_CSV, "clientes.csv"),
+    (PROYECTOS_CSV, "proyectos.csv"),
+    (PROYECTOS_ARCHIVO_CSV, "proyectos_archivo.csv"),
+)
+
+# Formatos que ya vienen comprimidos: se guardan tal cual en el ZIP, porque volver a
+# comprimirlos gasta CPU sin achicarlos
+EXTENSIONES_COMPRIMIDAS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".zip", ".gz", ".7z", ".rar", ".mp4", ".mov", ".pdf",
+}
+
+# Hilos que leen y comprimen los archivos del backup en paralelo (variable de entorno DCC_HILOS_BACKUP)
+HILOS_BACKUP = int(os.environ.get("DCC_HILOS_BACKUP", str(min(8, os.cpu_count() or 1))))
+
+# Snapshots locales: carpeta, cada cuántos minutos se toman (variable de entorno
+# DCC_INTERVALO_SNAPSHOTS_MIN, 0 = desactivados) y cuántos se conservan por hora, día y semana
+SNAPSHOTS_DIR = ruta_recurso("snapshots")
+FORMATO_SNAPSHOT = "%Y%m%d-%H%M%S"
+INTERVALO_SNAPSHOTS_MIN = int(os.environ.get("DCC_INTERVALO_SNAPSHOTS_MIN", "60"))
+CONSERVAR_HORARIOS = int(os.environ.get("DCC_SNAPSHOTS_HORARIOS", "24"))
+CONSERVAR_DIARIOS = int(os.environ.get("DCC_SNAPSHOTS_DIARIOS", "7"))
+CONSERVAR_SEMANALES = int(os.environ.get("DCC_SNAPSHOTS_SEMANALES", "4"))
+
+
+# ------------------ BACKUP ------------------
+# Los hilos leen y comprimen cada archivo (zlib libera el GIL, así que la compresión se reparte
+# entre los núcleos) y el ZIP se escribe en orden con los bytes ya comprimidos. Se preparan como
+# mucho unos pocos archivos por hilo por delante de la escritura, para no cargar toda la carpeta
+# en memoria. Cada imagen conserva en el ZIP la fecha de modificación que tiene en disco.
+def _compresion(nombre):
+    extension = os.path.splitext(nombre)[1].lower()
+    return zipfile.ZIP_STORED if extension in EXTENSIONES_COMPRIMIDAS else zipfile.ZIP_DEFLATED
+
+
+def _preparar(nombre, datos, modificado):
+    # (ZipInfo con CRC y tamaños ya calculados, bytes tal como van en el ZIP)
+    info = zipfile.ZipInfo(nombre, date_time=time.localtime(max(modificado, 315532800))[:6])      # El ZIP no admite fechas antes de 1980
+    info.external_attr = 0o644 << 16
+    info.compress_type = _compresion(nombre)
+    info.file_size = len(datos)
+    info.CRC = zlib.crc32(datos)
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        compresor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        datos = compresor.compress(datos) + compresor.flush()
+    info.compress_size = len(datos)
+    return info, datos
+
+
+def _preparar_archivo(ruta, nombre):
+    with open(ruta, "rb") as f:
+        modificado = os.fstat(f.fileno()).st_mtime
+        return _preparar(nombre, f.read(), modificado)
+
+
+def _escribir_preparado(zipf, info, datos):
+    # Lo mismo que hace ZipFile.writestr, pero sin volver a calcular el CRC ni comprimir: el
+    # encabezado sale completo de una vez y se registra la entrada para el directorio final
+    zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+    info.header_offset = zipf.fp.tell()
+    zipf._writecheck(info)
+    zipf._didModify = True
+    zipf.fp.write(info.FileHeader(zip64))
+    zipf.fp.write(datos)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(info)
+    zipf.NameToInfo[info.filename] = info
+
+
+def _archivos_imagenes():
+    # (ruta, nombre dentro del ZIP) de todas las imágenes
+    for carpeta, destino in ((IMG_CLIENTES_DIR, "assets/imagenes_clientes"), (IMG_PROYECTOS_DIR, "assets/imagenes_proyectos")):
+        if os.path.exists(carpeta):
+            for root, _, files in os.walk(carpeta):
+                for file in files:
+                    yield os.path.join(root, file), os.path.join(destino, file)
+
+
+def _csv_a_respaldar():
+    # El archivo de proyectos solo si existe
+    return [(archivo, nombre) for archivo, nombre in CSV_RESPALDO if archivo != PROYECTOS_ARCHIVO_CSV or hay_archivo()]
+
+
+def crear_backup_zip(destino=None, tiempos=None):
+    # Escribe el ZIP en destino (ruta de archivo) o, si no se indica, en memoria y devuelve el
+    # buffer. tiempos, si se pasa un diccionario, recibe los segundos de cada fase
+    tiempos = {} if tiempos is None else tiempos
+    inicio = time.perf_counter()
+    buffer = io.BytesIO() if destino is None else destino
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf, \
+            ThreadPoolExecutor(max_workers=HILOS_BACKUP, thread_name_prefix="dcc-backup") as ejecutor:
+
+        # CSV (desde memoria: el archivo en disco no incluye los cambios que siguen en la bitácora).
+        # Llevan la fecha del respaldo, que es el momento de su contenido
+        marca = time.perf_counter()
+        ahora = time.time()
+        csv = [ejecutor.submit(_preparar, nombre_csv, texto_csv(archivo).encode("utf-8"), ahora)
+               for archivo, nombre_csv in _csv_a_respaldar()]
+        for futuro in csv:
+            _escribir_preparado(zipf, *futuro.result())
+        tiempos["csv"] = time.perf_counter() - marca
+
+        # Imágenes
+        espera = escritura = 0.0
+        archivos = _archivos_imagenes()
+        en_vuelo = []
+        while True:
+            while len(en_vuelo) < HILOS_BACKUP * 4:
+                siguiente = next(archivos, None)
+                if siguiente is None:
+                    break
+                en_vuelo.append(ejecutor.submit(_preparar_archivo, *siguiente))
+            if not en_vuelo:
+                break
+
+            futuro = en_vuelo.pop(0)
+            marca = time.perf_counter()
+            try:
+                info, datos = futuro.result()
+            except OSError:
+                continue      # Borrada entre el listado y la lectura
+            espera += time.perf_counter() - marca
+
+            marca = time.perf_counter()
+            _escribir_preparado(zipf, info, datos)
+            escritura += time.perf_counter() - marca
+
+        tiempos["lectura y compresión (espera)"] = espera
+        tiempos["escritura"] = escritura
+
+    tiempos["total"] = time.perf_counter() - inicio
+    if destino is not None:
+        return destino
+    buffer.seek(0)
+    return buffer
+
+
+def restaurar_backup(uploaded_zip=None, snapshot=None):
+    # Restaura un ZIP creado con crear_backup_zip o, con snapshot, una de las copias locales
+    # (ver SNAPSHOTS LOCALES) sin pasar por un ZIP
+    if snapshot is not None:
+        with _snapshots_lock:
+            _restaurar_desde(ruta_snapshot(snapshot))
+        return
+
+    temp_dir = "temp_restore"
+
+    # Crear carpeta temporal
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    os.makedirs(temp_dir)
+
+    # Extraer ZIP
+    with zipfile.ZipFile(uploaded_zip, "r") as zip_ref:
+        zip_ref.extractall(temp_dir)
+
+    _restaurar_desde(temp_dir)
+
+    # Limpiar temporal
+    shutil.rmtree(temp_dir)
+
+
+def _restaurar_desde(carpeta):
+    # carpeta tiene la estructura del ZIP: los CSV en la raíz y las imágenes en assets/
+    # Restaurar CSV (antes se vuelca la bitácora, para poder volver al estado previo)
+    compactar_tablas()
+    for archivo, nombre_csv in CSV_RESPALDO:
+        origen = os.path.join(carpeta, nombre_csv)
+        if os.path.exists(origen):
+            shutil.copy(origen, archivo)
+
+    # Un respaldo de antes de archivar trae todos los proyectos en proyectos.csv: el archivo
+    # actual sobra (si quedara, esos proyectos estarían dos veces)
+    if os.path.exists(os.path.join(carpeta, "proyectos.csv")) and not os.path.exists(os.path.join(carpeta, "proyectos_archivo.csv")):
+        if os.path.exists(PROYECTOS_ARCHIVO_CSV):
+            os.remove(PROYECTOS_ARCHIVO_CSV)
+
+    # Lo anterior queda en el historial de la bitácora y los cambios siguientes se registran
+    # sobre los CSV restaurados
+    reiniciar_bitacoras()
+
+    # Restaurar imágenes (se copian: los archivos del snapshot no deben compartirse con las
+    # carpetas en uso, que se sobrescriben al editar)
+    src_clientes = os.path.join(carpeta, "assets", "imagenes_clientes")
+
+    if os.path.exists(src_clientes):
+        if os.path.exists(IMG_CLIENTES_DIR):
+            shutil.rmtree(IMG_CLIENTES_DIR)
+        shutil.copytree(src_clientes, IMG_CLIENTES_DIR)
+
+    src_proyectos = os.path.join(carpeta, "assets", "imagenes_proyectos")
+
+    if os.path.exists(src_proyectos):
+        if os.path.exists(IMG_PROYECTOS_DIR):
+            shutil.rmtree(IMG_PROYECTOS_DIR)
+        shutil.copytree(src_proyectos, IMG_PROYECTOS_DIR)
+
+
+# ------------------ SNAPSHOTS LOCALES ------------------
+# Copias periódicas en SNAPSHOTS_DIR/<AAAAMMDD-HHMMSS>/, con la misma estructura que el ZIP.
+# Una imagen que no cambió desde el snapshot anterior (mismo tamaño y mtime) se enlaza al
+# archivo de ese snapshot en lugar de copiarse, así cada snapshot ocupa solo lo que cambió.
+# Nunca se enlaza a la imagen en uso: guardar_imagen la sobrescribe en sitio y cambiaría
+# también la copia. Los CSV se escriben desde memoria, con la bitácora incluida.
+def ruta_snapshot(nombre):
+    ruta = os.path.join(SNAPSHOTS_DIR, os.path.basename(nombre))
+    if not os.path.isdir(ruta):
+        raise FileNotFoundError(f"No existe el snapshot {nombre}")
+    return ruta
+
+
+def listar_snapshots():
+    # [(nombre, momento)] del más nuevo al más viejo
+    if not os.path.isdir(SNAPSHOTS_DIR):
+        return []
+    snapshots = []
+    for nombre in os.listdir(SNAPSHOTS_DIR):
+        try:
+            snapshots.append((nombre, datetime.strptime(nombre, FORMATO_SNAPSHOT)))
+        except ValueError:
+            continue      # Temporales a medio escribir u otros archivos
+    return sorted(snapshots, key=lambda s: s[1], reverse=True)
+
+
+def tomar_snapshot():
+    # Devuelve {"nombre", "copiadas", "enlazadas"}
+    with _snapshots_lock:
+        nombre = f"{datetime.now():{FORMATO_SNAPSHOT}}"
+        final = os.path.join(SNAPSHOTS_DIR, nombre)
+        snapshots = listar_snapshots()
+        previo = os.path.join(SNAPSHOTS_DIR, snapshots[0][0]) if snapshots else None
+        if previo == final:
+            return {"nombre": nombre, "copiadas": 0, "enlazadas": 0}      # Ya hay uno de este segundo
+
+        # Se arma en una carpeta temporal y se renombra al final: un snapshot cortado a la
+        # mitad nunca aparece en la lista
+        temporal = f"{final}.tmp"
+        if os.path.exists(temporal):
+            shutil.rmtree(temporal)
+        os.makedirs(temporal)
+
+        for archivo, nombre_csv in _csv_a_respaldar():
+            with open(os.path.join(temporal, nombre_csv), "w", encoding="utf-8", newline="") as f:
+                f.write(texto_csv(archivo))
+
+        copiadas = enlazadas = 0
+        for ruta, relativa in _archivos_imagenes():
+            destino = os.path.join(temporal, relativa)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            try:
+                actual = os.stat(ruta)
+            except FileNotFoundError:
+                continue      # Borrada entre el listado y la copia
+
+            if previo is not None:
+                anterior = os.path.join(previo, relativa)
+                try:
+                    copia = os.stat(anterior)
+                    if copia.st_size == actual.st_size and copia.st_mtime_ns == actual.st_mtime_ns:
+                        os.link(anterior, destino)
+                        enlazadas += 1
+                        continue
+                except OSError:
+                    pass      # No estaba en el snapshot anterior o el disco no admite enlaces
+
+            shutil.copy2(ruta, destino)      # copy2 conserva el mtime para la próxima comparación
+            copiadas += 1
+
+        os.replace(temporal, final)
+        podar_snapshots()
+        return {"nombre": nombre, "copiadas": copiadas, "enlazadas": enlazadas}
+
+
+def podar_snapshots():
+    # Conserva el más nuevo de cada una de las últimas horas, días y semanas según la
+    # configuración, y siempre el último. Devuelve los nombres borrados
+    snapshots = listar_snapshots()
+    conservar = {snapshots[0][0]} if snapshots else set()
+    for formato, cantidad in (("%Y%m%d%H", CONSERVAR_HORARIOS), ("%Y%m%d", CONSERVAR_DIARIOS), ("%G%V", CONSERVAR_SEMANALES)):
+        periodos = set()
+        for nombre, momento in snapshots:
+            periodo = momento.strftime(formato)
+            if periodo not in periodos and len(periodos) < cantidad:
+                periodos.add(periodo)
+                conservar.add(nombre)
+
+    borrados = [nombre for nombre, _ in snapshots if nombre not in conservar]
+    for nombre in borrados:
+        shutil.rmtree(os.path.join(SNAPSHOTS_DIR, nombre), ignore_errors=True)
+    return borrados
+
+
+_snapshots_lock = threading.Lock()
+_snapshots_iniciados = False
+
+
+def _snapshots_periodicos(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            tomar_snapshot()
+        except Exception:
+            continue      # Se reintenta en la próxima vuelta (por ejemplo, disco lleno)
+
+
+def iniciar_snapshots(intervalo=INTERVALO_SNAPSHOTS_MIN * 60):
+    # Arranca una sola vez por proceso el hilo que toma los snapshots (0 = desactivado)
+    global _snapshots_iniciados
+    if intervalo <= 0:
+        return
+    with _snapshots_lock:
+        if _snapshots_iniciados:
+            return
+        _snapshots_iniciados = True
+    threading.Thread(target=_snapshots_periodicos, args=(intervalo,), name="dcc-snapshots", daemon=True).start()
+
+
+# ------------------ LIMPIEZA ------------------
+def _normalizar(ruta):
+    return os.path.normcase(os.path.abspath(ruta))
+
+
+def rutas_imagenes_referenciadas():
+    # Todas las imágenes que algún cliente o proyecto tiene registradas, incluidos los que están
+    # en la papelera (sus imágenes se borran recién con la purga)
+    clientes_df, _ = cargar_con_firma(CLIENTES_CSV)
+
+    rutas = set(clientes_df["imagen_path"][clientes_df["imagen_path"] != ""])
+    for parte in particiones(PROYECTOS_CSV):      # Los proyectos archivados conservan sus imágenes
+        proyectos_df, _ = cargar_con_firma(parte)
+        for imagenes in proyectos_df["imagenes_paths"][proyectos_df["imagenes_paths"] != ""]:
+            rutas.update(ruta.strip() for ruta in imagenes.split(",") if ruta.strip())
+    return {_normalizar(ruta) for ruta in rutas}
+
+
+def limpiar_imagenes_huerfanas(simular=False):
+    # Borra los archivos de las carpetas de imágenes que ningún registro referencia.
+    # Devuelve las rutas borradas (o las que se borrarían, si simular=True)
+    rutas_validas = rutas_imagenes_referenciadas()
+    huerfanas = []
+
+    for carpeta in (IMG_CLIENTES_DIR, IMG_PROYECTOS_DIR):
+        if not os.path.exists(carpeta):
+            continue
+
+        for archivo in os.listdir(carpeta):
+            ruta = os.path.join(carpeta, archivo)
+            if os.path.isfile(ruta) and _normalizar(ruta) not in rutas_validas:
+                if not simular:
+                    try:
+                        os.remove(ruta)
+                    except OSError:
+                        continue
+                huerfanas.append(ruta)
+
+    return huerfanas
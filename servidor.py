@@ -0,0 +1,29 @@
+import os
+import sys
+
+from precarga import iniciar_precarga
+
+
+# ------------------ SERVIDOR ------------------
+# Levanta la aplicación de Streamlit con la precarga ya en marcha. Con "streamlit run main.py"
+# el script recién corre cuando se abre la primera sesión, así que esa sesión paga la carga de
+# las tablas; desde aquí la precarga arranca con el proceso, antes de que el servidor acepte
+# conexiones. Streamlit corre en este mismo proceso, así que main.py usa los mismos módulos
+# (repositorio, índices, caché de imágenes) que llenó la precarga. Se ejecuta desde la carpeta
+# de la aplicación y acepta las mismas opciones que "streamlit run":
+#
+#   python servidor.py
+#   python servidor.py --server.port 8501 --server.headless true
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def main(argv=None):
+    from streamlit.web import cli
+
+    iniciar_precarga()      # main.py la vuelve a pedir en cada sesión; solo arranca una vez por proceso
+    sys.argv = ["streamlit", "run", APP, *(sys.argv[1:] if argv is None else argv)]
+    return cli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+
+# ------------------ CARPETA DE PRUEBA ------------------
+# Las rutas de datos.py se resuelven contra la carpeta actual al importarlo (igual que en
+# carga.py), así que las pruebas se paran en una carpeta temporal antes de importar la
+# aplicación y nunca tocan los datos reales. Cada prueba arranca con data/ vacía.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETA = tempfile.mkdtemp(prefix="dcc-pruebas-")
+ORIGINAL = os.getcwd()
+
+os.chdir(CARPETA)
+sys.path.insert(0, RAIZ)
+
+
+def pytest_unconfigure(config):
+    os.chdir(ORIGINAL)
+    shutil.rmtree(CARPETA, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def datos_vacios():
+    from datos import BITACORAS, INDICES_CLAVES, REPOSITORIO, invalidar_cache
+
+    with REPOSITORIO.lock:
+        shutil.rmtree(os.path.join(CARPETA, "data", "bitacora"), ignore_errors=True)
+        for nombre in os.listdir(os.path.join(CARPETA, "data")):
+            if nombre.endswith(".csv"):
+                os.remove(os.path.join(CARPETA, "data", nombre))
+        for bitacora in BITACORAS.values():
+            bitacora._conteo = None
+        for indice in INDICES_CLAVES.values():
+            indice._claves = None
+        invalidar_cache()
+    yield
+
+
+@pytest.fixture
+def cliente():
+    from datos import CLIENTES_CSV, guardar_csv, obtener_cliente
+
+    guardar_csv({"cliente_id": "900100", "nombre": "Ana", "apellido": "Paz", "direccion": "Calle 1"}, CLIENTES_CSV)
+    return obtener_cliente("900100")
+
+
+@pytest.fixture
+def proyectos(cliente):
+    # Tres proyectos del mismo cliente: uno en proceso, uno terminado hace poco y uno terminado
+    # hace dos años. Devuelve sus ids por código
+    from datos import PROYECTOS_CSV, guardar_csv, obtener_proyecto
+
+    hoy = pd.Timestamp.now().normalize()
+    fechas = {
+        "OC-1": ("2024-01-10", ""),
+        "OC-2": ("2024-01-10", f"{hoy - pd.Timedelta(days=10):%Y-%m-%d}"),
+        "OC-3": ("2022-01-10", f"{hoy - pd.DateOffset(years=2):%Y-%m-%d}"),
+    }
+    for codigo, (inicio, fin) in fechas.items():
+        guardar_csv({
+            "codigo_orden": codigo,
+            "nombre_proyecto": f"Cocina {codigo}",
+            "cliente": cliente["id"],
+            "fecha_inicio": inicio,
+            "fecha_fin": fin,
+            "comentarios": "roble y herrajes",
+        }, PROYECTOS_CSV)
+    return {codigo: obtener_proyecto(codigo)["id"] for codigo in fechas}
@@ -0,0 +1,74 @@
+import json
+import threading
+from email.utils import formatdate
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from api import ManejadorApi
+from datos import PROYECTOS_CSV, actualizar_registros
+
+
+# Servidor en un puerto libre, atendido desde un hilo. No pasa a solo lectura (servir() sí lo
+# hace) para que las pruebas puedan escribir entre pedidos
+@pytest.fixture
+def pedir():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), ManejadorApi)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    def pedir(ruta, **cabeceras):
+        conexion = HTTPConnection(*servidor.server_address)
+        conexion.request("GET", ruta, headers=cabeceras)
+        respuesta = conexion.getresponse()
+        cuerpo = respuesta.read()
+        conexion.close()
+        return respuesta, cuerpo
+
+    yield pedir
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_proyecto_responde_con_etag(pedir, proyectos):
+    respuesta, cuerpo = pedir("/proyectos/OC-1")
+    assert respuesta.status == 200
+    assert respuesta.getheader("ETag")
+    assert json.loads(cuerpo)["codigo_orden"] == "OC-1"
+
+
+def test_sin_cambios_devuelve_304(pedir, proyectos):
+    respuesta, _ = pedir("/proyectos")
+    etiqueta = respuesta.getheader("ETag")
+
+    respuesta, cuerpo = pedir("/proyectos", **{"If-None-Match": etiqueta})
+    assert respuesta.status == 304
+    assert cuerpo == b""
+    assert respuesta.getheader("ETag") == etiqueta
+
+    respuesta, _ = pedir("/proyectos", **{"If-Modified-Since": respuesta.getheader("Last-Modified")})
+    assert respuesta.status == 304
+
+
+def test_un_cambio_invalida_la_etiqueta(pedir, proyectos):
+    respuesta, _ = pedir("/proyectos/OC-1")
+    etiqueta = respuesta.getheader("ETag")
+
+    actualizar_registros(PROYECTOS_CSV, "id", proyectos["OC-1"], {"comentarios": "cedro"})
+
+    respuesta, cuerpo = pedir("/proyectos/OC-1", **{"If-None-Match": etiqueta})
+    assert respuesta.status == 200
+    assert respuesta.getheader("ETag") != etiqueta
+    assert json.loads(cuerpo)["comentarios"] == "cedro"
+
+
+def test_la_etiqueta_depende_de_la_url(pedir, proyectos):
+    respuesta, _ = pedir("/proyectos/OC-1")
+    respuesta, _ = pedir("/proyectos/OC-2", **{"If-None-Match": respuesta.getheader("ETag")})
+    assert respuesta.status == 200
+
+
+def test_fecha_vieja_no_devuelve_304(pedir, proyectos):
+    respuesta, _ = pedir("/proyectos", **{"If-Modified-Since": formatdate(0, usegmt=True)})
+    assert respuesta.status == 200
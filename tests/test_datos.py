@@ -0,0 +1,143 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from datos import (
+    BITACORAS,
+    CLIENTES_CSV,
+    PROYECTOS_CSV,
+    PROYECTOS_ARCHIVO_CSV,
+    actualizar_registros,
+    archivar_proyectos,
+    cargar_proyectos,
+    clave_existe,
+    compactar,
+    desarchivar_proyectos,
+    eventos_desde,
+    hay_archivo,
+    invalidar_cache,
+    leer_tabla,
+    marcar_eliminados,
+    momento_actual,
+    obtener_cliente,
+    obtener_proyecto,
+    obtener_proyecto_por_id,
+    proyecto_archivado,
+    purgar_registros,
+    reconstruir_tabla,
+    restaurar_eliminados,
+)
+from trabajos import editar_proyecto
+
+
+# ------------------ ALTAS Y EDICIONES ------------------
+def test_insertar_asigna_id_y_registra_el_evento(cliente):
+    assert len(cliente["id"]) == 16
+    assert cliente["nombre"] == "Ana"
+    assert clave_existe(CLIENTES_CSV, " 900100 ")
+
+    eventos = eventos_desde(CLIENTES_CSV)
+    assert [e["op"] for e in eventos] == ["insertar"]
+
+
+def test_editar_por_id_sigue_al_registro_aunque_cambie_la_clave(proyectos):
+    id_proyecto = proyectos["OC-1"]
+    actualizar_registros(PROYECTOS_CSV, "id", id_proyecto, {"codigo_orden": "OC-10", "comentarios": "cedro"})
+
+    assert obtener_proyecto("OC-1") is None
+    proyecto = obtener_proyecto_por_id(id_proyecto)
+    assert proyecto["codigo_orden"] == "OC-10"
+    assert proyecto["comentarios"] == "cedro"
+
+
+def test_editar_proyecto_normaliza_y_revalida_el_codigo(proyectos):
+    with pytest.raises(ValueError):
+        editar_proyecto(proyectos["OC-1"], {"codigo_orden": " oc-2 "}, [], [])
+
+    editar_proyecto(proyectos["OC-1"], {"codigo_orden": " oc-1 "}, [], [])      # Su propio código no cuenta
+    assert obtener_proyecto_por_id(proyectos["OC-1"])["codigo_orden"] == "OC-1"
+
+
+# ------------------ PAPELERA ------------------
+def test_baja_logica_oculta_y_se_puede_deshacer(proyectos):
+    momento = momento_actual()
+    marcar_eliminados(PROYECTOS_CSV, "id", [proyectos["OC-1"]], momento)
+
+    assert "OC-1" not in set(cargar_proyectos(["codigo_orden"])["codigo_orden"])
+    assert clave_existe(PROYECTOS_CSV, "OC-1")      # La clave sigue ocupada mientras está en la papelera
+
+    restaurar_eliminados(PROYECTOS_CSV, "id", [proyectos["OC-1"]], momento)
+    assert obtener_proyecto("OC-1") is not None
+
+
+def test_purgar_borra_solo_las_bajas_vencidas(proyectos):
+    antes = momento_actual() - pd.Timedelta(hours=2)
+    marcar_eliminados(PROYECTOS_CSV, "id", [proyectos["OC-1"]], antes)
+    marcar_eliminados(PROYECTOS_CSV, "id", [proyectos["OC-2"]], momento_actual())
+
+    borrados = purgar_registros(PROYECTOS_CSV, momento_actual() - pd.Timedelta(hours=1))
+    assert borrados["id"].tolist() == [proyectos["OC-1"]]
+    assert not clave_existe(PROYECTOS_CSV, "OC-1")
+    assert clave_existe(PROYECTOS_CSV, "OC-2")
+
+
+# ------------------ ARCHIVO ------------------
+def test_archivar_y_desarchivar(proyectos):
+    assert not hay_archivo()
+    assert archivar_proyectos(12) == 1
+
+    assert hay_archivo()
+    assert proyecto_archivado("OC-3")
+    assert set(cargar_proyectos(["codigo_orden"])["codigo_orden"]) == {"OC-1", "OC-2"}
+    assert len(cargar_proyectos(["codigo_orden"], incluir_archivo=True)) == 3
+    assert clave_existe(PROYECTOS_CSV, "OC-3")      # El archivo también ocupa claves
+
+    # Las ediciones alcanzan a los archivados
+    actualizar_registros(PROYECTOS_CSV, "id", proyectos["OC-3"], {"comentarios": "reabierto"})
+    assert obtener_proyecto("OC-3")["comentarios"] == "reabierto"
+
+    assert desarchivar_proyectos(["OC-3"]) == 1
+    assert not proyecto_archivado("OC-3")
+    assert leer_tabla(PROYECTOS_ARCHIVO_CSV).empty
+
+
+# ------------------ BITÁCORA ------------------
+def test_reinicio_reproduce_la_bitacora(proyectos):
+    actualizar_registros(PROYECTOS_CSV, "id", proyectos["OC-2"], {"nombre_proyecto": "Closet"})
+    marcar_eliminados(PROYECTOS_CSV, "id", [proyectos["OC-1"]], momento_actual())
+
+    # Los cambios siguen solo en la bitácora: el CSV en disco no los tiene
+    assert BITACORAS[PROYECTOS_CSV].pendientes() > 0
+    assert "Closet" not in set(leer_tabla(PROYECTOS_CSV)["nombre_proyecto"])
+
+    # Un proceso nuevo parte del CSV y reproduce los eventos
+    invalidar_cache()
+    assert obtener_proyecto("OC-2")["nombre_proyecto"] == "Closet"
+    assert obtener_proyecto("OC-1") is None
+    assert obtener_cliente("900100") is not None
+
+
+def test_compactar_vuelca_la_bitacora_en_el_csv(proyectos):
+    actualizar_registros(PROYECTOS_CSV, "id", proyectos["OC-2"], {"nombre_proyecto": "Closet"})
+    compactar(PROYECTOS_CSV)
+
+    assert BITACORAS[PROYECTOS_CSV].pendientes() == 0
+    assert "Closet" in set(leer_tabla(PROYECTOS_CSV)["nombre_proyecto"])
+    assert os.listdir(BITACORAS[PROYECTOS_CSV].historial)      # El segmento anterior queda en el historial
+
+
+def test_reconstruir_tabla_en_un_momento_pasado(proyectos):
+    # Los eventos tienen resolución de segundos: se deja pasar uno antes y después del corte
+    time.sleep(1)
+    corte = momento_actual()
+    time.sleep(1)
+    actualizar_registros(PROYECTOS_CSV, "id", proyectos["OC-2"], {"nombre_proyecto": "Closet"})
+    assert [e["op"] for e in eventos_desde(PROYECTOS_CSV, corte)] == ["actualizar"]
+
+    previa = reconstruir_tabla(PROYECTOS_CSV, corte)
+    assert set(previa["codigo_orden"]) == {"OC-1", "OC-2", "OC-3"}
+    assert "Closet" not in set(previa["nombre_proyecto"])
+    actual = reconstruir_tabla(PROYECTOS_CSV, momento_actual())
+    assert "Closet" in set(actual["nombre_proyecto"])
@@ -0,0 +1,275 @@
+import io
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from datos import (
+    CLAVES,
+    CLIENTES_CSV,
+    PROYECTOS_CSV,
+    PROYECTOS_ARCHIVO_CSV,
+    REPOSITORIO,
+    actualizar_en_lote,
+    actualizar_registros,
+    archivar_proyectos,
+    cargar_con_firma,
+    clave_existe,
+    desarchivar_proyectos,
+    guardar_csv,
+    hay_archivo,
+    limite_archivo,
+    obtener_proyecto,
+    obtener_proyecto_por_id,
+    particiones,
+    proyecto_archivado,
+    purgar_registros,
+)
+from imagenes import borrar_imagen, existe_imagen, guardar_imagen
+
+
+# ------------------ CONFIG ------------------
+# Hilos que procesan guardados en segundo plano. Con pocos alcanza: el trabajo pesado es de
+# PIL y de disco, y las escrituras de CSV igual se hacen de a una bajo el lock del repositorio
+HILOS_TRABAJOS = 2
+
+# Segundos que se conserva el resultado de un trabajo terminado para que la sesión lo lea
+RETENCION_TRABAJOS = 15 * 60
+
+# Minutos durante los que se puede deshacer una baja (variable de entorno DCC_VENTANA_DESHACER_MIN)
+VENTANA_DESHACER_MIN = int(os.environ.get("DCC_VENTANA_DESHACER_MIN", "30"))
+
+# Cada cuántos segundos revisa la purga si hay bajas vencidas
+INTERVALO_PURGA = 5 * 60
+
+# Meses desde la fecha final tras los que un proyecto terminado pasa al archivo (variable de
+# entorno DCC_MESES_ARCHIVO). Desactivado por defecto: el tablero solo cuenta la tabla activa,
+# así que archivar cambia sus números y tiene que ser una decisión explícita
+MESES_ARCHIVO = int(os.environ.get("DCC_MESES_ARCHIVO", "0"))
+
+
+# ------------------ COLA DE TRABAJOS ------------------
+# Los botones "Guardar" encolan el trabajo y vuelven enseguida con su ID; la sesión consulta
+# después el estado ("pendiente", "listo" o "error"). Mientras un trabajo no termina, las
+# imágenes que va a escribir figuran como "en proceso" para que las páginas muestren un aviso
+# en lugar de "Sin imagen".
+class ColaTrabajos:
+    def __init__(self, hilos):
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="dcc-trabajo")
+        self._lock = threading.Lock()
+        self._trabajos = {}
+        self._rutas_pendientes = Counter()
+
+    @staticmethod
+    def _normalizar(ruta):
+        return os.path.normcase(os.path.abspath(ruta))
+
+    def encolar(self, descripcion, funcion, *args, rutas=()):
+        id_trabajo = uuid.uuid4().hex[:12]
+        rutas = [self._normalizar(r) for r in rutas]
+
+        with self._lock:
+            self._limpiar()
+            self._trabajos[id_trabajo] = {
+                "descripcion": descripcion,
+                "estado": "pendiente",
+                "error": None,
+                "terminado": None,
+            }
+            self._rutas_pendientes.update(rutas)
+
+        self._ejecutor.submit(self._ejecutar, id_trabajo, funcion, args, rutas)
+        return id_trabajo
+
+    def _ejecutar(self, id_trabajo, funcion, args, rutas):
+        try:
+            funcion(*args)
+            estado, error = "listo", None
+        except Exception as e:
+            estado, error = "error", str(e) or type(e).__name__
+
+        with self._lock:
+            self._trabajos[id_trabajo].update(estado=estado, error=error, terminado=time.monotonic())
+            for ruta in rutas:
+                self._rutas_pendientes[ruta] -= 1
+                if self._rutas_pendientes[ruta] <= 0:
+                    del self._rutas_pendientes[ruta]
+
+    def _limpiar(self):
+        # Descarta los resultados viejos que ninguna sesión pasó a buscar
+        limite = time.monotonic() - RETENCION_TRABAJOS
+        for id_trabajo in [i for i, t in self._trabajos.items() if t["terminado"] and t["terminado"] < limite]:
+            del self._trabajos[id_trabajo]
+
+    def estado(self, id_trabajo):
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            return dict(trabajo) if trabajo else None
+
+    def en_proceso(self, ruta):
+        with self._lock:
+            return self._normalizar(ruta) in self._rutas_pendientes
+
+    def pendientes(self):
+        with self._lock:
+            return sum(t["estado"] == "pendiente" for t in self._trabajos.values())
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+COLA_TRABAJOS = ColaTrabajos(HILOS_TRABAJOS)
+
+
+def encolar(descripcion, funcion, *args, rutas=()):
+    return COLA_TRABAJOS.encolar(descripcion, funcion, *args, rutas=rutas)
+
+
+def estado_trabajo(id_trabajo):
+    return COLA_TRABAJOS.estado(id_trabajo)
+
+
+def imagen_en_proceso(ruta):
+    return isinstance(ruta, str) and ruta.strip() != "" and COLA_TRABAJOS.en_proceso(ruta.strip())
+
+
+# ------------------ GUARDADOS ------------------
+# Cada guardado escribe primero el registro (así aparece enseguida, con sus imágenes en
+# proceso) y después procesa las imágenes. Las imágenes llegan como [(bytes, ruta)], leídas del
+# archivo subido antes de encolar, porque el objeto de Streamlit no sobrevive a la sesión.
+def _guardar_imagenes(imagenes):
+    for datos, ruta in imagenes:
+        guardar_imagen(io.BytesIO(datos), ruta)
+
+
+def _insertar_nuevo(archivo, data):
+    # Se vuelve a validar la clave bajo el lock: otra sesión pudo guardar la misma mientras
+    # este trabajo esperaba en la cola
+    clave = CLAVES[archivo]
+    with REPOSITORIO.lock:
+        if clave_existe(archivo, data[clave]):
+            raise ValueError(f"Ya existe un registro con {clave} {data[clave]}")
+        guardar_csv(data, archivo)
+
+
+def guardar_cliente(data, imagenes):
+    _insertar_nuevo(CLIENTES_CSV, data)
+    _guardar_imagenes(imagenes)
+
+
+def guardar_proyecto(data, imagenes):
+    _insertar_nuevo(PROYECTOS_CSV, data)
+    _guardar_imagenes(imagenes)
+
+
+def editar_proyecto(id_proyecto, valores, imagenes, a_borrar):
+    # El proyecto se busca por id: si otra sesión le cambió el código mientras este trabajo
+    # esperaba en la cola, la edición igual llega a la fila correcta. El código se vuelve a
+    # validar bajo el lock, contra el que el proyecto tiene ahora, igual que al insertar
+    valores = dict(valores, codigo_orden=valores["codigo_orden"].strip().upper())
+    with REPOSITORIO.lock:
+        actual = obtener_proyecto_por_id(id_proyecto, ["codigo_orden"])
+        if actual is None:
+            raise ValueError("El proyecto ya no existe")
+        if clave_existe(PROYECTOS_CSV, valores["codigo_orden"], excepto=actual["codigo_orden"]):
+            raise ValueError(f"Ya existe un registro con codigo_orden {valores['codigo_orden']}")
+        actualizar_registros(PROYECTOS_CSV, "id", id_proyecto, valores)
+
+    # Un proyecto archivado que se reabre (o cuya fecha final ya no vence) vuelve a la tabla activa
+    codigo = valores["codigo_orden"]
+    if proyecto_archivado(codigo):
+        fecha_fin = obtener_proyecto(codigo, ["fecha_fin"])["fecha_fin"]
+        if MESES_ARCHIVO <= 0 or pd.isna(fecha_fin) or fecha_fin >= limite_archivo(MESES_ARCHIVO):
+            desarchivar_proyectos([codigo])
+
+    # Primero se borran las marcadas y después se guardan las nuevas: así una nueva con la misma
+    # ruta que una borrada nunca se pierde (y por las dudas no se borra una ruta que se va a escribir)
+    nuevas = {os.path.normcase(os.path.abspath(ruta)) for _, ruta in imagenes}
+    for ruta in a_borrar:
+        if os.path.normcase(os.path.abspath(ruta)) not in nuevas and existe_imagen(ruta):
+            borrar_imagen(ruta)
+    _guardar_imagenes(imagenes)
+
+
+def editar_proyectos(ids, valores, comentario=""):
+    # Edición en lote desde el listado: valores se asigna a todos los proyectos de ids y
+    # comentario se agrega al final del comentario de cada uno. Todo va en una escritura por
+    # partición; los comentarios se leen con el lock tomado para no pisar una edición de otra
+    # sesión. Devuelve cuántos proyectos cambiaron
+    with REPOSITORIO.lock:
+        cambios = {id_proyecto: dict(valores) for id_proyecto in ids}
+        if comentario:
+            for parte in particiones(PROYECTOS_CSV):
+                df, _ = cargar_con_firma(parte)
+                filas = df[df["id"].isin(list(cambios))]
+                for id_proyecto, actual in zip(filas["id"], filas["comentarios"]):
+                    cambios[id_proyecto]["comentarios"] = f"{actual}\n{comentario}" if actual else comentario
+        cambiados = actualizar_en_lote(PROYECTOS_CSV, "id", cambios)
+
+    # Igual que al editar uno: los archivados cuya fecha final ya no vence vuelven a la tabla activa
+    if hay_archivo():
+        archivados, _ = cargar_con_firma(PROYECTOS_ARCHIVO_CSV)
+        filas = archivados[archivados["id"].isin(list(cambios))]
+        if MESES_ARCHIVO > 0:
+            filas = filas[filas["fecha_fin"].isna() | (filas["fecha_fin"] >= limite_archivo(MESES_ARCHIVO))]
+        if not filas.empty:
+            desarchivar_proyectos(filas["codigo_orden"].tolist())
+    return cambiados
+
+
+# ------------------ PURGA DE LA PAPELERA ------------------
+def purgar_eliminados(ventana_min=VENTANA_DESHACER_MIN):
+    # Borra de una pasada las bajas más viejas que la ventana: una sola escritura por CSV y
+    # después las imágenes de esas filas. Devuelve (clientes, proyectos, imágenes) borrados
+    limite = pd.Timestamp.now() - pd.Timedelta(minutes=ventana_min)
+    proyectos = purgar_registros(PROYECTOS_CSV, limite)
+    clientes = purgar_registros(CLIENTES_CSV, limite)
+
+    rutas = set(clientes["imagen_path"][clientes["imagen_path"] != ""])
+    for imagenes in proyectos["imagenes_paths"][proyectos["imagenes_paths"] != ""]:
+        rutas.update(ruta.strip() for ruta in imagenes.split(",") if ruta.strip())
+
+    borradas = 0
+    for ruta in rutas:
+        if existe_imagen(ruta):
+            try:
+                borrar_imagen(ruta)
+                borradas += 1
+            except OSError:
+                continue
+    return len(clientes), len(proyectos), borradas
+
+
+_purga_iniciada = False
+_purga_lock = threading.Lock()
+
+
+def archivar_vencidos(meses=MESES_ARCHIVO):
+    # Pasa al archivo los proyectos terminados hace más de meses. Devuelve cuántos se movieron
+    if meses <= 0:
+        return 0
+    return archivar_proyectos(meses)
+
+
+def _purgar_periodicamente(intervalo):
+    # En la misma vuelta se archivan los proyectos vencidos: sin nada que mover es solo una
+    # comparación de fechas sobre la tabla en memoria
+    while True:
+        time.sleep(intervalo)
+        try:
+            purgar_eliminados()
+            archivar_vencidos()
+        except Exception:
+            continue      # Se reintenta en la próxima vuelta (por ejemplo, CSV bloqueado)
+
+
+def iniciar_purga(intervalo=INTERVALO_PURGA):
+    # Arranca una sola vez por proceso el hilo que purga la papelera
+    global _purga_iniciada
+    with _purga_lock:
+        if _purga_iniciada:
+            return
+        _purga_iniciada = True
+    threading.Thread(target=_purgar_periodicamente, args=(intervalo,), name="dcc-purga", daemon=True).start()